@@ -0,0 +1,112 @@
+from typing import Dict, Optional, Any, TYPE_CHECKING
+import zlib
+from config import settings
+from app.utils.cache import TTLCache
+
+if TYPE_CHECKING:
+    from app.ai.mcp import Context
+
+def serialize_context(context: "Context") -> bytes:
+    """Encode a context as compressed JSON"""
+    return zlib.compress(context.model_dump_json(exclude_defaults=True).encode())
+
+def deserialize_context(data: bytes) -> "Context":
+    """Decode a context produced by serialize_context"""
+    from app.ai.mcp import Context
+    return Context.model_validate_json(zlib.decompress(data))
+
+class ContextStore:
+    """Interface for MCP context storage backends"""
+
+    async def get(self, user_id: str) -> Optional["Context"]:
+        raise NotImplementedError
+
+    async def set(self, context: "Context") -> None:
+        raise NotImplementedError
+
+    async def delete(self, user_id: str) -> None:
+        raise NotImplementedError
+
+    def get_metrics(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """Release backend resources"""
+
+class InMemoryContextStore(ContextStore):
+    """Per-process context store with LRU and TTL eviction"""
+
+    def __init__(
+        self,
+        maxsize: int = settings.CONTEXT_MAX_ENTRIES,
+        ttl: int = settings.CONTEXT_TTL_SECONDS
+    ):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, user_id: str) -> Optional["Context"]:
+        data = self._cache.get(user_id)
+        return deserialize_context(data) if data is not None else None
+
+    async def set(self, context: "Context") -> None:
+        self._cache.set(context.user_id, serialize_context(context))
+
+    async def delete(self, user_id: str) -> None:
+        self._cache.pop(user_id)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {"backend": "memory", **self._cache.get_metrics()}
+
+class RedisContextStore(ContextStore):
+    """Context store shared across workers, with expiry handled by Redis"""
+
+    def __init__(
+        self,
+        url: str = settings.REDIS_URL,
+        ttl: int = settings.CONTEXT_TTL_SECONDS,
+        prefix: str = "mcp:context:"
+    ):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self._stats = {"hits": 0, "misses": 0}
+
+    async def get(self, user_id: str) -> Optional["Context"]:
+        data = await self.redis.get(self.prefix + user_id)
+        if data is None:
+            self._stats["misses"] += 1
+            return None
+
+        self._stats["hits"] += 1
+        return deserialize_context(data)
+
+    async def set(self, context: "Context") -> None:
+        await self.redis.set(
+            self.prefix + context.user_id,
+            serialize_context(context),
+            ex=self.ttl or None
+        )
+
+    async def delete(self, user_id: str) -> None:
+        await self.redis.delete(self.prefix + user_id)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "backend": "redis",
+            **self._stats,
+            # TTL expiry and maxmemory eviction are tracked by Redis (INFO stats)
+            "hit_rate": self._stats["hits"] / lookups if lookups else 0.0
+        }
+
+    async def close(self) -> None:
+        await self.redis.close()
+
+def create_context_store() -> ContextStore:
+    """Build the context store selected by CONTEXT_STORE_BACKEND"""
+    if settings.CONTEXT_STORE_BACKEND == "redis":
+        return RedisContextStore()
+    elif settings.CONTEXT_STORE_BACKEND == "memory":
+        return InMemoryContextStore()
+    raise ValueError(f"Unsupported context store backend: {settings.CONTEXT_STORE_BACKEND}")
@@ -0,0 +1,93 @@
+from typing import List, Optional
+import asyncio
+import hashlib
+import re
+import numpy as np
+from config import settings
+from app.ai.llm_client import AsyncLLMClient
+
+_WORD = re.compile(r"\w+")
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length so dot products are cosine similarities"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+class Embedder:
+    """Turns texts into unit-length float32 vectors, one row per text"""
+
+    name = "base"
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+class HashingEmbedder(Embedder):
+    """Deterministic local embedder using signed feature hashing of words and word pairs
+
+    Needs no model or network access and gives the same vectors in every process,
+    so indexes built by it are reproducible in tests.
+    """
+
+    name = "local"
+
+    def __init__(self, dim: int = settings.EMBEDDING_DIM):
+        self.dim = dim
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        # Hashing is pure CPU; keep long documents off the event loop
+        return await asyncio.to_thread(self.embed_sync, texts)
+
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            if not features:
+                continue
+            # blake2b rather than hash(): Python string hashing is salted per process
+            digests = [
+                int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                for feature in features
+            ]
+            hashes = np.array(digests, dtype=np.uint64)
+            signs = np.where(hashes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], (hashes % np.uint64(self.dim)).astype(np.int64), signs)
+        # Dampen repeated terms so long chunks are not dominated by a few words
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return normalize_rows(vectors)
+
+class OpenAIEmbedder(Embedder):
+    """Embeds texts with the OpenAI embeddings API in batched requests
+
+    Requests go through the shared LLM client, so they count against the same
+    concurrency limit and queue as completions.
+    """
+
+    name = "openai"
+
+    def __init__(
+        self,
+        llm_client: Optional[AsyncLLMClient] = None,
+        model: str = settings.EMBEDDING_MODEL,
+        batch_size: int = settings.EMBEDDING_BATCH_SIZE
+    ):
+        self.llm_client = llm_client or AsyncLLMClient()
+        self.model = model
+        self.batch_size = batch_size
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        responses = await asyncio.gather(*[
+            self.llm_client.create_embeddings(batch, model=self.model)
+            for batch in batches
+        ])
+        vectors = [item.embedding for response in responses for item in response.data]
+        return normalize_rows(np.array(vectors, dtype=np.float32))
+
+def create_embedder(llm_client: Optional[AsyncLLMClient] = None) -> Embedder:
+    """Build the embedder selected by EMBEDDING_BACKEND"""
+    if settings.EMBEDDING_BACKEND == "openai":
+        return OpenAIEmbedder(llm_client)
+    if settings.EMBEDDING_BACKEND == "local":
+        return HashingEmbedder()
+    raise ValueError(f"Unsupported embedding backend: {settings.EMBEDDING_BACKEND}")
@@ -0,0 +1,120 @@
+from typing import Dict, List, NamedTuple
+import re
+from config import settings
+
+# Rough per-message overhead for role and separators in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def estimate_tokens(text: str) -> int:
+    """Estimate token count without a tokenizer (~4 characters per token)"""
+    return (len(text) + 3) // 4
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Estimate prompt tokens for a list of chat messages"""
+    return sum(
+        estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
+
+class CompactionResult(NamedTuple):
+    history: List[Dict[str, str]]
+    summary: str
+    tokens_before: int
+    tokens_after: int
+    evicted_messages: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+class HistoryManager:
+    """Pack recent turns into a token budget and fold evicted turns into a rolling summary"""
+
+    def __init__(
+        self,
+        prompt_budget: int = settings.HISTORY_TOKEN_BUDGET,
+        summary_budget: int = settings.HISTORY_SUMMARY_TOKEN_BUDGET,
+        summary_line_chars: int = 200
+    ):
+        self.prompt_budget = prompt_budget
+        self.summary_budget = summary_budget
+        self.summary_line_chars = summary_line_chars
+        self._stats = {"compactions": 0, "evicted_messages": 0, "tokens_saved": 0}
+
+    def compact(self, history: List[Dict[str, str]], summary: str = "") -> CompactionResult:
+        """Fit history plus summary into the prompt budget"""
+        tokens_before = estimate_message_tokens(history) + estimate_tokens(summary)
+
+        available = self.prompt_budget - self.summary_budget
+
+        # The latest user turn and the replies after it are always kept, clipped if
+        # they do not fit, so the model never loses the question it is answering
+        start = next(
+            (index for index in range(len(history) - 1, -1, -1) if history[index]["role"] == "user"),
+            max(len(history) - 1, 0)
+        )
+        kept = history[start:]
+        used = sum(self._cost(message) for message in kept)
+        if used > available:
+            share = available // len(kept)
+            kept = [
+                self._clip(message, share) if self._cost(message) > share else message
+                for message in kept
+            ]
+            used = sum(self._cost(message) for message in kept)
+
+        # Walk further back keeping whole messages while they fit
+        for message in reversed(history[:start]):
+            cost = self._cost(message)
+            if used + cost > available:
+                break
+            kept.insert(0, message)
+            used += cost
+
+        # Never start the window with a dangling assistant reply
+        while len(kept) > 1 and kept[0]["role"] != "user":
+            kept.pop(0)
+
+        evicted = history[:len(history) - len(kept)]
+        if evicted:
+            summary = self._summarize(summary, evicted)
+
+        result = CompactionResult(
+            history=kept,
+            summary=summary,
+            tokens_before=tokens_before,
+            tokens_after=estimate_message_tokens(kept) + estimate_tokens(summary),
+            evicted_messages=len(evicted)
+        )
+        if evicted:
+            self._stats["compactions"] += 1
+            self._stats["evicted_messages"] += len(evicted)
+            self._stats["tokens_saved"] += max(result.tokens_saved, 0)
+        return result
+
+    def _summarize(self, summary: str, evicted: List[Dict[str, str]]) -> str:
+        """Append the first sentence of each evicted message, keeping the newest lines in budget"""
+        lines = [line for line in summary.splitlines() if line]
+        for message in evicted:
+            first_sentence = _SENTENCE_END.split(message["content"].strip(), 1)[0]
+            if len(first_sentence) > self.summary_line_chars:
+                first_sentence = first_sentence[:self.summary_line_chars].rstrip() + "..."
+            lines.append(f"{message['role']}: {first_sentence}")
+
+        while lines and estimate_tokens("\n".join(lines)) > self.summary_budget:
+            lines.pop(0)
+        return "\n".join(lines)
+
+    def _cost(self, message: Dict[str, str]) -> int:
+        return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+    def _clip(self, message: Dict[str, str], budget: int) -> Dict[str, str]:
+        """Truncate a single oversized message to the budget"""
+        max_chars = max(budget - MESSAGE_OVERHEAD_TOKENS, 0) * 4
+        return {**message, "content": message["content"][:max_chars]}
+
+    def get_metrics(self) -> Dict[str, int]:
+        """Return cumulative compaction metrics"""
+        return dict(self._stats)
@@ -0,0 +1,126 @@
+from typing import Dict, List, Optional, Any, AsyncIterator
+from contextlib import asynccontextmanager
+import asyncio
+import time
+import httpx
+import openai
+from config import settings
+
+class LLMQueueFullError(Exception):
+    """Raised when a completion cannot get a concurrency slot in time"""
+
+class AsyncLLMClient:
+    """Async OpenAI client sharing one keep-alive pool and a global concurrency limit"""
+
+    def __init__(
+        self,
+        api_key: str = settings.OPENAI_API_KEY,
+        max_concurrency: int = settings.LLM_MAX_CONCURRENCY,
+        max_queue: int = settings.LLM_MAX_QUEUE,
+        queue_timeout: float = settings.LLM_QUEUE_TIMEOUT
+    ):
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(settings.LLM_REQUEST_TIMEOUT, connect=5.0)
+        )
+        self.client = openai.AsyncOpenAI(api_key=api_key, http_client=self.http_client)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        # Created lazily so the semaphore binds to the serving event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._in_flight = 0
+        self._stats = {
+            "completions": 0,
+            "rejected": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0
+        }
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one concurrency slot, waiting in the bounded queue if needed"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            self._stats["rejected"] += 1
+            raise LLMQueueFullError("LLM request queue is full")
+
+        self._waiting += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._stats["rejected"] += 1
+            raise LLMQueueFullError(
+                f"Timed out after {self.queue_timeout}s waiting for an LLM slot"
+            )
+        finally:
+            self._waiting -= 1
+
+        waited = time.perf_counter() - start
+        self._stats["wait_time_total"] += waited
+        self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+        self._stats["completions"] += 1
+
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+    async def chat_completion(self, messages: List[Dict[str, str]], **kwargs) -> Any:
+        """Create a chat completion once a concurrency slot is available"""
+        async with self.slot():
+            return await self.client.chat.completions.create(
+                messages=messages,
+                **kwargs
+            )
+
+    async def create_embeddings(self, texts: List[str], **kwargs) -> Any:
+        """Embed texts once a concurrency slot is available"""
+        async with self.slot():
+            return await self.client.embeddings.create(input=texts, **kwargs)
+
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Yield completion tokens as they arrive, holding one slot for the whole stream"""
+        async with self.slot():
+            stream = await self.client.chat.completions.create(
+                messages=messages,
+                stream=True,
+                **kwargs
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return queue and concurrency metrics"""
+        completions = self._stats["completions"]
+        return {
+            "in_flight": self._in_flight,
+            "queued": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "completions": completions,
+            "rejected": self._stats["rejected"],
+            "queue_wait_avg_ms": (
+                self._stats["wait_time_total"] / completions * 1000 if completions else 0.0
+            ),
+            "queue_wait_max_ms": self._stats["wait_time_max"] * 1000
+        }
+
+    async def aclose(self) -> None:
+        """Close the shared connection pool"""
+        await self.http_client.aclose()
@@ -1,122 +1,434 @@
-from typing import Dict, List, Optional, Any
-from pydantic import BaseModel
+from typing import Dict, List, Optional, Any, AsyncIterator, Tuple
+from pydantic import BaseModel, Field
 from datetime import datetime
-import openai
+import json
+import time
+import uuid
 from config import settings
+from app.ai.llm_client import AsyncLLMClient
+from app.ai.history import HistoryManager, CompactionResult
+from app.ai.context_store import ContextStore, create_context_store
+from app.ai.response_cache import ResponseCache
+from app.ai.embeddings import create_embedder
+from app.ai.retrieval import DocumentRetriever
+from app.utils.singleflight import singleflight, make_key
+from app.utils.cache import TTLCache
+from app.utils.keyed_lock import KeyedLock
+from app.ai.tools import ToolRegistry, ToolExecutor
+
+COMPLETION_PARAMS = {
+    "model": settings.LLM_MODEL,
+    "temperature": 0.7,
+    "max_tokens": 500
+}
 
 class Context(BaseModel):
     """Context model for maintaining conversation state and user preferences"""
     user_id: str
     platform: str  # 'microsoft' or 'google'
     conversation_history: List[Dict[str, str]] = []
+    history_summary: str = ""
     current_task: Optional[Dict[str, Any]] = None
-    last_interaction: datetime = datetime.now()
+    last_interaction: datetime = Field(default_factory=datetime.now)
     preferences: Dict[str, Any] = {}
+    # Bumped whenever preferences or current_task change
+    prompt_version: int = 0
+    # Revision counters backing delta responses and cached prompts; the epoch
+    # tells a recreated context apart from the one it replaced
+    epoch: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    revision: int = 0
+    field_revisions: Dict[str, int] = {}
+    history_revisions: List[int] = []
+
+    def touch(self, *fields: str) -> None:
+        """Start a new revision, marking the given fields as changed"""
+        self.revision += 1
+        for field in fields:
+            self.field_revisions[field] = self.revision
+
+    @property
+    def version(self) -> str:
+        """Opaque version token clients send back to receive deltas"""
+        return f"{self.epoch}:{self.revision}"
+
+    def delta_since(self, version: str) -> Dict[str, Any]:
+        """Return the changes a client at `version` needs to catch up"""
+        epoch, _, revision = version.rpartition(":")
+        since = int(revision) if revision.isdigit() else -1
+        if epoch != self.epoch or not 0 <= since <= self.revision:
+            # The client holds state from a context that no longer exists
+            return {"full": True, "snapshot": self.dict()}
+        
+        # Revisions are non-decreasing, so newer messages form a suffix of the history
+        appended = sum(1 for revision in self.history_revisions if revision > since)
+        return {
+            "full": False,
+            "since": version,
+            "changed": {
+                field: getattr(self, field)
+                for field, revision in self.field_revisions.items()
+                if revision > since
+            },
+            # Clients append these, then keep the last history_length messages
+            "history_appended": self.conversation_history[
+                len(self.conversation_history) - appended:
+            ] if appended else [],
+            "history_length": len(self.conversation_history),
+            "last_interaction": self.last_interaction
+        }
 
 class ModelContextProtocol:
-    def __init__(self):
-        self.openai_client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.contexts: Dict[str, Context] = {}
+    def __init__(self, context_store: Optional[ContextStore] = None):
+        self.llm_client = AsyncLLMClient()
+        self.history_manager = HistoryManager()
+        self.contexts = context_store or create_context_store()
+        self.response_cache = ResponseCache()
+        self._prompt_cache = TTLCache(maxsize=settings.CONTEXT_MAX_ENTRIES)
+        self.user_locks = KeyedLock()
+        self.tool_executor = ToolExecutor()
+        self.documents = DocumentRetriever(create_embedder(self.llm_client))
 
-    def create_context(self, user_id: str, platform: str) -> Context:
+    async def create_context(self, user_id: str, platform: str) -> Context:
         """Create a new context for a user"""
         context = Context(user_id=user_id, platform=platform)
-        self.contexts[user_id] = context
+        await self.contexts.set(context)
         return context
 
-    def get_context(self, user_id: str) -> Optional[Context]:
+    async def get_context(self, user_id: str) -> Optional[Context]:
         """Retrieve existing context for a user"""
-        return self.contexts.get(user_id)
+        return await self.contexts.get(user_id)
+
+    async def save_context(self, context: Context) -> None:
+        """Persist a modified context to the store"""
+        await self.contexts.set(context)
 
     async def process_request(
         self,
         user_id: str,
         request: str,
         platform: str,
-        additional_context: Optional[Dict[str, Any]] = None
+        additional_context: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True,
+        since_version: Optional[str] = None,
+        tools: Optional[ToolRegistry] = None
     ) -> Dict[str, Any]:
-        """Process user request with context awareness"""
-        # Get or create context
-        context = self.get_context(user_id) or self.create_context(user_id, platform)
+        """Process user request with context awareness
+        
+        When since_version is given, only the context changes after that
+        version are returned instead of the full context snapshot. When
+        tools are given, the model may call them before answering.
+        """
+        # Identical concurrent requests (double clicks, retries) share one completion
+        key = make_key(
+            user_id, "ai.process_request",
+            request, platform, additional_context, use_cache, since_version, tools is not None
+        )
+        return await singleflight.do(
+            key,
+            lambda: self._process_request(
+                user_id, request, platform, additional_context, use_cache, since_version, tools
+            )
+        )
+
+    async def _process_request(
+        self,
+        user_id: str,
+        request: str,
+        platform: str,
+        additional_context: Optional[Dict[str, Any]],
+        use_cache: bool,
+        since_version: Optional[str],
+        tools: Optional[ToolRegistry]
+    ) -> Dict[str, Any]:
+        """Run one request against the model and commit it to the context"""
+        # Serialize read-modify-write of this user's context; other users are unaffected
+        async with self.user_locks.acquire(user_id):
+            # Get or create context
+            context = await self.get_context(user_id) or await self.create_context(user_id, platform)
+            document_context = await self._retrieve_document_context(user_id, request)
+            messages = self._prepare_messages(context, request, additional_context, document_context)
+            
+            try:
+                # Get AI response
+                pending_actions = None
+                if tools is not None:
+                    # Tool results depend on live service data, so they are never cached
+                    response, pending_actions = await self._get_tool_response(messages, tools)
+                else:
+                    response = await self._get_ai_response(messages, use_cache)
+                compaction = self._commit_exchange(context, request, response)
+                await self.save_context(context)
+            
+                result = {
+                    "response": response,
+                    **self._context_payload(context, since_version),
+                    "history_tokens_saved": compaction.tokens_saved
+                }
+                if pending_actions is not None:
+                    result["pending_actions"] = pending_actions
+                return result
+            except Exception as e:
+                if additional_context:
+                    await self.save_context(context)
+                return {
+                    "error": str(e),
+                    **self._context_payload(context, since_version)
+                }
+
+    def _context_payload(self, context: Context, since_version: Optional[str]) -> Dict[str, Any]:
+        """Return the full context, or only the changes since the client's version"""
+        if since_version is None:
+            return {"context": context.dict(), "context_version": context.version}
+        return {
+            "context_delta": context.delta_since(since_version),
+            "context_version": context.version
+        }
+
+    async def process_request_stream(
+        self,
+        user_id: str,
+        request: str,
+        platform: str,
+        additional_context: Optional[Dict[str, Any]] = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream response tokens as events, committing history once the stream completes"""
+        async with self.user_locks.acquire(user_id):
+            async for event in self._stream_request(
+                user_id, request, platform, additional_context, use_cache
+            ):
+                yield event
+
+    async def _stream_request(
+        self,
+        user_id: str,
+        request: str,
+        platform: str,
+        additional_context: Optional[Dict[str, Any]],
+        use_cache: bool
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream one request against the model and commit it to the context"""
+        context = await self.get_context(user_id) or await self.create_context(user_id, platform)
+        document_context = await self._retrieve_document_context(user_id, request)
+        messages = self._prepare_messages(context, request, additional_context, document_context)
         
+        cache_key = self.response_cache.make_key(messages, **COMPLETION_PARAMS) if use_cache else None
+        response = self.response_cache.get(cache_key) if cache_key else None
+        
+        if response is not None:
+            yield {"event": "token", "data": response}
+        else:
+            tokens: List[str] = []
+            start = time.perf_counter()
+            try:
+                async for token in self.llm_client.stream_chat_completion(
+                    messages,
+                    **COMPLETION_PARAMS
+                ):
+                    tokens.append(token)
+                    yield {"event": "token", "data": token}
+            except Exception as e:
+                # Partial output is discarded so history never holds a truncated reply
+                yield {"event": "error", "data": f"Failed to get AI response: {str(e)}"}
+                return
+            
+            response = "".join(tokens)
+            if cache_key:
+                self.response_cache.set(cache_key, response, time.perf_counter() - start)
+        
+        self._commit_exchange(context, request, response)
+        await self.save_context(context)
+        yield {"event": "done", "data": response}
+
+    def _prepare_messages(
+        self,
+        context: Context,
+        request: str,
+        additional_context: Optional[Dict[str, Any]],
+        document_context: str = ""
+    ) -> List[Dict[str, str]]:
+        """Apply request context and build the message list for the model"""
         # Update context with new information
         if additional_context:
-            context.preferences.update(additional_context)
+            preferences = {**context.preferences, **additional_context}
+            if preferences != context.preferences:
+                context.preferences = preferences
+                context.prompt_version += 1
+                context.touch("preferences")
         
         # Prepare conversation history
-        messages = [
-            {"role": "system", "content": self._get_system_prompt(context)},
-            *context.conversation_history,
-            {"role": "user", "content": request}
-        ]
+        messages = [{"role": "system", "content": self._get_system_prompt(context)}]
+        if context.history_summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of earlier conversation:\n{context.history_summary}"
+            })
+        messages.extend(context.conversation_history)
         
+        # Excerpts change with every request, so they go last to keep the prefix cacheable
+        if document_context:
+            messages.append({"role": "system", "content": document_context})
+        messages.append({"role": "user", "content": request})
+        return messages
+
+    async def _retrieve_document_context(self, user_id: str, request: str) -> str:
+        """Return excerpts of the user's indexed documents relevant to the request"""
         try:
-            # Get AI response
-            response = await self._get_ai_response(messages)
-            
-            # Update conversation history
-            context.conversation_history.append({"role": "user", "content": request})
-            context.conversation_history.append({"role": "assistant", "content": response})
-            
-            # Trim conversation history if too long
-            if len(context.conversation_history) > 10:
-                context.conversation_history = context.conversation_history[-10:]
-            
-            # Update last interaction time
-            context.last_interaction = datetime.now()
-            
-            return {
-                "response": response,
-                "context": context.dict()
-            }
-        except Exception as e:
-            return {
-                "error": str(e),
-                "context": context.dict()
-            }
+            return await self.documents.build_context(user_id, request)
+        except Exception:
+            # Retrieval only enriches the prompt; answer without it rather than fail
+            return ""
+
+    def _commit_exchange(
+        self,
+        context: Context,
+        request: str,
+        response: str
+    ) -> CompactionResult:
+        """Record a completed exchange and compact history into the token budget"""
+        context.touch()
+        context.conversation_history.append({"role": "user", "content": request})
+        context.conversation_history.append({"role": "assistant", "content": response})
+        context.history_revisions.extend([context.revision, context.revision])
+        
+        # Compact conversation history into the prompt budget
+        compaction = self.history_manager.compact(
+            context.conversation_history,
+            context.history_summary
+        )
+        context.conversation_history = compaction.history
+        context.history_revisions = context.history_revisions[-len(compaction.history):]
+        if compaction.summary != context.history_summary:
+            context.history_summary = compaction.summary
+            context.field_revisions["history_summary"] = context.revision
+        
+        # Update last interaction time
+        context.last_interaction = datetime.now()
+        return compaction
 
     def _get_system_prompt(self, context: Context) -> str:
+        """Return the system prompt, rendering it only when its inputs change
+        
+        Every change to preferences or current_task bumps prompt_version, and the
+        epoch is new whenever a context is recreated, so the pair names one prompt.
+        """
+        key = (context.user_id, context.epoch, context.prompt_version)
+        prompt = self._prompt_cache.get(key)
+        if prompt is None:
+            prompt = self._render_system_prompt(context)
+            self._prompt_cache.set(key, prompt)
+        return prompt
+
+    def _render_system_prompt(self, context: Context) -> str:
         """Generate system prompt based on context"""
         platform_specific = {
             "microsoft": "You are an AI assistant integrated with Microsoft 365.",
             "google": "You are an AI assistant integrated with Google Workspace."
         }
         
-        base_prompt = f"""
-        {platform_specific[context.platform]}
-        You help users with document processing, email automation, and task management.
-        
-        User Preferences:
-        {context.preferences}
+        # Sorted JSON keeps the prompt byte-identical for upstream prefix caching
+        return "\n".join([
+            platform_specific[context.platform],
+            "You help users with document processing, email automation, and task management.",
+            "",
+            "User Preferences:",
+            json.dumps(context.preferences, sort_keys=True, default=str),
+            "",
+            "Current Task:",
+            json.dumps(context.current_task, sort_keys=True, default=str),
+            "",
+            "Please provide clear, concise responses and always maintain context of the conversation."
+        ])
+
+    async def _get_ai_response(
+        self,
+        messages: List[Dict[str, str]],
+        use_cache: bool = True
+    ) -> str:
+        """Get response from OpenAI API, serving repeated prompts from the cache"""
+        cache_key = self.response_cache.make_key(messages, **COMPLETION_PARAMS) if use_cache else None
+        if cache_key and (cached := self.response_cache.get(cache_key)) is not None:
+            return cached
         
-        Current Task:
-        {context.current_task}
+        try:
+            start = time.perf_counter()
+            response = await self.llm_client.chat_completion(
+                messages,
+                **COMPLETION_PARAMS
+            )
+            content = response.choices[0].message.content
+            
+            if cache_key:
+                self.response_cache.set(
+                    cache_key,
+                    content,
+                    latency=time.perf_counter() - start,
+                    total_tokens=response.usage.total_tokens if response.usage else 0
+                )
+            return content
+        except Exception as e:
+            raise Exception(f"Failed to get AI response: {str(e)}")
+
+    async def _get_tool_response(
+        self,
+        messages: List[Dict[str, Any]],
+        tools: ToolRegistry
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """Run the tools the model asks for in parallel and answer in one follow-up turn
         
-        Please provide clear, concise responses and always maintain context of the conversation.
+        Returns the answer and the side-effecting calls left for the user to confirm.
         """
-        
-        return base_prompt.strip()
-
-    async def _get_ai_response(self, messages: List[Dict[str, str]]) -> str:
-        """Get response from OpenAI API"""
         try:
-            response = await self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500
+            response = await self.llm_client.chat_completion(
+                messages,
+                tools=tools.schemas(),
+                **COMPLETION_PARAMS
             )
+            message = response.choices[0].message
+            if not message.tool_calls:
+                return message.content, []
+            
+            turn = await self.tool_executor.execute(tools, message.tool_calls)
             
-            return response.choices[0].message.content
+            # tool_choice="none" forces a final text answer, capping the workflow at two round trips
+            follow_up = await self.llm_client.chat_completion(
+                [*messages, message.model_dump(exclude_none=True), *turn.messages],
+                tools=tools.schemas(),
+                tool_choice="none",
+                **COMPLETION_PARAMS
+            )
+            return follow_up.choices[0].message.content, turn.pending_actions
         except Exception as e:
             raise Exception(f"Failed to get AI response: {str(e)}")
 
-    def update_task(self, user_id: str, task: Dict[str, Any]) -> None:
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return runtime metrics for the AI layer"""
+        return {
+            "llm": self.llm_client.get_metrics(),
+            "history": self.history_manager.get_metrics(),
+            "context_store": self.contexts.get_metrics(),
+            "response_cache": self.response_cache.get_metrics(),
+            "prompt_cache": self._prompt_cache.get_metrics(),
+            "user_locks": self.user_locks.get_metrics(),
+            "tools": self.tool_executor.get_metrics(),
+            "documents": self.documents.get_metrics()
+        }
+
+    async def close(self) -> None:
+        """Release pooled connections held by the AI layer"""
+        await self.llm_client.aclose()
+        await self.contexts.close()
+
+    async def update_task(self, user_id: str, task: Dict[str, Any]) -> None:
         """Update current task in context"""
-        if context := self.get_context(user_id):
-            context.current_task = task
+        async with self.user_locks.acquire(user_id):
+            if context := await self.get_context(user_id):
+                context.current_task = task
+                context.prompt_version += 1
+                context.touch("current_task")
+                await self.save_context(context)
 
-    def clear_context(self, user_id: str) -> None:
+    async def clear_context(self, user_id: str) -> None:
         """Clear context for a user"""
-        if user_id in self.contexts:
-            del self.contexts[user_id]
+        async with self.user_locks.acquire(user_id):
+            await self.contexts.delete(user_id)
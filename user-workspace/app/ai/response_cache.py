@@ -0,0 +1,69 @@
+from typing import Dict, List, Optional, Any, NamedTuple
+import hashlib
+import json
+import re
+from config import settings
+from app.utils.cache import TTLCache
+
+_WHITESPACE = re.compile(r"\s+")
+
+class CachedResponse(NamedTuple):
+    content: str
+    latency: float
+    total_tokens: int
+
+def normalize_message(message: Dict[str, str]) -> Dict[str, str]:
+    """Collapse whitespace, and case for user turns, so trivially different prompts share a key"""
+    content = _WHITESPACE.sub(" ", message["content"]).strip()
+    if message["role"] == "user":
+        content = content.casefold()
+    return {"role": message["role"], "content": content}
+
+class ResponseCache:
+    """LRU/TTL cache of completions keyed on normalized messages and model parameters"""
+
+    def __init__(
+        self,
+        maxsize: int = settings.RESPONSE_CACHE_MAX_ENTRIES,
+        ttl: int = settings.RESPONSE_CACHE_TTL_SECONDS
+    ):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._saved = {"latency_seconds": 0.0, "tokens": 0}
+
+    def make_key(self, messages: List[Dict[str, str]], **params: Any) -> str:
+        """Hash the normalized messages and completion parameters"""
+        payload = json.dumps(
+            {"messages": [normalize_message(m) for m in messages], "params": params},
+            sort_keys=True,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached completion and credit the latency and tokens it saved"""
+        entry: Optional[CachedResponse] = self._cache.get(key)
+        if entry is None:
+            return None
+
+        self._saved["latency_seconds"] += entry.latency
+        self._saved["tokens"] += entry.total_tokens
+        return entry.content
+
+    def set(
+        self,
+        key: str,
+        content: str,
+        latency: float,
+        total_tokens: int = 0,
+        ttl: Optional[int] = None
+    ) -> None:
+        """Store a completion along with what it cost to produce"""
+        self._cache.set(key, CachedResponse(content, latency, total_tokens), ttl=ttl)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return hit-rate counters and the latency and tokens saved by hits"""
+        return {
+            **self._cache.get_metrics(),
+            "saved_latency_seconds": self._saved["latency_seconds"],
+            "saved_tokens": self._saved["tokens"]
+        }
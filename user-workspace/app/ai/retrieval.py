@@ -0,0 +1,284 @@
+from typing import Any, Dict, List, NamedTuple, Optional
+import hashlib
+import re
+import numpy as np
+from config import settings
+from app.ai.embeddings import Embedder, create_embedder
+from app.ai.history import estimate_tokens
+from app.utils.cache import TTLCache
+from app.utils.keyed_lock import KeyedLock
+
+# Matches estimate_tokens, which counts ~4 characters per token
+CHARS_PER_TOKEN = 4
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+def chunk_text(
+    text: str,
+    chunk_tokens: int = settings.RETRIEVAL_CHUNK_TOKENS,
+    overlap_tokens: int = settings.RETRIEVAL_CHUNK_OVERLAP_TOKENS
+) -> List[str]:
+    """Split text into chunks of about chunk_tokens, breaking between paragraphs where possible
+
+    Each chunk after the first repeats the tail of the previous one, so a passage
+    cut at a boundary is still whole in one of them.
+    """
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    overlap_chars = overlap_tokens * CHARS_PER_TOKEN
+
+    # Paragraphs longer than a chunk are cut on the last space before the limit
+    pieces: List[str] = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            if cut < max_chars // 2:
+                cut = max_chars
+            pieces.append(paragraph[:cut].rstrip())
+            paragraph = paragraph[cut:].lstrip()
+        if paragraph:
+            pieces.append(paragraph)
+
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            tail = current[-overlap_chars:] if overlap_chars else ""
+            # Start the overlap on a word boundary
+            current = tail[tail.find(" ") + 1:] if " " in tail else ""
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+class Chunk(NamedTuple):
+    document_id: str
+    document_name: str
+    position: int
+    text: str
+    # Content hash; lets a re-index reuse vectors of unchanged chunks
+    digest: str
+
+class VectorIndex:
+    """Chunk vectors in one float32 matrix, searched with batched dot products
+
+    Vectors are unit length, so a matrix product scores every query against every
+    chunk at once and argpartition picks the top k without a full sort.
+    """
+
+    def __init__(self):
+        self.vectors: Optional[np.ndarray] = None
+        self.chunks: List[Chunk] = []
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def document_vectors(self, document_id: str) -> Dict[str, np.ndarray]:
+        """Return the stored vectors of a document keyed by chunk digest"""
+        return {
+            chunk.digest: self.vectors[row]
+            for row, chunk in enumerate(self.chunks)
+            if chunk.document_id == document_id
+        }
+
+    def remove(self, document_id: str) -> None:
+        """Drop every chunk of a document"""
+        keep = [row for row, chunk in enumerate(self.chunks) if chunk.document_id != document_id]
+        if len(keep) == len(self.chunks):
+            return
+        self.chunks = [self.chunks[row] for row in keep]
+        self.vectors = self.vectors[keep] if keep else None
+
+    def add(self, chunks: List[Chunk], vectors: np.ndarray) -> None:
+        """Append chunks with their vectors, one row per chunk"""
+        if not chunks:
+            return
+        self.chunks.extend(chunks)
+        self.vectors = vectors if self.vectors is None else np.vstack([self.vectors, vectors])
+
+    def search(self, queries: np.ndarray, k: int) -> List[List[Any]]:
+        """Return the k best (chunk, score) pairs for each query row, best first"""
+        if self.vectors is None or not len(queries):
+            return [[] for _ in range(len(queries))]
+
+        k = min(k, len(self.chunks))
+        scores = queries @ self.vectors.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [(self.chunks[row], float(score)) for row, score in zip(rows, row_scores)]
+            for rows, row_scores in zip(top.tolist(), top_scores.tolist())
+        ]
+
+class _UserIndex:
+    __slots__ = ("index", "versions")
+
+    def __init__(self):
+        self.index = VectorIndex()
+        # document_id -> last_modified of the indexed content, oldest indexed first
+        self.versions: Dict[str, Optional[str]] = {}
+
+class DocumentRetriever:
+    """Per-user vector indexes over the documents a user has read
+
+    Documents are re-chunked only when their modified time changes, and only
+    chunks whose text changed are embedded again.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        max_users: int = settings.RETRIEVAL_MAX_USERS,
+        ttl: float = settings.RETRIEVAL_INDEX_TTL_SECONDS,
+        max_chunks_per_user: int = settings.RETRIEVAL_MAX_CHUNKS_PER_USER
+    ):
+        self.embedder = embedder or create_embedder()
+        self._users = TTLCache(maxsize=max_users, ttl=ttl)
+        self.max_chunks_per_user = max_chunks_per_user
+        self.user_locks = KeyedLock()
+        self._stats = {
+            "documents_indexed": 0,
+            "documents_unchanged": 0,
+            "chunks_embedded": 0,
+            "chunks_reused": 0,
+            "documents_evicted": 0,
+            "index_errors": 0,
+            "searches": 0,
+            "queries": 0
+        }
+
+    def has_documents(self, user_id: str) -> bool:
+        user = self._users.get(user_id)
+        return user is not None and len(user.index) > 0
+
+    async def index_document(self, user_id: str, document: Dict[str, Any]) -> bool:
+        """Index a document read through DocumentService; returns False if it was already current"""
+        async with self.user_locks.acquire(user_id):
+            user = self._users.get(user_id)
+            if user is None:
+                user = _UserIndex()
+            # Re-set on every call so the TTL runs from the user's last read
+            self._users.set(user_id, user)
+
+            document_id = document["id"]
+            modified = document.get("last_modified")
+            if document_id in user.versions and user.versions[document_id] == modified:
+                self._stats["documents_unchanged"] += 1
+                return False
+
+            chunks = [
+                Chunk(
+                    document_id,
+                    document.get("name") or document_id,
+                    position,
+                    text,
+                    hashlib.sha1(text.encode()).hexdigest()
+                )
+                for position, text in enumerate(chunk_text(document.get("content") or ""))
+            ]
+            reusable = user.index.document_vectors(document_id)
+            missing = list(dict.fromkeys(
+                chunk.digest for chunk in chunks if chunk.digest not in reusable
+            ))
+            texts = {chunk.digest: chunk.text for chunk in chunks}
+            if missing:
+                embedded = await self.embedder.embed([texts[digest] for digest in missing])
+                reusable.update(zip(missing, embedded))
+
+            user.index.remove(document_id)
+            if chunks:
+                user.index.add(chunks, np.stack([reusable[chunk.digest] for chunk in chunks]))
+            user.versions.pop(document_id, None)
+            user.versions[document_id] = modified
+            self._evict(user)
+
+            self._stats["documents_indexed"] += 1
+            self._stats["chunks_embedded"] += len(missing)
+            self._stats["chunks_reused"] += len(chunks) - len(missing)
+            return True
+
+    async def index_documents(self, user_id: str, documents: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """Index several documents, recording failures instead of raising"""
+        result: Dict[str, List[str]] = {"indexed": [], "unchanged": [], "failed": []}
+        for document in documents:
+            try:
+                changed = await self.index_document(user_id, document)
+            except Exception:
+                self._stats["index_errors"] += 1
+                result["failed"].append(document["id"])
+                continue
+            result["indexed" if changed else "unchanged"].append(document["id"])
+        return result
+
+    def _evict(self, user: _UserIndex) -> None:
+        """Drop the least recently indexed documents until the user fits the chunk limit"""
+        while len(user.index) > self.max_chunks_per_user and len(user.versions) > 1:
+            document_id = next(iter(user.versions))
+            del user.versions[document_id]
+            user.index.remove(document_id)
+            self._stats["documents_evicted"] += 1
+
+    async def search(
+        self,
+        user_id: str,
+        queries: List[str],
+        k: int = settings.RETRIEVAL_TOP_K,
+        min_score: float = settings.RETRIEVAL_MIN_SCORE
+    ) -> List[List[Dict[str, Any]]]:
+        """Return the best matching chunks for each query, embedding all queries in one batch"""
+        user = self._users.get(user_id)
+        if user is None or not len(user.index) or not queries:
+            return [[] for _ in queries]
+
+        self._stats["searches"] += 1
+        self._stats["queries"] += len(queries)
+        vectors = await self.embedder.embed(queries)
+        return [
+            [
+                {
+                    "document_id": chunk.document_id,
+                    "document_name": chunk.document_name,
+                    "position": chunk.position,
+                    "text": chunk.text,
+                    "score": score
+                }
+                for chunk, score in matches
+                if score >= min_score
+            ]
+            for matches in user.index.search(vectors, k)
+        ]
+
+    async def build_context(
+        self,
+        user_id: str,
+        query: str,
+        token_budget: int = settings.RETRIEVAL_TOKEN_BUDGET
+    ) -> str:
+        """Render the chunks most relevant to query as a prompt section within the token budget"""
+        if not self.has_documents(user_id):
+            return ""
+
+        sections: List[str] = []
+        used = 0
+        for match in (await self.search(user_id, [query]))[0]:
+            section = f"[{match['document_name']}]\n{match['text']}"
+            cost = estimate_tokens(section)
+            if used + cost > token_budget:
+                continue
+            sections.append(section)
+            used += cost
+        if not sections:
+            return ""
+        return "Relevant excerpts from the user's documents:\n\n" + "\n\n".join(sections)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return indexing and search counters"""
+        return {
+            **self._stats,
+            "embedder": self.embedder.name,
+            "users": self._users.get_metrics()
+        }
@@ -0,0 +1,258 @@
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+import asyncio
+import json
+from config import settings
+
+class Tool:
+    """A service operation the model can call"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        parameters: Dict[str, Any],
+        handler: Callable[..., Awaitable[Any]],
+        timeout: float = settings.TOOL_TIMEOUT_SECONDS,
+        requires_confirmation: bool = False
+    ):
+        self.name = name
+        self.description = description
+        self.parameters = parameters
+        self.handler = handler
+        self.timeout = timeout
+        # Tools with side effects are proposed to the user instead of run from model output
+        self.requires_confirmation = requires_confirmation
+
+    def schema(self) -> Dict[str, Any]:
+        """Return the OpenAI function-calling definition"""
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": self.parameters
+            }
+        }
+
+class ToolRegistry:
+    """Named set of tools offered to the model for one request"""
+
+    def __init__(self, tools: Optional[List[Tool]] = None):
+        self.tools: Dict[str, Tool] = {tool.name: tool for tool in tools or []}
+
+    def register(self, tool: Tool) -> None:
+        self.tools[tool.name] = tool
+
+    def get(self, name: str) -> Optional[Tool]:
+        return self.tools.get(name)
+
+    def schemas(self) -> List[Dict[str, Any]]:
+        return [tool.schema() for tool in self.tools.values()]
+
+class ToolTurn(NamedTuple):
+    messages: List[Dict[str, str]]
+    # Calls held back for the user to confirm: {"tool", "arguments"}
+    pending_actions: List[Dict[str, Any]]
+
+class ToolExecutor:
+    """Run the tool calls of one model turn concurrently with per-tool timeouts"""
+
+    def __init__(
+        self,
+        max_calls: int = settings.TOOL_MAX_CALLS_PER_TURN,
+        max_result_chars: int = settings.TOOL_RESULT_MAX_CHARS
+    ):
+        self.max_calls = max_calls
+        self.max_result_chars = max_result_chars
+        self._stats = {"turns": 0, "calls": 0, "errors": 0, "timeouts": 0, "deferred": 0}
+
+    async def execute(self, registry: ToolRegistry, tool_calls: List[Any]) -> ToolTurn:
+        """Execute read-only tool calls in parallel, deferring the rest for confirmation"""
+        self._stats["turns"] += 1
+        tool_calls = tool_calls[:self.max_calls]
+        pending: List[Dict[str, Any]] = []
+        results = await asyncio.gather(*[
+            self._run(registry, call.function.name, call.function.arguments, pending)
+            for call in tool_calls
+        ])
+        return ToolTurn(
+            [
+                {"role": "tool", "tool_call_id": call.id, "content": result}
+                for call, result in zip(tool_calls, results)
+            ],
+            pending
+        )
+
+    async def run_confirmed(self, registry: ToolRegistry, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a call the user confirmed, returning {"result"} or {"error"}"""
+        return json.loads(await self._run(registry, name, json.dumps(arguments), confirmed=True))
+
+    async def _run(
+        self,
+        registry: ToolRegistry,
+        name: str,
+        arguments: str,
+        pending: Optional[List[Dict[str, Any]]] = None,
+        confirmed: bool = False
+    ) -> str:
+        """Run one tool call, reporting failures to the model instead of raising"""
+        self._stats["calls"] += 1
+        tool = registry.get(name)
+        if tool is None:
+            self._stats["errors"] += 1
+            return json.dumps({"error": f"Unknown tool: {name}"})
+
+        try:
+            kwargs = json.loads(arguments or "{}")
+            if tool.requires_confirmation and not confirmed:
+                self._stats["deferred"] += 1
+                if pending is not None:
+                    pending.append({"tool": name, "arguments": kwargs})
+                return json.dumps({
+                    "status": "pending_confirmation",
+                    "message": "Not executed; the user has been asked to confirm this action."
+                })
+            result = await asyncio.wait_for(tool.handler(**kwargs), timeout=tool.timeout)
+            content = json.dumps({"result": result}, default=str)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            content = json.dumps({"error": f"{name} timed out after {tool.timeout}s"})
+        except Exception as e:
+            self._stats["errors"] += 1
+            content = json.dumps({"error": str(getattr(e, "detail", e))})
+
+        if len(content) > self.max_result_chars:
+            content = content[:self.max_result_chars] + "...[truncated]"
+        return content
+
+    def get_metrics(self) -> Dict[str, int]:
+        """Return tool execution counters"""
+        return dict(self._stats)
+
+def _schema(properties: Dict[str, Any], required: List[str]) -> Dict[str, Any]:
+    return {"type": "object", "properties": properties, "required": required}
+
+_STRING = {"type": "string"}
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+def build_service_tools(
+    document_service,
+    email_service,
+    task_service,
+    on_document_read: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None
+) -> ToolRegistry:
+    """Expose the document, email and task services as model tools
+    
+    on_document_read, when given, receives every document the model reads.
+    """
+    async def read_document(document_id: str) -> Dict[str, Any]:
+        document = await document_service.read_document(document_id)
+        if on_document_read is not None:
+            await on_document_read(document)
+        return document
+
+    return ToolRegistry([
+        Tool(
+            "read_document",
+            "Read a document's content and metadata.",
+            _schema({"document_id": _STRING}, ["document_id"]),
+            read_document
+        ),
+        Tool(
+            "create_document",
+            "Create a new text document.",
+            _schema(
+                {"name": _STRING, "content": _STRING, "folder_id": _STRING},
+                ["name", "content"]
+            ),
+            document_service.create_document,
+            requires_confirmation=True
+        ),
+        Tool(
+            "update_document",
+            "Replace the content of an existing document. Set patch to send only the changed text.",
+            _schema(
+                {"document_id": _STRING, "content": _STRING, "patch": {"type": "boolean"}},
+                ["document_id", "content"]
+            ),
+            document_service.update_document,
+            requires_confirmation=True
+        ),
+        Tool(
+            "read_emails",
+            "List recent emails in a folder, optionally filtered by a search query.",
+            _schema(
+                {"folder": _STRING, "limit": {"type": "integer"}, "query": _STRING},
+                []
+            ),
+            email_service.read_emails
+        ),
+        Tool(
+            "send_email",
+            "Send an email.",
+            _schema(
+                {
+                    "to": _STRING_LIST,
+                    "subject": _STRING,
+                    "body": _STRING,
+                    "cc": _STRING_LIST,
+                    "bcc": _STRING_LIST
+                },
+                ["to", "subject", "body"]
+            ),
+            email_service.send_email,
+            requires_confirmation=True
+        ),
+        Tool(
+            "get_tasks",
+            "List tasks, optionally from a specific list or with a given status.",
+            _schema({"list_id": _STRING, "status": _STRING}, []),
+            task_service.get_tasks
+        ),
+        Tool(
+            "get_task_lists",
+            "List the user's task lists; the default list comes first.",
+            _schema({}, []),
+            task_service.get_task_lists
+        ),
+        Tool(
+            "create_task",
+            "Create a task.",
+            _schema(
+                {
+                    "title": _STRING,
+                    "description": _STRING,
+                    "due_date": _STRING,
+                    "list_id": _STRING
+                },
+                ["title"]
+            ),
+            task_service.create_task,
+            requires_confirmation=True
+        ),
+        Tool(
+            "get_calendars",
+            "List the user's calendars and which one is the default.",
+            _schema({}, []),
+            task_service.get_calendars
+        ),
+        Tool(
+            "create_event",
+            "Create a calendar event. Times are ISO 8601 in UTC. "
+            "Uses the default calendar unless calendar names another by id or name.",
+            _schema(
+                {
+                    "title": _STRING,
+                    "start_time": _STRING,
+                    "end_time": _STRING,
+                    "description": _STRING,
+                    "attendees": _STRING_LIST,
+                    "location": _STRING,
+                    "calendar": _STRING
+                },
+                ["title", "start_time", "end_time"]
+            ),
+            task_service.create_event,
+            requires_confirmation=True
+        )
+    ])
@@ -0,0 +1,25 @@
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+from typing import Any, Dict
+import asyncio
+
+def build_credentials(platform: str, token_info: Dict) -> Any:
+    """Build platform API credentials from stored OAuth token info"""
+    if platform == "google":
+        return Credentials(
+            token=token_info.get("token"),
+            refresh_token=token_info.get("refresh_token"),
+            token_uri=token_info.get("token_uri"),
+            client_id=token_info.get("client_id"),
+            client_secret=token_info.get("client_secret"),
+            scopes=token_info.get("scopes")
+        )
+    return token_info
+
+async def bearer_token(platform: str, credentials: Any) -> str:
+    """Return an access token for raw HTTP calls, refreshing Google credentials if needed"""
+    if platform == "google":
+        if not credentials.valid:
+            await asyncio.to_thread(credentials.refresh, Request())
+        return credentials.token
+    return credentials["access_token"]
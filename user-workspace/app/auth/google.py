@@ -1,6 +1,7 @@
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from google.auth.transport.requests import Request
+from google.auth import jwt
 from fastapi import HTTPException
 from typing import Dict, Optional
 import json
@@ -19,6 +20,9 @@ class GoogleAuth:
         }
         
         self.scopes = [
+            # openid/email put a stable account id (sub) in the token response
+            'openid',
+            'https://www.googleapis.com/auth/userinfo.email',
             'https://www.googleapis.com/auth/gmail.modify',
             'https://www.googleapis.com/auth/drive.file',
             'https://www.googleapis.com/auth/calendar',
@@ -56,10 +60,15 @@ class GoogleAuth:
                 redirect_uri=settings.GOOGLE_REDIRECT_URI
             )
             
-            flow.fetch_token(code=auth_code)
+            token = flow.fetch_token(code=auth_code)
             credentials = flow.credentials
             
+            # The ID token comes straight from Google's token endpoint over TLS,
+            # so its claims can be read without re-verifying the signature
+            claims = jwt.decode(token["id_token"], verify=False)
+            
             return {
+                'id_token_claims': {'sub': claims['sub'], 'email': claims.get('email')},
                 'token': credentials.token,
                 'refresh_token': credentials.refresh_token,
                 'token_uri': credentials.token_uri,
@@ -89,6 +98,7 @@ class GoogleAuth:
                 credentials.refresh(Request())
                 
                 return {
+                    'id_token_claims': token_info.get('id_token_claims'),
                     'token': credentials.token,
                     'refresh_token': credentials.refresh_token,
                     'token_uri': credentials.token_uri,
@@ -1,22 +1,38 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from typing import Dict, Optional
+from pydantic import BaseModel
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+import hashlib
 import jwt
+import orjson
+from urllib.parse import quote
 from datetime import datetime, timedelta
 
 from config import settings
 from app.auth.microsoft import MicrosoftAuth
 from app.auth.google import GoogleAuth
+from app.auth.credentials import build_credentials
 from app.ai.mcp import ModelContextProtocol
+from app.ai.tools import build_service_tools
 from app.services.document_service import DocumentService
 from app.services.email_service import EmailService
 from app.services.task_service import TaskService
+from app.services.mailbox_cache import mailbox_cache
+from app.services.email_index import email_index
+from app.services.document_cache import document_cache
+from app.services.task_metadata import task_metadata
+from app.services.bulk_email import BulkEmailJobs
+from app.tasks import enqueue_bulk_email
+from app.utils.singleflight import singleflight
+from app.utils.http import provider_http
 
 app = FastAPI(
     title="Work Production AI Agent",
-    description="AI-powered assistant for document processing, email automation, and task management"
+    description="AI-powered assistant for document processing, email automation, and task management",
+    default_response_class=ORJSONResponse
 )
 
 # Templates configuration
@@ -36,12 +52,42 @@ microsoft_auth = MicrosoftAuth()
 google_auth = GoogleAuth()
 mcp = ModelContextProtocol()
 
+@app.on_event("startup")
+async def startup():
+    """Open the local email search index"""
+    await asyncio.to_thread(email_index.open)
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close pooled upstream connections and the email search index"""
+    await mcp.close()
+    await provider_http.aclose()
+    email_index.close()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     """Health check endpoint for container orchestration"""
     return {"status": "ok"}
 
+# AI metrics endpoint
+@app.get("/ai/metrics")
+async def ai_metrics():
+    """Expose AI layer queue and concurrency metrics"""
+    return mcp.get_metrics()
+
+# Service metrics endpoint
+@app.get("/metrics/services")
+async def service_metrics():
+    """Expose request coalescing metrics for the AI layer and services"""
+    return {
+        "singleflight": singleflight.get_metrics(),
+        "mailbox_cache": mailbox_cache.get_metrics(),
+        "email_index": email_index.get_metrics(),
+        "document_cache": document_cache.get_metrics(),
+        "task_metadata": task_metadata.get_metrics()
+    }
+
 # Root route - serve the login page
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
@@ -71,6 +117,89 @@ async def get_current_user(request: Request) -> Dict:
     except jwt.JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+def get_user_id(current_user: Dict) -> str:
+    """Derive a stable per-user key from the account id in the JWT payload
+    
+    Only the provider's account id is used; tokens rotate on every login, so a
+    key derived from them would give the same user a new id each time.
+    """
+    token_info = current_user.get("token_info") or {}
+    claims = token_info.get("id_token_claims") or {}
+    subject = claims.get("oid") or claims.get("sub")
+    if not subject:
+        raise HTTPException(status_code=401, detail="Token has no account id; sign in again")
+    digest = hashlib.sha256(str(subject).encode()).hexdigest()[:32]
+    return f"{current_user['platform']}:{digest}"
+
+def get_credentials(current_user: Dict) -> Any:
+    """Build platform API credentials from the JWT token info"""
+    return build_credentials(current_user["platform"], current_user["token_info"])
+
+def get_document_service(current_user: Dict = Depends(get_current_user)) -> DocumentService:
+    """Document service for the authenticated user"""
+    return DocumentService(
+        current_user["platform"], get_credentials(current_user), user_id=get_user_id(current_user)
+    )
+
+def get_email_service(current_user: Dict = Depends(get_current_user)) -> EmailService:
+    """Email service for the authenticated user"""
+    return EmailService(
+        current_user["platform"], get_credentials(current_user), user_id=get_user_id(current_user)
+    )
+
+def get_task_service(current_user: Dict = Depends(get_current_user)) -> TaskService:
+    """Task service for the authenticated user"""
+    return TaskService(
+        current_user["platform"], get_credentials(current_user), user_id=get_user_id(current_user)
+    )
+
+# Request models
+class AIRequest(BaseModel):
+    text: str
+    context: Optional[Dict[str, Any]] = None
+    cache: bool = True
+    since_version: Optional[str] = None
+    use_tools: bool = False
+
+class ConfirmActionRequest(BaseModel):
+    tool: str
+    arguments: Dict[str, Any] = {}
+
+class BulkEmailMessage(BaseModel):
+    to: List[str]
+    subject: str
+    body: str
+    cc: Optional[List[str]] = None
+    bcc: Optional[List[str]] = None
+
+class BulkEmailRequest(BaseModel):
+    messages: List[BulkEmailMessage]
+
+class BulkReadDocumentsRequest(BaseModel):
+    document_ids: List[str]
+
+class DocumentSearchRequest(BaseModel):
+    queries: List[str]
+    k: int = settings.RETRIEVAL_TOP_K
+
+class NewDocument(BaseModel):
+    name: str
+    content: str
+    folder_id: Optional[str] = None
+
+class BulkCreateDocumentsRequest(BaseModel):
+    documents: List[NewDocument]
+
+class DocumentUpdate(BaseModel):
+    document_id: str
+    content: str
+
+class BulkUpdateDocumentsRequest(BaseModel):
+    documents: List[DocumentUpdate]
+
+class DocumentPatch(BaseModel):
+    content: str
+
 # Authentication routes
 @app.get("/auth/microsoft")
 async def microsoft_auth_url():
@@ -82,11 +211,20 @@ async def google_auth_url():
     """Get Google OAuth URL"""
     return {"url": google_auth.get_auth_url()}
 
+async def warm_task_metadata(current_user: Dict) -> None:
+    """Prefetch task lists and calendars so the user's first task request skips the lookups"""
+    try:
+        await get_task_service(current_user).warm_metadata()
+    except Exception:
+        # Warming is best effort; the first task request loads the metadata instead
+        pass
+
 @app.post("/auth/microsoft/callback")
-async def microsoft_callback(code: str):
+async def microsoft_callback(code: str, background_tasks: BackgroundTasks):
     """Handle Microsoft OAuth callback"""
     try:
         token_info = await microsoft_auth.get_token(code)
+        background_tasks.add_task(warm_task_metadata, {"platform": "microsoft", "token_info": token_info})
         access_token = create_access_token({
             "platform": "microsoft",
             "token_info": token_info
@@ -96,10 +234,11 @@ async def microsoft_callback(code: str):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/auth/google/callback")
-async def google_callback(code: str):
+async def google_callback(code: str, background_tasks: BackgroundTasks):
     """Handle Google OAuth callback"""
     try:
         token_info = await google_auth.get_token(code)
+        background_tasks.add_task(warm_task_metadata, {"platform": "google", "token_info": token_info})
         access_token = create_access_token({
             "platform": "google",
             "token_info": token_info
@@ -108,6 +247,359 @@ async def google_callback(code: str):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# AI processing routes
+@app.post("/ai/process")
+async def ai_process(body: AIRequest, current_user: Dict = Depends(get_current_user)):
+    """Process a request through the MCP and return the response"""
+    user_id = get_user_id(current_user)
+    tools = None
+    if body.use_tools:
+        tools = build_service_tools(
+            get_document_service(current_user),
+            get_email_service(current_user),
+            get_task_service(current_user),
+            # Documents the model reads become retrievable in later requests
+            on_document_read=lambda document: mcp.documents.index_documents(user_id, [document])
+        )
+    
+    result = await mcp.process_request(
+        user_id=user_id,
+        request=body.text,
+        platform=current_user["platform"],
+        additional_context=body.context,
+        use_cache=body.cache,
+        since_version=body.since_version,
+        tools=tools
+    )
+    # Returning the response directly skips jsonable_encoder; orjson handles datetimes
+    return ORJSONResponse(result)
+
+@app.post("/ai/actions/confirm")
+async def confirm_action(body: ConfirmActionRequest, current_user: Dict = Depends(get_current_user)):
+    """Run a side-effecting tool call that /ai/process returned in pending_actions"""
+    tools = build_service_tools(
+        get_document_service(current_user),
+        get_email_service(current_user),
+        get_task_service(current_user)
+    )
+    tool = tools.get(body.tool)
+    if tool is None or not tool.requires_confirmation:
+        raise HTTPException(status_code=400, detail=f"Not a confirmable action: {body.tool}")
+    return await mcp.tool_executor.run_confirmed(tools, body.tool, body.arguments)
+
+@app.post("/ai/documents/index")
+async def index_documents(
+    body: BulkReadDocumentsRequest,
+    current_user: Dict = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
+):
+    """Read documents and add them to the assistant's retrieval index"""
+    check_bulk_size(len(body.document_ids))
+    results = await document_service.read_documents(body.document_ids)
+    indexed = await mcp.documents.index_documents(get_user_id(current_user), read_results(results))
+    indexed["failed"].extend(
+        body.document_ids[result["index"]] for result in results if "error" in result
+    )
+    return indexed
+
+@app.post("/ai/documents/search")
+async def search_documents(body: DocumentSearchRequest, current_user: Dict = Depends(get_current_user)):
+    """Return the indexed document chunks that best match each query"""
+    if not body.queries or len(body.queries) > settings.DOCUMENT_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Give between 1 and {settings.DOCUMENT_BULK_MAX_ITEMS} queries"
+        )
+    if body.k < 1:
+        raise HTTPException(status_code=400, detail="k must be at least 1")
+    matches = await mcp.documents.search(get_user_id(current_user), body.queries, body.k)
+    return [{"query": query, "matches": results} for query, results in zip(body.queries, matches)]
+
+@app.post("/ai/process/stream")
+async def ai_process_stream(body: AIRequest, current_user: Dict = Depends(get_current_user)):
+    """Stream response tokens as Server-Sent Events"""
+    events = mcp.process_request_stream(
+        user_id=get_user_id(current_user),
+        request=body.text,
+        platform=current_user["platform"],
+        additional_context=body.context,
+        use_cache=body.cache
+    )
+
+    async def event_stream() -> AsyncIterator[str]:
+        async for event in events:
+            yield f"event: {event['event']}\ndata: {orjson.dumps(event['data']).decode()}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx from buffering the stream
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+# Document routes
+def check_bulk_size(count: int) -> None:
+    """Reject empty or oversized bulk document requests"""
+    if not count:
+        raise HTTPException(status_code=400, detail="No documents given")
+    if count > settings.DOCUMENT_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.DOCUMENT_BULK_MAX_ITEMS} documents per request"
+        )
+
+def read_results(results: List[Dict]) -> List[Dict]:
+    """Return the documents of the successful items of a bulk read"""
+    return [result["document"] for result in results if "document" in result]
+
+@app.post("/documents/batch/read")
+async def read_documents(
+    body: BulkReadDocumentsRequest,
+    background_tasks: BackgroundTasks,
+    current_user: Dict = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_document_service)
+):
+    """Read many documents with batched provider calls"""
+    check_bulk_size(len(body.document_ids))
+    results = await document_service.read_documents(body.document_ids)
+    # Index after responding; unchanged documents are skipped by modified time
+    background_tasks.add_task(
+        mcp.documents.index_documents, get_user_id(current_user), read_results(results)
+    )
+    return results
+
+@app.post("/documents/batch/create")
+async def create_documents(
+    body: BulkCreateDocumentsRequest,
+    document_service: DocumentService = Depends(get_document_service)
+):
+    """Create many documents with batched provider calls"""
+    check_bulk_size(len(body.documents))
+    return await document_service.create_documents(
+        [document.model_dump() for document in body.documents]
+    )
+
+@app.post("/documents/batch/update")
+async def update_documents(
+    body: BulkUpdateDocumentsRequest,
+    document_service: DocumentService = Depends(get_document_service)
+):
+    """Replace the content of many documents with batched provider calls"""
+    check_bulk_size(len(body.documents))
+    return await document_service.update_documents(
+        [document.model_dump() for document in body.documents]
+    )
+
+@app.patch("/documents/{document_id}")
+async def patch_document(
+    document_id: str,
+    body: DocumentPatch,
+    document_service: DocumentService = Depends(get_document_service)
+):
+    """Update a document, sending only the ranges that changed where the provider allows"""
+    return await document_service.update_document(document_id, body.content, patch=True)
+
+@app.get("/documents/{document_id}/content")
+async def stream_document(
+    document_id: str,
+    request: Request,
+    document_service: DocumentService = Depends(get_document_service)
+):
+    """Stream document bytes to the client, forwarding any Range header to the provider"""
+    metadata, content = await document_service.stream_document(
+        document_id, request.headers.get("range")
+    )
+    return StreamingResponse(
+        content,
+        status_code=metadata["status_code"],
+        headers=metadata["headers"]
+    )
+
+@app.post("/documents/upload")
+async def upload_document(
+    request: Request,
+    name: str,
+    folder_id: Optional[str] = None,
+    document_service: DocumentService = Depends(get_document_service)
+):
+    """Create a file from the streamed request body via a resumable upload session"""
+    size = request.headers.get("content-length")
+    if size is None:
+        raise HTTPException(status_code=411, detail="Content-Length is required")
+    
+    return await document_service.upload_document(
+        name=name,
+        content=request.stream(),
+        size=int(size),
+        mime_type=request.headers.get("content-type", "application/octet-stream"),
+        folder_id=folder_id
+    )
+
+@app.put("/documents/{document_id}/content")
+async def replace_document_content(
+    document_id: str,
+    request: Request,
+    document_service: DocumentService = Depends(get_document_service)
+):
+    """Replace a file's content from the streamed request body"""
+    size = request.headers.get("content-length")
+    if size is None:
+        raise HTTPException(status_code=411, detail="Content-Length is required")
+    
+    return await document_service.upload_document(
+        name=None,
+        content=request.stream(),
+        size=int(size),
+        mime_type=request.headers.get("content-type", "application/octet-stream"),
+        document_id=document_id
+    )
+
+# Email routes
+@app.get("/emails")
+async def read_emails(
+    folder: str = "inbox",
+    limit: int = 10,
+    query: Optional[str] = None,
+    include_body: bool = True,
+    email_service: EmailService = Depends(get_email_service)
+):
+    """Read emails from a folder"""
+    return await email_service.read_emails(folder, limit, query, include_body)
+
+@app.get("/emails/pages")
+async def read_email_page(
+    folder: str = "inbox",
+    page_size: int = 50,
+    query: Optional[str] = None,
+    include_body: bool = False,
+    cursor: Optional[str] = None,
+    email_service: EmailService = Depends(get_email_service)
+):
+    """Return one page of emails and the cursor for the next"""
+    pages = email_service.iter_email_pages(folder, page_size, query, include_body, cursor, max_pages=1)
+    try:
+        return await pages.__anext__()
+    finally:
+        await pages.aclose()
+
+@app.get("/emails/stream")
+async def stream_emails(
+    folder: str = "inbox",
+    page_size: int = 50,
+    query: Optional[str] = None,
+    include_body: bool = False,
+    cursor: Optional[str] = None,
+    max_pages: Optional[int] = None,
+    email_service: EmailService = Depends(get_email_service)
+):
+    """Stream pages as newline-delimited JSON; each line carries the cursor to resume from"""
+    async def page_stream() -> AsyncIterator[bytes]:
+        pages = email_service.iter_email_pages(folder, page_size, query, include_body, cursor, max_pages)
+        try:
+            async for page in pages:
+                yield orjson.dumps(page) + b"\n"
+        finally:
+            await pages.aclose()
+
+    return StreamingResponse(page_stream(), media_type="application/x-ndjson")
+
+@app.get("/emails/{message_id}/body")
+async def read_email_body(
+    message_id: str,
+    folder: str = "inbox",
+    email_service: EmailService = Depends(get_email_service)
+):
+    """Load a single message body on demand"""
+    return await email_service.get_email_body(message_id, folder)
+
+@app.get("/emails/{message_id}/attachments")
+async def list_email_attachments(
+    message_id: str,
+    email_service: EmailService = Depends(get_email_service)
+):
+    """List a message's attachments"""
+    return await email_service.list_attachments(message_id)
+
+@app.get("/emails/{message_id}/attachments/{attachment_id}")
+async def download_email_attachment(
+    message_id: str,
+    attachment_id: str,
+    email_service: EmailService = Depends(get_email_service)
+):
+    """Stream an attachment to the client as it arrives from the provider"""
+    metadata, content = await email_service.stream_attachment(message_id, attachment_id)
+    filename = quote(metadata["name"] or "attachment")
+    return StreamingResponse(
+        content,
+        media_type=metadata["content_type"] or "application/octet-stream",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{filename}"}
+    )
+
+@app.post("/emails/send/attachment")
+async def send_email_with_attachment(
+    request: Request,
+    to: List[str] = Query(...),
+    subject: str = Query(...),
+    body: str = Query(""),
+    filename: str = Query(...),
+    cc: Optional[List[str]] = Query(None),
+    bcc: Optional[List[str]] = Query(None),
+    email_service: EmailService = Depends(get_email_service)
+):
+    """Send an email whose request body is streamed to the provider as an attachment"""
+    size = request.headers.get("content-length")
+    if size is None:
+        raise HTTPException(status_code=411, detail="Content-Length is required")
+    
+    return await email_service.send_email_with_attachment(
+        to=to,
+        subject=subject,
+        body=body,
+        filename=filename,
+        content_type=request.headers.get("content-type", "application/octet-stream"),
+        size=int(size),
+        content=request.stream(),
+        cc=cc,
+        bcc=bcc
+    )
+
+@app.post("/emails/sync")
+async def sync_emails(
+    folder: str = "inbox",
+    email_service: EmailService = Depends(get_email_service)
+):
+    """Incrementally sync a folder into the local message cache"""
+    return await email_service.sync_mailbox(folder)
+
+@app.post("/emails/bulk")
+def send_bulk_emails(body: BulkEmailRequest, current_user: Dict = Depends(get_current_user)):
+    """Queue a batch of messages for paced background sending"""
+    if not body.messages:
+        raise HTTPException(status_code=400, detail="No messages to send")
+    if len(body.messages) > settings.BULK_EMAIL_MAX_MESSAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BULK_EMAIL_MAX_MESSAGES} messages per job"
+        )
+
+    return enqueue_bulk_email(
+        get_user_id(current_user),
+        current_user["platform"],
+        current_user["token_info"],
+        [message.model_dump() for message in body.messages]
+    )
+
+@app.get("/emails/bulk/{job_id}")
+def bulk_email_status(job_id: str, current_user: Dict = Depends(get_current_user)):
+    """Report progress and throughput for a bulk-send job"""
+    job = BulkEmailJobs().get(job_id)
+    if job is None or job["user_id"] != get_user_id(current_user):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
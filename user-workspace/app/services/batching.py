@@ -0,0 +1,84 @@
+from typing import Any, Awaitable, Callable, Dict, List, TypeVar
+import asyncio
+from config import settings
+from app.utils.http import provider_http, GRAPH_API_URL
+
+T = TypeVar("T")
+
+# Graph rejects JSON batches with more than 20 sub-requests
+GRAPH_BATCH_LIMIT = 20
+
+async def graph_batch(requests: List[Dict[str, Any]], access_token: str) -> List[Dict[str, Any]]:
+    """Run Graph sub-requests through JSON $batch and return their responses in input order
+    
+    Each request is a dict with method, url (relative to /v1.0) and optional headers
+    and body. Batches of GRAPH_BATCH_LIMIT are sent concurrently; throttled items are
+    retried after their Retry-After. Responses have status, headers and body.
+    """
+    responses: Dict[int, Dict[str, Any]] = {}
+    pending = list(range(len(requests)))
+    
+    for attempt in range(settings.GRAPH_BATCH_MAX_RETRIES + 1):
+        batches = [
+            pending[start:start + GRAPH_BATCH_LIMIT]
+            for start in range(0, len(pending), GRAPH_BATCH_LIMIT)
+        ]
+        results = await asyncio.gather(*[
+            _send_graph_batch(requests, indexes, access_token) for indexes in batches
+        ])
+        
+        throttled, retry_after = [], 0.0
+        for batch_responses in results:
+            for index, response in batch_responses.items():
+                responses[index] = response
+                if response["status"] == 429:
+                    throttled.append(index)
+                    retry_after = max(retry_after, float(response["headers"].get("Retry-After", 1)))
+        if not throttled or attempt == settings.GRAPH_BATCH_MAX_RETRIES:
+            break
+        pending = throttled
+        await asyncio.sleep(min(retry_after, 30))
+    
+    return [responses[index] for index in range(len(requests))]
+
+async def _send_graph_batch(
+    requests: List[Dict[str, Any]],
+    indexes: List[int],
+    access_token: str
+) -> Dict[int, Dict[str, Any]]:
+    """POST one $batch and map each sub-response back to its request index"""
+    payload = {"requests": [{**requests[index], "id": str(index)} for index in indexes]}
+    response = await provider_http.client.post(
+        f"{GRAPH_API_URL}/$batch",
+        json=payload,
+        headers={"Authorization": f"Bearer {access_token}"}
+    )
+    response.raise_for_status()
+    return {
+        int(item["id"]): {
+            "status": item["status"],
+            "headers": item.get("headers") or {},
+            "body": item.get("body")
+        }
+        for item in response.json()["responses"]
+    }
+
+async def gather_limited(
+    calls: List[Callable[[], Awaitable[T]]],
+    limit: int = settings.DOCUMENT_BULK_CONCURRENCY
+) -> List[Any]:
+    """Run calls concurrently, at most limit at a time, returning results or exceptions"""
+    semaphore = asyncio.Semaphore(limit)
+    
+    async def run(call: Callable[[], Awaitable[T]]) -> T:
+        async with semaphore:
+            return await call()
+    
+    return await asyncio.gather(*[run(call) for call in calls], return_exceptions=True)
+
+def graph_error(response: Dict[str, Any]) -> str:
+    """Error message from a failed Graph sub-response"""
+    body = response.get("body")
+    if isinstance(body, dict) and "error" in body:
+        return f"{response['status']}: {body['error'].get('message', body['error'])}"
+    return f"{response['status']}: request failed"
@@ -0,0 +1,134 @@
+from typing import Any, Dict, List, Optional, Set
+import json
+import time
+import uuid
+import redis
+from config import settings
+
+class BulkEmailJobs:
+    """Progress tracking for bulk-send jobs, shared between the API and Celery workers"""
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis = redis_client or redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+    def _key(self, job_id: str) -> str:
+        return f"bulk:job:{job_id}"
+
+    def create(self, user_id: str, total: int, chunks: int) -> str:
+        """Register a new job and return its id"""
+        job_id = uuid.uuid4().hex
+        key = self._key(job_id)
+        self.redis.hset(key, mapping={
+            "user_id": user_id,
+            "total": total,
+            "chunks": chunks,
+            "chunks_done": 0,
+            "sent": 0,
+            "failed": 0,
+            "created_at": time.time()
+        })
+        self.redis.expire(key, settings.BULK_EMAIL_JOB_TTL_SECONDS)
+        return job_id
+
+    def store_token(self, job_id: str, token_info: Dict) -> str:
+        """Keep a job's OAuth tokens in Redis and return an opaque reference for its tasks
+        
+        Task arguments sit in the broker, so they carry only this reference; the
+        app's client id and secret are never stored and come from settings.
+        """
+        token_ref = uuid.uuid4().hex
+        stored = {k: v for k, v in token_info.items() if k not in ("client_id", "client_secret")}
+        self.save_token(token_ref, stored)
+        self.redis.hset(self._key(job_id), "token_ref", token_ref)
+        return token_ref
+
+    def save_token(self, token_ref: str, token_info: Dict) -> None:
+        """Replace stored tokens, e.g. after a refresh rotated them"""
+        self.redis.set(f"bulk:token:{token_ref}", json.dumps(token_info), ex=settings.BULK_EMAIL_JOB_TTL_SECONDS)
+
+    def load_token(self, token_ref: str) -> Optional[Dict]:
+        token_info = self.redis.get(f"bulk:token:{token_ref}")
+        return json.loads(token_info) if token_info else None
+
+    def mark_started(self, job_id: str) -> None:
+        self.redis.hsetnx(self._key(job_id), "started_at", time.time())
+
+    def completed_indexes(self, job_id: str) -> Set[int]:
+        """Return indexes of messages already sent or given up on"""
+        return {int(index) for index in self.redis.smembers(f"{self._key(job_id)}:done")}
+
+    def _complete(self, job_id: str, index: int) -> bool:
+        """Mark a message handled; False if a previous delivery of its chunk already did"""
+        done = f"{self._key(job_id)}:done"
+        if not self.redis.sadd(done, index):
+            return False
+        self.redis.expire(done, settings.BULK_EMAIL_JOB_TTL_SECONDS)
+        return True
+
+    def record_sent(self, job_id: str, index: int) -> None:
+        if not self._complete(job_id, index):
+            return
+        key = self._key(job_id)
+        pipe = self.redis.pipeline()
+        pipe.hincrby(key, "sent", 1)
+        pipe.hset(key, "updated_at", time.time())
+        pipe.execute()
+
+    def record_failure(self, job_id: str, index: int, error: str) -> None:
+        if not self._complete(job_id, index):
+            return
+        key = self._key(job_id)
+        pipe = self.redis.pipeline()
+        pipe.hincrby(key, "failed", 1)
+        pipe.hset(key, "updated_at", time.time())
+        # Keep the first failures for diagnosis without unbounded growth
+        pipe.rpush(f"{key}:errors", f"{index}: {error}")
+        pipe.ltrim(f"{key}:errors", 0, 99)
+        pipe.expire(f"{key}:errors", settings.BULK_EMAIL_JOB_TTL_SECONDS)
+        pipe.execute()
+
+    def finish_chunk(self, job_id: str, offset: int) -> None:
+        """Count a chunk as done once, however many times it was delivered"""
+        key = self._key(job_id)
+        if self.redis.sadd(f"{key}:chunks", offset):
+            self.redis.expire(f"{key}:chunks", settings.BULK_EMAIL_JOB_TTL_SECONDS)
+            done = self.redis.hincrby(key, "chunks_done", 1)
+            # Nothing is left to send, so the tokens need not outlive the job
+            token_ref = self.redis.hget(key, "token_ref")
+            if token_ref and done >= int(self.redis.hget(key, "chunks") or 0):
+                self.redis.delete(f"bulk:token:{token_ref}")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return progress and throughput for a job"""
+        job = self.redis.hgetall(self._key(job_id))
+        if not job:
+            return None
+
+        total, sent, failed = int(job["total"]), int(job["sent"]), int(job["failed"])
+        started_at = float(job.get("started_at", 0)) or None
+        updated_at = float(job.get("updated_at", 0)) or None
+        elapsed = (updated_at - started_at) if started_at and updated_at else 0.0
+
+        if int(job["chunks_done"]) >= int(job["chunks"]):
+            status = "completed"
+        elif started_at:
+            status = "running"
+        else:
+            status = "queued"
+
+        return {
+            "job_id": job_id,
+            "user_id": job["user_id"],
+            "status": status,
+            "total": total,
+            "sent": sent,
+            "failed": failed,
+            "progress": (sent + failed) / total if total else 1.0,
+            "elapsed_seconds": elapsed,
+            "throughput_per_second": sent / elapsed if elapsed else 0.0,
+            "errors": self.redis.lrange(f"{self._key(job_id)}:errors", 0, 99)
+        }
+
+def chunk_messages(messages: List[Dict], size: int) -> List[List[Dict]]:
+    """Split a batch into fixed-size chunks"""
+    return [messages[start:start + size] for start in range(0, len(messages), size)]
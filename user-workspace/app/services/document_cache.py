@@ -0,0 +1,63 @@
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from config import settings
+from app.utils.cache import TTLCache
+
+class CachedDocument(NamedTuple):
+    document: Dict
+    # Graph eTag or Drive version of the cached metadata
+    version: str
+    # Graph cTag; lets a metadata-only change (e.g. a rename) reuse cached content
+    content_tag: Optional[str] = None
+
+class DocumentCache:
+    """Process-wide LRU of read documents keyed by (user, platform, document_id)
+    
+    Entries never expire on their own; every read revalidates them against the
+    provider, so a hit saves the content transfer rather than the round trip.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.DOCUMENT_CACHE_MAX_ENTRIES,
+        max_document_bytes: int = settings.DOCUMENT_CACHE_MAX_DOCUMENT_BYTES
+    ):
+        self._entries = TTLCache(maxsize=max_entries)
+        self.max_document_bytes = max_document_bytes
+        self._stats = {
+            "revalidations": 0,
+            "not_modified": 0,
+            "modified": 0,
+            "content_reused": 0,
+            "bytes_saved": 0
+        }
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[CachedDocument]:
+        return self._entries.get(key)
+
+    def set(self, key: Tuple[str, str, str], entry: CachedDocument) -> None:
+        """Cache a document unless its content is too large to keep"""
+        if len((entry.document.get("content") or "").encode()) > self.max_document_bytes:
+            self._entries.pop(key)
+            return
+        self._entries.set(key, entry)
+
+    def invalidate(self, key: Tuple[str, str, str]) -> None:
+        self._entries.pop(key)
+
+    def record_revalidation(self, entry: CachedDocument, modified: bool, content_reused: bool = False) -> None:
+        """Count a conditional read and the content bytes it avoided transferring"""
+        self._stats["revalidations"] += 1
+        self._stats["modified" if modified else "not_modified"] += 1
+        if not modified or content_reused:
+            self._stats["content_reused"] += 1
+            self._stats["bytes_saved"] += len((entry.document.get("content") or "").encode())
+
+    def get_metrics(self) -> Dict[str, Any]:
+        revalidations = self._stats["revalidations"]
+        return {
+            **self._stats,
+            "revalidation_hit_rate": self._stats["not_modified"] / revalidations if revalidations else 0.0,
+            "entries": self._entries.get_metrics()
+        }
+
+document_cache = DocumentCache()
@@ -1,18 +1,48 @@
-from typing import Dict, List, Optional, BinaryIO
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import base64
-from datetime import datetime
+from urllib.parse import quote
 from fastapi import HTTPException
 import httpx
 from microsoft.graph import GraphServiceClient
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseUpload
 import io
+import asyncio
+import json
+import logging
+import uuid
+from config import settings
+from app.auth.credentials import bearer_token
+from app.services.uploads import ResumableUpload
+from app.services.document_cache import document_cache, CachedDocument
+from app.services.batching import graph_batch, gather_limited, graph_error
+from app.utils.google_api import execute, execute_sync
+from app.utils.http import provider_http, ProviderHTTPError, GRAPH_API_URL
+from app.utils.singleflight import singleflight, make_key
+from app.utils.streams import iter_chunks, single_byte_range
+from app.utils.text_diff import diff_ranges, docs_update_requests, utf16_length
+
+DRIVE_API_URL = "https://www.googleapis.com/drive/v3"
+DRIVE_UPLOAD_URL = "https://www.googleapis.com/upload/drive/v3"
+DOCS_API_URL = "https://docs.googleapis.com/v1"
+# Provider response headers relayed to streaming clients
+STREAM_HEADERS = ("content-type", "content-length", "content-range", "etag", "last-modified")
+GRAPH_DOCUMENT_FIELDS = "id,name,eTag,cTag,lastModifiedDateTime,createdDateTime,webUrl"
+GOOGLE_DOCUMENT_FIELDS = "id,name,version,modifiedTime,createdTime,webViewLink"
+GOOGLE_WRITE_FIELDS = "id,name,webViewLink,modifiedTime"
+GOOGLE_DOC_MIME_TYPE = "application/vnd.google-apps.document"
+
+logger = logging.getLogger(__name__)
 
 class DocumentService:
-    def __init__(self, platform: str, credentials: Dict):
+    def __init__(self, platform: str, credentials: Dict, user_id: str):
         """Initialize document service for specified platform"""
         self.platform = platform
         self.credentials = credentials
+        # Keys the process-wide caches and request coalescing, so it must identify the account
+        if not user_id:
+            raise ValueError("user_id is required")
+        self.user_id = user_id
         self._init_client()
 
     def _init_client(self):
@@ -32,6 +62,11 @@ class DocumentService:
 
     async def read_document(self, document_id: str) -> Dict:
         """Read document content from specified platform"""
+        key = make_key(self.user_id, "document.read_document", self.platform, document_id)
+        return await singleflight.do(key, lambda: self._read_document(document_id))
+
+    async def _read_document(self, document_id: str) -> Dict:
+        """Read document content, raising HTTPException on failure"""
         try:
             if self.platform == "microsoft":
                 return await self._read_microsoft_document(document_id)
@@ -64,53 +99,377 @@ class DocumentService:
     async def update_document(
         self,
         document_id: str,
-        content: str
+        content: str,
+        patch: bool = False
     ) -> Dict:
-        """Update existing document on specified platform"""
+        """Update existing document on specified platform
+        
+        With patch, only the ranges that changed since the cached copy are sent,
+        where the provider can apply them; otherwise the whole content is uploaded.
+        The result's "transfer" reports the bytes sent against the full upload size.
+        """
         try:
+            key = self._cache_key(document_id)
+            cached = document_cache.get(key) if patch else None
+            document_cache.invalidate(key)
+            
+            full_size = len(content.encode())
+            if cached is not None and self.platform == "google":
+                result = await self._patch_google_document(document_id, content, cached)
+                if result is not None:
+                    return result
+            
             if self.platform == "microsoft":
-                return await self._update_microsoft_document(document_id, content)
+                # Graph has no partial content writes for drive items
+                result = await self._update_microsoft_document(document_id, content)
             elif self.platform == "google":
-                return await self._update_google_document(document_id, content)
+                result = await self._update_google_document(document_id, content)
+            return {**result, "transfer": self._transfer("full", full_size, full_size)}
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to update document: {str(e)}"
             )
 
+    def _transfer(self, mode: str, bytes_sent: int, full_size: int) -> Dict:
+        return {"mode": mode, "bytes_sent": bytes_sent, "full_size": full_size}
+
+    async def read_documents(self, document_ids: List[str]) -> List[Dict]:
+        """Read many documents, batching the metadata calls
+        
+        Returns one result per id, in order: {"index", "status", "document"} on success
+        or {"index", "status", "error"} for an item that failed.
+        """
+        try:
+            if self.platform == "microsoft":
+                return await self._read_microsoft_documents(document_ids)
+            elif self.platform == "google":
+                return await self._read_google_documents(document_ids)
+            else:
+                raise ValueError(f"Unsupported platform: {self.platform}")
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to read documents: {str(e)}"
+            )
+
+    async def create_documents(self, documents: List[Dict]) -> List[Dict]:
+        """Create many documents from {name, content, folder_id} dicts, with per-item results"""
+        try:
+            if self.platform == "microsoft":
+                return await self._write_microsoft_documents(documents, create=True)
+            elif self.platform == "google":
+                return await self._write_google_documents(documents, create=True)
+            else:
+                raise ValueError(f"Unsupported platform: {self.platform}")
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to create documents: {str(e)}"
+            )
+
+    async def update_documents(self, updates: List[Dict]) -> List[Dict]:
+        """Replace the content of many documents from {document_id, content} dicts"""
+        try:
+            for update in updates:
+                document_cache.invalidate(self._cache_key(update["document_id"]))
+            if self.platform == "microsoft":
+                return await self._write_microsoft_documents(updates, create=False)
+            elif self.platform == "google":
+                return await self._write_google_documents(updates, create=False)
+            else:
+                raise ValueError(f"Unsupported platform: {self.platform}")
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to update documents: {str(e)}"
+            )
+
+    async def stream_document(
+        self,
+        document_id: str,
+        byte_range: Optional[str] = None
+    ) -> Tuple[Dict, AsyncIterator[bytes]]:
+        """Open document content for streaming, honouring a single-range HTTP Range header
+        
+        Returns the status code and headers to relay plus an iterator yielding the body
+        in DOCUMENT_STREAM_CHUNK_SIZE pieces as it arrives. Ranges are forwarded to the
+        provider so only the requested bytes are transferred.
+        """
+        try:
+            byte_range = single_byte_range(byte_range)
+            if self.platform == "microsoft":
+                return await self._stream_microsoft_document(document_id, byte_range)
+            elif self.platform == "google":
+                return await self._stream_google_document(document_id, byte_range)
+            else:
+                raise ValueError(f"Unsupported platform: {self.platform}")
+        except ProviderHTTPError as e:
+            if e.status_code in (404, 416):
+                raise HTTPException(status_code=e.status_code, detail=str(e))
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to stream document: {str(e)}"
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to stream document: {str(e)}"
+            )
+
+    async def _stream_microsoft_document(
+        self,
+        document_id: str,
+        byte_range: Optional[str]
+    ) -> Tuple[Dict, AsyncIterator[bytes]]:
+        """Stream a drive item; Graph redirects to a download URL that serves ranges"""
+        headers = {"Authorization": f"Bearer {self.credentials['access_token']}"}
+        if byte_range:
+            headers["Range"] = byte_range
+        
+        # httpx drops the Authorization header on the cross-host redirect
+        response = await provider_http.open(
+            "GET",
+            f"{GRAPH_API_URL}/me/drive/items/{document_id}/content",
+            follow_redirects=True,
+            headers=headers
+        )
+        return (
+            self._stream_metadata(response, accept_ranges=True),
+            provider_http.iter_bytes(response, settings.DOCUMENT_STREAM_CHUNK_SIZE)
+        )
+
+    async def _stream_google_document(
+        self,
+        document_id: str,
+        byte_range: Optional[str]
+    ) -> Tuple[Dict, AsyncIterator[bytes]]:
+        """Stream a Drive file's bytes, or a plain-text export for native Google formats"""
+        file = await execute(self.client.files().get(fileId=document_id, fields='id,mimeType'))
+        headers = {"Authorization": f"Bearer {await bearer_token(self.platform, self.credentials)}"}
+        
+        if file['mimeType'].startswith('application/vnd.google-apps.'):
+            # Native formats have no stored bytes and exports ignore Range; send it whole
+            response = await provider_http.open(
+                "GET",
+                f"{DRIVE_API_URL}/files/{document_id}/export",
+                params={"mimeType": "text/plain"},
+                headers=headers
+            )
+            accept_ranges = False
+        else:
+            if byte_range:
+                headers["Range"] = byte_range
+            response = await provider_http.open(
+                "GET",
+                f"{DRIVE_API_URL}/files/{document_id}",
+                params={"alt": "media"},
+                headers=headers
+            )
+            accept_ranges = True
+        
+        return (
+            self._stream_metadata(response, accept_ranges),
+            provider_http.iter_bytes(response, settings.DOCUMENT_STREAM_CHUNK_SIZE)
+        )
+
+    def _stream_metadata(self, response: httpx.Response, accept_ranges: bool) -> Dict:
+        """Status and headers to relay for a streamed provider response"""
+        headers = {name: response.headers[name] for name in STREAM_HEADERS if name in response.headers}
+        # Bodies are relayed decoded, so an encoded length would be wrong
+        if "content-encoding" in response.headers:
+            headers.pop("content-length", None)
+        headers["accept-ranges"] = "bytes" if accept_ranges else "none"
+        return {"status_code": response.status_code, "headers": headers}
+
+    async def upload_document(
+        self,
+        name: Optional[str],
+        content: AsyncIterator[bytes],
+        size: int,
+        mime_type: str = "application/octet-stream",
+        folder_id: Optional[str] = None,
+        document_id: Optional[str] = None
+    ) -> Dict:
+        """Upload a file through a resumable session, creating it or replacing document_id
+        
+        Content is sent in DOCUMENT_UPLOAD_CHUNK_SIZE pieces, so memory use is bounded
+        by the chunk size rather than the file size.
+        """
+        try:
+            if document_id:
+                document_cache.invalidate(self._cache_key(document_id))
+            return await self._resumable_upload(
+                name, content, size, mime_type, folder_id, document_id
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to upload document: {str(e)}"
+            )
+
+    async def _resumable_upload(
+        self,
+        name: Optional[str],
+        content: AsyncIterator[bytes],
+        size: int,
+        mime_type: str,
+        folder_id: Optional[str] = None,
+        document_id: Optional[str] = None,
+        convert: bool = False
+    ) -> Dict:
+        """Open an upload session on the platform and send content through it"""
+        if self.platform == "microsoft":
+            session_url = await self._start_microsoft_upload_session(name, folder_id, document_id)
+            item = await ResumableUpload(self.platform, session_url, size).upload(content)
+            return {
+                "id": item.get("id", document_id),
+                "name": item.get("name", name),
+                "web_url": item.get("webUrl"),
+                "last_modified": item.get("lastModifiedDateTime")
+            }
+        elif self.platform == "google":
+            headers = {"Authorization": f"Bearer {await bearer_token(self.platform, self.credentials)}"}
+            session_url = await self._start_google_upload_session(
+                headers, name, size, mime_type, folder_id, document_id, convert
+            )
+            file = await ResumableUpload(self.platform, session_url, size, headers).upload(content)
+            return {
+                "id": file.get("id", document_id),
+                "name": file.get("name", name),
+                "web_url": file.get("webViewLink"),
+                "last_modified": file.get("modifiedTime")
+            }
+        else:
+            raise ValueError(f"Unsupported platform: {self.platform}")
+
+    async def _start_microsoft_upload_session(
+        self,
+        name: Optional[str],
+        folder_id: Optional[str],
+        document_id: Optional[str]
+    ) -> str:
+        """Create a Graph upload session for a new or existing drive item"""
+        if document_id:
+            url = f"{GRAPH_API_URL}/me/drive/items/{document_id}/createUploadSession"
+            conflict_behavior = "replace"
+        else:
+            parent = f"items/{folder_id}" if folder_id else "root"
+            url = f"{GRAPH_API_URL}/me/drive/{parent}:/{quote(name)}:/createUploadSession"
+            conflict_behavior = "rename"
+        
+        response = await provider_http.client.post(
+            url,
+            json={"item": {"@microsoft.graph.conflictBehavior": conflict_behavior}},
+            headers={"Authorization": f"Bearer {self.credentials['access_token']}"}
+        )
+        response.raise_for_status()
+        return response.json()["uploadUrl"]
+
+    async def _start_google_upload_session(
+        self,
+        headers: Dict[str, str],
+        name: Optional[str],
+        size: int,
+        mime_type: str,
+        folder_id: Optional[str],
+        document_id: Optional[str],
+        convert: bool
+    ) -> str:
+        """Create a Drive resumable upload session for a new or existing file"""
+        metadata = {}
+        if not document_id:
+            metadata["name"] = name
+            if folder_id:
+                metadata["parents"] = [folder_id]
+            if convert:
+                metadata["mimeType"] = GOOGLE_DOC_MIME_TYPE
+        
+        response = await provider_http.client.request(
+            "PATCH" if document_id else "POST",
+            f"{DRIVE_UPLOAD_URL}/files/{document_id}" if document_id else f"{DRIVE_UPLOAD_URL}/files",
+            params={"uploadType": "resumable", "fields": "id,name,webViewLink,modifiedTime"},
+            json=metadata,
+            headers={
+                **headers,
+                "X-Upload-Content-Type": mime_type,
+                "X-Upload-Content-Length": str(size)
+            }
+        )
+        response.raise_for_status()
+        return response.headers["Location"]
+
     async def _read_microsoft_document(self, document_id: str) -> Dict:
-        """Read document from Microsoft 365"""
+        """Read document from Microsoft 365, revalidating any cached copy by ETag"""
         try:
-            # Get the document content
-            response = await self.client.drive.items[document_id].content.get()
+            key = self._cache_key(document_id)
+            cached = document_cache.get(key)
+            headers = {"Authorization": f"Bearer {self.credentials['access_token']}"}
+            item_url = f"{GRAPH_API_URL}/me/drive/items/{document_id}"
+            params = {"$select": GRAPH_DOCUMENT_FIELDS}
             
-            # Get document metadata
-            metadata = await self.client.drive.items[document_id].get()
+            if cached is None:
+                # Nothing to revalidate; fetch metadata and content concurrently
+                item_response, content_response = await asyncio.gather(
+                    provider_http.client.get(item_url, params=params, headers=headers),
+                    provider_http.client.get(f"{item_url}/content", headers=headers, follow_redirects=True)
+                )
+                item_response.raise_for_status()
+                content_response.raise_for_status()
+                content = content_response.text
+            else:
+                item_response = await provider_http.client.get(
+                    item_url,
+                    params=params,
+                    headers={**headers, "If-None-Match": cached.version}
+                )
+                if item_response.status_code == 304:
+                    document_cache.record_revalidation(cached, modified=False)
+                    return cached.document
+                item_response.raise_for_status()
+                
+                # Metadata changed; content only transfers if the cTag moved too
+                content_response = await provider_http.client.get(
+                    f"{item_url}/content",
+                    headers={**headers, "If-None-Match": cached.content_tag or ""},
+                    follow_redirects=True
+                )
+                content_reused = content_response.status_code == 304
+                if content_reused:
+                    content = cached.document["content"]
+                else:
+                    content_response.raise_for_status()
+                    content = content_response.text
+                document_cache.record_revalidation(cached, modified=True, content_reused=content_reused)
             
-            return {
-                "id": document_id,
-                "name": metadata.name,
-                "content": response.text(),
-                "last_modified": metadata.last_modified_date_time,
-                "created": metadata.created_date_time,
-                "web_url": metadata.web_url
-            }
+            return self._cache_microsoft_document(key, item_response.json(), content)
         except Exception as e:
             raise Exception(f"Error reading Microsoft document: {str(e)}")
 
     async def _read_google_document(self, document_id: str) -> Dict:
-        """Read document from Google Drive"""
+        """Read document from Google Drive, re-exporting only when its version changed"""
         try:
-            # Get document metadata
-            file = self.client.files().get(fileId=document_id).execute()
+            key = self._cache_key(document_id)
+            cached = document_cache.get(key)
+            
+            # Get document metadata; Drive v3 has no file ETags, so version is compared instead
+            file = await execute(self.client.files().get(
+                fileId=document_id,
+                fields=GOOGLE_DOCUMENT_FIELDS
+            ))
+            if cached is not None:
+                modified = cached.version != file['version']
+                document_cache.record_revalidation(cached, modified=modified)
+                if not modified:
+                    return cached.document
             
             # Get document content
-            content = self.client.files().export(
+            content = await execute(self.client.files().export(
                 fileId=document_id,
                 mimeType='text/plain'
-            ).execute()
+            ))
             
-            return {
+            document = {
                 "id": document_id,
                 "name": file['name'],
                 "content": content.decode('utf-8'),
@@ -118,9 +477,368 @@ class DocumentService:
                 "created": file['createdTime'],
                 "web_url": file['webViewLink']
             }
+            document_cache.set(key, CachedDocument(document, file['version']))
+            return document
         except Exception as e:
             raise Exception(f"Error reading Google document: {str(e)}")
 
+    def _cache_key(self, document_id: str) -> Tuple[str, str, str]:
+        return (self.user_id, self.platform, document_id)
+
+    def _cache_microsoft_document(self, key: Tuple[str, str, str], item: Dict, content: str) -> Dict:
+        """Build a document from a Graph item and its content, caching it for revalidation"""
+        document = {
+            "id": item["id"],
+            "name": item["name"],
+            "content": content,
+            "last_modified": item["lastModifiedDateTime"],
+            "created": item["createdDateTime"],
+            "web_url": item["webUrl"]
+        }
+        document_cache.set(key, CachedDocument(document, item["eTag"], item.get("cTag")))
+        return document
+
+    def _cache_google_document(self, key: Tuple[str, str, str], file: Dict, content: str) -> Dict:
+        """Build a document from Drive metadata and exported text, caching it by version"""
+        document = {
+            "id": file['id'],
+            "name": file['name'],
+            "content": content,
+            "last_modified": file['modifiedTime'],
+            "created": file['createdTime'],
+            "web_url": file['webViewLink']
+        }
+        document_cache.set(key, CachedDocument(document, file['version']))
+        return document
+
+    async def _read_microsoft_documents(self, document_ids: List[str]) -> List[Dict]:
+        """Read documents with one $batch call per 20 ids, then download changed content"""
+        keys = [self._cache_key(document_id) for document_id in document_ids]
+        cached = [document_cache.get(key) for key in keys]
+        
+        # One metadata sub-request per document; downloadUrl avoids a /content redirect each
+        requests = []
+        for document_id, entry in zip(document_ids, cached):
+            request = {
+                "method": "GET",
+                "url": f"/me/drive/items/{document_id}"
+                       f"?$select={GRAPH_DOCUMENT_FIELDS},@microsoft.graph.downloadUrl"
+            }
+            if entry is not None:
+                request["headers"] = {"If-None-Match": entry.version}
+            requests.append(request)
+        responses = await graph_batch(requests, self.credentials['access_token'])
+        
+        results: List[Optional[Dict]] = [None] * len(document_ids)
+        downloads: List[Tuple[int, Dict]] = []
+        for index, (response, entry) in enumerate(zip(responses, cached)):
+            if response["status"] == 304 and entry is not None:
+                document_cache.record_revalidation(entry, modified=False)
+                results[index] = {"index": index, "status": 200, "document": entry.document}
+            elif response["status"] == 200:
+                item = response["body"]
+                if entry is not None:
+                    content_reused = entry.content_tag is not None and entry.content_tag == item.get("cTag")
+                    document_cache.record_revalidation(entry, modified=True, content_reused=content_reused)
+                    if content_reused:
+                        document = self._cache_microsoft_document(keys[index], item, entry.document["content"])
+                        results[index] = {"index": index, "status": 200, "document": document}
+                        continue
+                if not item.get("@microsoft.graph.downloadUrl"):
+                    # Folders and OneNote notebooks have no file content to download
+                    results[index] = {"index": index, "status": 422, "error": "Item has no downloadable content"}
+                    continue
+                downloads.append((index, item))
+            else:
+                results[index] = {"index": index, "status": response["status"], "error": graph_error(response)}
+        
+        contents = await gather_limited([
+            lambda url=item.get("@microsoft.graph.downloadUrl"): self._download_text(url)
+            for _, item in downloads
+        ])
+        for (index, item), content in zip(downloads, contents):
+            if isinstance(content, Exception):
+                results[index] = {"index": index, "status": 502, "error": str(content)}
+            else:
+                document = self._cache_microsoft_document(keys[index], item, content)
+                results[index] = {"index": index, "status": 200, "document": document}
+        return results
+
+    async def _read_google_documents(self, document_ids: List[str]) -> List[Dict]:
+        """Read documents with Drive batch metadata calls, exporting only changed ones"""
+        keys = [self._cache_key(document_id) for document_id in document_ids]
+        files = await asyncio.to_thread(self._batch_get_google_files, document_ids)
+        
+        results: List[Optional[Dict]] = [None] * len(document_ids)
+        exports: List[Tuple[int, Dict]] = []
+        for index, file in enumerate(files):
+            if isinstance(file, Exception):
+                status = getattr(getattr(file, "resp", None), "status", 500)
+                results[index] = {"index": index, "status": status, "error": str(file)}
+                continue
+            entry = document_cache.get(keys[index])
+            if entry is not None:
+                modified = entry.version != file['version']
+                document_cache.record_revalidation(entry, modified=modified)
+                if not modified:
+                    results[index] = {"index": index, "status": 200, "document": entry.document}
+                    continue
+            exports.append((index, file))
+        
+        # Drive batches cannot carry media, so exports run concurrently instead
+        headers = {"Authorization": f"Bearer {await bearer_token(self.platform, self.credentials)}"}
+        contents = await gather_limited([
+            lambda file_id=file['id']: self._download_text(
+                f"{DRIVE_API_URL}/files/{file_id}/export",
+                params={"mimeType": "text/plain"},
+                headers=headers
+            )
+            for _, file in exports
+        ])
+        for (index, file), content in zip(exports, contents):
+            if isinstance(content, Exception):
+                results[index] = {"index": index, "status": 502, "error": str(content)}
+            else:
+                document = self._cache_google_document(keys[index], file, content)
+                results[index] = {"index": index, "status": 200, "document": document}
+        return results
+
+    def _batch_get_google_files(self, document_ids: List[str]) -> List[Any]:
+        """Fetch Drive metadata through batch requests; failed items come back as exceptions"""
+        results: Dict[str, Any] = {}
+        
+        def collect(request_id, response, exception):
+            results[request_id] = exception if exception is not None else response
+        
+        batch_size = settings.DRIVE_BATCH_SIZE
+        for start in range(0, len(document_ids), batch_size):
+            batch = self.client.new_batch_http_request(callback=collect)
+            for index in range(start, min(start + batch_size, len(document_ids))):
+                batch.add(
+                    self.client.files().get(fileId=document_ids[index], fields=GOOGLE_DOCUMENT_FIELDS),
+                    request_id=str(index)
+                )
+            execute_sync(batch)
+        return [results[str(index)] for index in range(len(document_ids))]
+
+    async def _download_text(self, url: str, **kwargs) -> str:
+        response = await provider_http.client.get(url, **kwargs)
+        response.raise_for_status()
+        return response.text
+
+    async def _write_microsoft_documents(self, documents: List[Dict], create: bool) -> List[Dict]:
+        """Create or overwrite documents with $batch simple uploads, 20 per call
+        
+        Content above GRAPH_BATCH_INLINE_LIMIT is too large to inline in a batch and is
+        written individually instead.
+        """
+        results: List[Optional[Dict]] = [None] * len(documents)
+        batched: List[int] = []
+        requests = []
+        for index, document in enumerate(documents):
+            data = document["content"].encode()
+            if len(data) > settings.GRAPH_BATCH_INLINE_LIMIT:
+                continue
+            if create:
+                parent = f"items/{document['folder_id']}" if document.get("folder_id") else "root"
+                url = (f"/me/drive/{parent}:/{quote(document['name'])}:/content"
+                       "?@microsoft.graph.conflictBehavior=rename")
+            else:
+                url = f"/me/drive/items/{document['document_id']}/content"
+            batched.append(index)
+            requests.append({
+                "method": "PUT",
+                "url": url,
+                "headers": {"Content-Type": "text/plain"},
+                # Non-JSON sub-request bodies are sent base64-encoded
+                "body": base64.b64encode(data).decode()
+            })
+        
+        responses = await graph_batch(requests, self.credentials['access_token'])
+        for index, response in zip(batched, responses):
+            if response["status"] in (200, 201):
+                item = response["body"]
+                results[index] = {"index": index, "status": 200, "document": {
+                    "id": item["id"],
+                    "name": item["name"],
+                    "web_url": item["webUrl"],
+                    "last_modified": item["lastModifiedDateTime"]
+                }}
+            else:
+                results[index] = {"index": index, "status": response["status"], "error": graph_error(response)}
+        
+        remaining = [index for index, result in enumerate(results) if result is None]
+        written = await gather_limited([
+            (lambda document=documents[index]: self._create_microsoft_document(
+                document["name"], document["content"], document.get("folder_id")
+            )) if create else (lambda document=documents[index]: self._update_microsoft_document(
+                document["document_id"], document["content"]
+            ))
+            for index in remaining
+        ])
+        for index, result in zip(remaining, written):
+            results[index] = self._write_result(index, result)
+        return results
+
+    async def _write_google_documents(self, documents: List[Dict], create: bool) -> List[Dict]:
+        """Create or overwrite documents with concurrent single-request Drive uploads
+        
+        Drive batch requests cannot carry media, so the uploads run concurrently over
+        the shared connection pool instead.
+        """
+        headers = {"Authorization": f"Bearer {await bearer_token(self.platform, self.credentials)}"}
+        written = await gather_limited([
+            (lambda document=document: self._create_google_file(document, headers)) if create
+            else (lambda document=document: self._update_google_file(document, headers))
+            for document in documents
+        ])
+        return [self._write_result(index, result) for index, result in enumerate(written)]
+
+    async def _create_google_file(self, document: Dict, headers: Dict[str, str]) -> Dict:
+        """Create a Google Doc from text with one multipart upload"""
+        data = document["content"].encode()
+        if len(data) > settings.DOCUMENT_UPLOAD_CHUNK_SIZE:
+            return await self._resumable_upload(
+                document["name"], iter_chunks(data, settings.DOCUMENT_UPLOAD_CHUNK_SIZE), len(data),
+                "text/plain", document.get("folder_id"), convert=True
+            )
+        
+        metadata = {'name': document["name"], 'mimeType': GOOGLE_DOC_MIME_TYPE}
+        if document.get("folder_id"):
+            metadata['parents'] = [document["folder_id"]]
+        boundary = uuid.uuid4().hex
+        body = b"".join([
+            f"--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n".encode(),
+            json.dumps(metadata).encode(),
+            f"\r\n--{boundary}\r\nContent-Type: text/plain; charset=UTF-8\r\n\r\n".encode(),
+            data,
+            f"\r\n--{boundary}--".encode()
+        ])
+        response = await provider_http.client.post(
+            f"{DRIVE_UPLOAD_URL}/files",
+            params={"uploadType": "multipart", "fields": GOOGLE_WRITE_FIELDS},
+            content=body,
+            headers={**headers, "Content-Type": f"multipart/related; boundary={boundary}"}
+        )
+        response.raise_for_status()
+        return self._google_write_result(response.json())
+
+    async def _update_google_file(self, document: Dict, headers: Dict[str, str]) -> Dict:
+        """Replace a Drive file's content with one media upload"""
+        data = document["content"].encode()
+        if len(data) > settings.DOCUMENT_UPLOAD_CHUNK_SIZE:
+            return await self._resumable_upload(
+                None, iter_chunks(data, settings.DOCUMENT_UPLOAD_CHUNK_SIZE), len(data),
+                "text/plain", document_id=document["document_id"]
+            )
+        
+        response = await provider_http.client.patch(
+            f"{DRIVE_UPLOAD_URL}/files/{document['document_id']}",
+            params={"uploadType": "media", "fields": GOOGLE_WRITE_FIELDS},
+            content=data,
+            headers={**headers, "Content-Type": "text/plain; charset=UTF-8"}
+        )
+        response.raise_for_status()
+        return self._google_write_result(response.json())
+
+    async def _patch_google_document(
+        self,
+        document_id: str,
+        content: str,
+        cached: CachedDocument
+    ) -> Optional[Dict]:
+        """Apply only the changed ranges to a Google Doc with one batchUpdate
+        
+        Returns None when the document cannot be patched safely (it changed since it
+        was cached, is not a native Doc, or its structure does not match the cached
+        text) or Google did not apply the patch, so the caller falls back to a full
+        upload. Failures after the patch may have landed are raised instead.
+        """
+        try:
+            file = await execute(self.client.files().get(fileId=document_id, fields="version,mimeType"))
+            if file['mimeType'] != GOOGLE_DOC_MIME_TYPE or file['version'] != cached.version:
+                return None
+            
+            # Exports start with a BOM and use CRLF; Docs body text uses bare newlines
+            exported = cached.document["content"]
+            old = exported.lstrip("\ufeff").replace("\r\n", "\n")
+            new = content.lstrip("\ufeff").replace("\r\n", "\n")
+            full_size = len(content.encode())
+            
+            headers = {"Authorization": f"Bearer {await bearer_token(self.platform, self.credentials)}"}
+            edits = diff_ranges(old, new)
+            if not edits:
+                document_cache.set(self._cache_key(document_id), cached)
+                result = {field: cached.document[field] for field in ("id", "name", "web_url", "last_modified")}
+                return {**result, "transfer": self._transfer("patch", 0, full_size)}
+            
+            # Body indexes run from 1 to the final paragraph mark; if the body is longer
+            # than the cached text it holds structure (tables, breaks) the diff cannot map
+            response = await provider_http.client.get(
+                f"{DOCS_API_URL}/documents/{document_id}",
+                params={"fields": "revisionId,body/content/endIndex"},
+                headers=headers
+            )
+            response.raise_for_status()
+            structure = response.json()
+            end_index = max(element["endIndex"] for element in structure["body"]["content"])
+            if end_index - 1 not in (utf16_length(old), utf16_length(old) + 1):
+                return None
+            
+            body = json.dumps({
+                "requests": docs_update_requests(old, edits),
+                # Rejects the patch if anyone edited the document since the check
+                "writeControl": {"requiredRevisionId": structure["revisionId"]}
+            }).encode()
+            if len(body) >= full_size:
+                return None
+        except Exception:
+            logger.warning("Could not prepare a patch for Google Doc %s", document_id, exc_info=True)
+            return None
+        
+        try:
+            response = await provider_http.client.post(
+                f"{DOCS_API_URL}/documents/{document_id}:batchUpdate",
+                content=body,
+                headers={**headers, "Content-Type": "application/json; charset=UTF-8"}
+            )
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+            # The request never reached Google, so the document is unchanged
+            logger.warning("Could not send the patch for Google Doc %s", document_id, exc_info=True)
+            return None
+        if response.status_code in (400, 409):
+            # batchUpdate is atomic, so a rejected patch left the document untouched
+            logger.warning(
+                "Google rejected the patch for Doc %s (%s): %s",
+                document_id, response.status_code, response.text
+            )
+            return None
+        response.raise_for_status()
+        
+        # The patch has landed; cache the new text in export form so the next patch can diff against it
+        file = await execute(self.client.files().get(fileId=document_id, fields=GOOGLE_DOCUMENT_FIELDS))
+        newline = "\r\n" if "\r\n" in exported else "\n"
+        bom = "\ufeff" if exported.startswith("\ufeff") else ""
+        self._cache_google_document(
+            self._cache_key(document_id), file, bom + new.replace("\n", newline)
+        )
+        return {**self._google_write_result(file), "transfer": self._transfer("patch", len(body), full_size)}
+
+    def _google_write_result(self, file: Dict) -> Dict:
+        return {
+            "id": file['id'],
+            "name": file['name'],
+            "web_url": file['webViewLink'],
+            "last_modified": file['modifiedTime']
+        }
+
+    def _write_result(self, index: int, result: Any) -> Dict:
+        """Per-item result for a bulk write that ran outside a batch"""
+        if isinstance(result, Exception):
+            status = getattr(getattr(result, "response", None), "status_code", 500)
+            return {"index": index, "status": status, "error": str(result)}
+        return {"index": index, "status": 200, "document": result}
+
     async def _create_microsoft_document(
         self,
         name: str,
@@ -129,29 +847,29 @@ class DocumentService:
     ) -> Dict:
         """Create document in Microsoft 365"""
         try:
-            document_data = {
-                "name": name,
-                "@microsoft.graph.conflictBehavior": "rename"
-            }
+            data = content.encode()
+            if len(data) > settings.DOCUMENT_UPLOAD_CHUNK_SIZE:
+                return await self._resumable_upload(
+                    name, iter_chunks(data, settings.DOCUMENT_UPLOAD_CHUNK_SIZE), len(data),
+                    "text/plain", folder_id
+                )
             
             if folder_id:
-                path = f"/drive/items/{folder_id}/children"
+                path = f"/drive/items/{folder_id}:/{quote(name)}:/content"
             else:
-                path = "/drive/root/children"
+                path = f"/drive/root:/{quote(name)}:/content"
             
-            # Create empty document
-            response = await self.client.post(
-                path,
-                json=document_data
+            # Create the file with its content in one request; the response is the new item
+            response = await self.client.put(
+                f"{path}?@microsoft.graph.conflictBehavior=rename",
+                content=data
             )
             
-            # Update document content
-            await self._update_microsoft_document(response['id'], content)
-            
             return {
                 "id": response['id'],
                 "name": response['name'],
-                "web_url": response['webUrl']
+                "web_url": response['webUrl'],
+                "last_modified": response['lastModifiedDateTime']
             }
         except Exception as e:
             raise Exception(f"Error creating Microsoft document: {str(e)}")
@@ -172,20 +890,24 @@ class DocumentService:
             if folder_id:
                 file_metadata['parents'] = [folder_id]
             
-            # Create document
-            file = self.client.files().create(
+            data = content.encode()
+            if len(data) > settings.DOCUMENT_UPLOAD_CHUNK_SIZE:
+                return await self._resumable_upload(
+                    name, iter_chunks(data, settings.DOCUMENT_UPLOAD_CHUNK_SIZE), len(data),
+                    "text/plain", folder_id, convert=True
+                )
+            
+            # Create document, asking only for the fields we return
+            file = await execute(self.client.files().create(
                 body=file_metadata,
                 media_body=MediaIoBaseUpload(
-                    io.BytesIO(content.encode()),
+                    io.BytesIO(data),
                     mimetype='text/plain'
-                )
-            ).execute()
+                ),
+                fields=GOOGLE_WRITE_FIELDS
+            ))
             
-            return {
-                "id": file['id'],
-                "name": file['name'],
-                "web_url": file['webViewLink']
-            }
+            return self._google_write_result(file)
         except Exception as e:
             raise Exception(f"Error creating Google document: {str(e)}")
 
@@ -196,19 +918,23 @@ class DocumentService:
     ) -> Dict:
         """Update document in Microsoft 365"""
         try:
-            # Update content
-            await self.client.drive.items[document_id].content.put(
-                content=content.encode()
-            )
+            data = content.encode()
+            if len(data) > settings.DOCUMENT_UPLOAD_CHUNK_SIZE:
+                return await self._resumable_upload(
+                    None, iter_chunks(data, settings.DOCUMENT_UPLOAD_CHUNK_SIZE), len(data),
+                    "text/plain", document_id=document_id
+                )
             
-            # Get updated metadata
-            metadata = await self.client.drive.items[document_id].get()
+            # Update content; the response is the updated item, so no follow-up get
+            item = await self.client.drive.items[document_id].content.put(
+                content=data
+            )
             
             return {
                 "id": document_id,
-                "name": metadata.name,
-                "web_url": metadata.web_url,
-                "last_modified": metadata.last_modified_date_time
+                "name": item.name,
+                "web_url": item.web_url,
+                "last_modified": item.last_modified_date_time
             }
         except Exception as e:
             raise Exception(f"Error updating Microsoft document: {str(e)}")
@@ -220,23 +946,23 @@ class DocumentService:
     ) -> Dict:
         """Update document in Google Drive"""
         try:
-            # Update content
-            self.client.files().update(
+            data = content.encode()
+            if len(data) > settings.DOCUMENT_UPLOAD_CHUNK_SIZE:
+                return await self._resumable_upload(
+                    None, iter_chunks(data, settings.DOCUMENT_UPLOAD_CHUNK_SIZE), len(data),
+                    "text/plain", document_id=document_id
+                )
+            
+            # Update content; the masked response carries the fields we return
+            file = await execute(self.client.files().update(
                 fileId=document_id,
                 media_body=MediaIoBaseUpload(
-                    io.BytesIO(content.encode()),
+                    io.BytesIO(data),
                     mimetype='text/plain'
-                )
-            ).execute()
-            
-            # Get updated metadata
-            file = self.client.files().get(fileId=document_id).execute()
+                ),
+                fields=GOOGLE_WRITE_FIELDS
+            ))
             
-            return {
-                "id": document_id,
-                "name": file['name'],
-                "web_url": file['webViewLink'],
-                "last_modified": file['modifiedTime']
-            }
+            return self._google_write_result(file)
         except Exception as e:
             raise Exception(f"Error updating Google document: {str(e)}")
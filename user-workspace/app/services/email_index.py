@@ -0,0 +1,183 @@
+from typing import Any, Dict, List, Optional
+import re
+import sqlite3
+import threading
+import time
+from config import settings
+
+_HTML_TAG = re.compile(r"<[^>]+>")
+_QUERY_TERM = re.compile(r'"[^"]*"|\S+')
+# Provider search syntax the index cannot evaluate: field operators (is:unread,
+# from:, after:, label:...), negation, OR and grouping
+_OPERATOR_SYNTAX = re.compile(r'(?:^|\s)(?:\w+:|-\S)|[(){}]|\bOR\b')
+
+def is_plain_query(query: str) -> bool:
+    """Whether a search string is plain terms the index can answer"""
+    return not _OPERATOR_SYNTAX.search(query)
+
+def build_match_query(query: str) -> str:
+    """Translate plain search terms into a safe FTS5 MATCH expression (terms are ANDed)"""
+    terms = []
+    for term in _QUERY_TERM.findall(query):
+        text = term.strip('"').replace('"', '""')
+        if text:
+            terms.append(f'"{text}"')
+    return " ".join(terms)
+
+class EmailSearchIndex:
+    """SQLite FTS5 index over synced message headers and bodies
+
+    The database is opened on first use (or by the app's startup hook), not at
+    import. Calls block on disk I/O, so async callers run them in a worker thread;
+    a lock keeps those threads from interleaving transactions on the connection.
+
+    A mailbox's rows live only as long as its in-memory mailbox cache entry:
+    they expire MAIL_CACHE_TTL_SECONDS after the full sync that loaded them,
+    and rows left by an earlier process are dropped when the index opens.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.db: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._stats = {"searches": 0, "indexed": 0, "removed": 0, "expired": 0}
+
+    def open(self) -> sqlite3.Connection:
+        """Connect to the index database, creating its table if needed"""
+        with self._lock:
+            if self.db is None:
+                db = sqlite3.connect(self.path or settings.EMAIL_INDEX_PATH, check_same_thread=False)
+                db.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS emails USING fts5(
+                        mailbox UNINDEXED,
+                        message_id UNINDEXED,
+                        subject,
+                        sender,
+                        body,
+                        received UNINDEXED,
+                        is_read UNINDEXED,
+                        tokenize = 'porter unicode61'
+                    )
+                """)
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS mailboxes (mailbox TEXT PRIMARY KEY, loaded_at REAL)"
+                )
+                # The caches these rows mirrored died with the previous process
+                with db:
+                    db.execute("DELETE FROM emails")
+                    db.execute("DELETE FROM mailboxes")
+                self.db = db
+            return self.db
+
+    def close(self) -> None:
+        with self._lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def apply(self, mailbox: str, upserted: List[Dict], removed: List[str], clear: bool = False) -> None:
+        """Mirror one sync's changes, optionally replacing the mailbox's contents"""
+        with self._lock:
+            self.expire()
+            if clear:
+                self.clear(mailbox)
+                with self.open() as db:
+                    db.execute("INSERT INTO mailboxes VALUES (?, ?)", (mailbox, time.time()))
+            self.upsert(mailbox, upserted)
+            self.remove(mailbox, removed)
+
+    def upsert(self, mailbox: str, emails: List[Dict]) -> None:
+        """Add or replace messages for a mailbox"""
+        if not emails:
+            return
+        with self._lock, self.open() as db:
+            db.executemany(
+                "DELETE FROM emails WHERE mailbox = ? AND message_id = ?",
+                [(mailbox, email["id"]) for email in emails]
+            )
+            db.executemany(
+                "INSERT INTO emails VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(
+                    mailbox,
+                    email["id"],
+                    email.get("subject") or "",
+                    email.get("from") or "",
+                    _HTML_TAG.sub(" ", email.get("body") or ""),
+                    str(email["received"]),
+                    int(bool(email.get("is_read")))
+                ) for email in emails]
+            )
+            self._prune(db, mailbox)
+        self._stats["indexed"] += len(emails)
+
+    def remove(self, mailbox: str, message_ids: List[str]) -> None:
+        """Remove messages from a mailbox"""
+        if not message_ids:
+            return
+        with self._lock, self.open() as db:
+            db.executemany(
+                "DELETE FROM emails WHERE mailbox = ? AND message_id = ?",
+                [(mailbox, message_id) for message_id in message_ids]
+            )
+        self._stats["removed"] += len(message_ids)
+
+    def clear(self, mailbox: str) -> None:
+        """Remove every message in a mailbox"""
+        with self._lock, self.open() as db:
+            db.execute("DELETE FROM emails WHERE mailbox = ?", (mailbox,))
+            db.execute("DELETE FROM mailboxes WHERE mailbox = ?", (mailbox,))
+
+    def expire(self, ttl: float = settings.MAIL_CACHE_TTL_SECONDS) -> None:
+        """Drop mailboxes whose cache entry has expired since they were loaded"""
+        with self._lock:
+            db = self.open()
+            expired = [mailbox for mailbox, in db.execute(
+                "SELECT mailbox FROM mailboxes WHERE loaded_at < ?", (time.time() - ttl,)
+            )]
+            for mailbox in expired:
+                self.clear(mailbox)
+        self._stats["expired"] += len(expired)
+
+    def search(self, mailbox: str, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Return the best-ranked matches, weighting subject over sender over body"""
+        match = build_match_query(query)
+        if not match:
+            return []
+
+        self._stats["searches"] += 1
+        with self._lock:
+            rows = self.open().execute(
+                """
+                SELECT message_id, subject, sender, body, received, is_read
+                FROM emails
+                WHERE emails MATCH ? AND mailbox = ?
+                ORDER BY bm25(emails, 0.0, 0.0, 10.0, 5.0, 1.0, 0.0, 0.0)
+                LIMIT ?
+                """,
+                (match, mailbox, limit)
+            ).fetchall()
+        return [{
+            "id": message_id,
+            "subject": subject,
+            "from": sender,
+            "received": received,
+            "body": body,
+            "is_read": bool(is_read)
+        } for message_id, subject, sender, body, received, is_read in rows]
+
+    def _prune(self, db: sqlite3.Connection, mailbox: str) -> None:
+        """Drop the oldest messages beyond the per-mailbox cap"""
+        db.execute(
+            """
+            DELETE FROM emails WHERE rowid IN (
+                SELECT rowid FROM emails WHERE mailbox = ?
+                ORDER BY received DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (mailbox, settings.MAIL_INDEX_MAX_MESSAGES)
+        )
+
+    def get_metrics(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+email_index = EmailSearchIndex()
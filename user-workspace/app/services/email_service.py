@@ -1,17 +1,59 @@
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from fastapi import HTTPException
 from microsoft.graph import GraphServiceClient
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 import base64
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime
+from email.mime.base import MIMEBase
+from datetime import datetime, timedelta
+import asyncio
+import json
+import time
+from config import settings
+from app.utils.singleflight import singleflight, make_key
+from app.services.mailbox_cache import mailbox_cache, MailboxState
+from app.services.email_index import email_index, is_plain_query
+from app.services.batching import gather_limited
+from app.auth.credentials import bearer_token
+from app.utils.google_api import execute, execute_sync
+from app.utils.http import provider_http, GRAPH_API_URL
+from app.utils.streams import rechunk, iter_base64_lines, base64_lines_length, iter_json_base64_field
+
+GRAPH_URL_PREFIX = "https://graph.microsoft.com/"
+MICROSOFT_METADATA_FIELDS = "id,subject,from,receivedDateTime,isRead,bodyPreview"
+MICROSOFT_MESSAGE_FIELDS = MICROSOFT_METADATA_FIELDS + ",body"
+GOOGLE_METADATA_HEADERS = ['Subject', 'From']
+# Field masks for the Gmail parts _parse_google_message reads
+GOOGLE_MESSAGE_FIELDS = "id,labelIds,snippet,internalDate,payload"
+GOOGLE_LISTING_FIELDS = "messages/id,nextPageToken"
+GOOGLE_HISTORY_FIELDS = (
+    "history(messagesAdded/message/id,messagesDeleted/message/id,"
+    "labelsAdded/message/id,labelsRemoved/message/id),nextPageToken,historyId"
+)
+GMAIL_API_URL = "https://gmail.googleapis.com/gmail/v1"
+GMAIL_UPLOAD_URL = "https://gmail.googleapis.com/upload/gmail/v1"
+_ATTACHMENT_MARKER = "@@attachment-content@@"
+# Folder names (including Graph well-known names) whose Gmail label is named differently
+_GMAIL_FOLDER_ALIASES = {"drafts": "DRAFT", "sentitems": "SENT", "deleteditems": "TRASH", "junkemail": "SPAM"}
+
+def _is_retryable(error: Exception) -> bool:
+    """Whether a failed Google call is worth re-sending (throttled or server-side)"""
+    if isinstance(error, HttpError):
+        return error.resp.status == 429 or error.resp.status >= 500
+    # Connection-level failures carry no status
+    return True
 
 class EmailService:
-    def __init__(self, platform: str, credentials: Dict):
+    def __init__(self, platform: str, credentials: Dict, user_id: str):
         """Initialize email service for specified platform"""
         self.platform = platform
         self.credentials = credentials
+        # Keys the process-wide caches and request coalescing, so it must identify the account
+        if not user_id:
+            raise ValueError("user_id is required")
+        self.user_id = user_id
         self._init_client()
 
     def _init_client(self):
@@ -33,20 +75,443 @@ class EmailService:
         self,
         folder: str = "inbox",
         limit: int = 10,
-        query: Optional[str] = None
+        query: Optional[str] = None,
+        include_body: bool = True
+    ) -> List[Dict]:
+        """Read emails from specified folder
+        
+        With include_body=False only headers and a short preview are returned;
+        load bodies on demand with get_email_body.
+        """
+        key = make_key(
+            self.user_id, "email.read_emails", self.platform, folder, limit, query, include_body
+        )
+        return await singleflight.do(
+            key,
+            lambda: self._read_emails(folder, limit, query, include_body)
+        )
+
+    async def _read_emails(
+        self,
+        folder: str,
+        limit: int,
+        query: Optional[str],
+        include_body: bool
     ) -> List[Dict]:
-        """Read emails from specified folder"""
+        """Read emails, raising HTTPException on failure"""
         try:
+            # Search operators such as is:unread or after: are evaluated by the provider
+            if query is None or is_plain_query(query):
+                emails = await self._read_cached_emails(folder, limit, query, include_body)
+                if emails is not None:
+                    return emails
+            
             if self.platform == "microsoft":
-                return await self._read_microsoft_emails(folder, limit, query)
+                return await self._read_microsoft_emails(folder, limit, query, include_body)
             elif self.platform == "google":
-                return await self._read_google_emails(folder, limit, query)
+                return await self._read_google_emails(folder, limit, query, include_body)
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to read emails: {str(e)}"
             )
 
+    async def _read_cached_emails(
+        self,
+        folder: str,
+        limit: int,
+        query: Optional[str],
+        include_body: bool
+    ) -> Optional[List[Dict]]:
+        """Answer a read from the synced cache and search index, or None if they cannot"""
+        state = await self._synced_mailbox(folder)
+        if query is None:
+            if state.complete or len(state.messages) >= limit:
+                return self._select_fields(state.newest(limit), include_body)
+            if self.platform == "microsoft" and state.window_start:
+                # Only mail received before the sync window is missing from the cache
+                older = await self._read_microsoft_emails(
+                    folder, limit - len(state.messages), None, include_body,
+                    received_before=state.window_start
+                )
+                return self._select_fields(state.newest(limit), include_body) + older
+            return None
+        
+        results = await asyncio.to_thread(
+            email_index.search, self._mailbox_key(folder), query, limit
+        )
+        # A short result from a partial window may be missing matches; ask the provider
+        if len(results) < limit and not state.complete:
+            return None
+        return await self._hydrate_messages(state, [email["id"] for email in results], include_body)
+
+    async def _hydrate_messages(
+        self,
+        state: MailboxState,
+        message_ids: List[str],
+        include_body: bool
+    ) -> List[Dict]:
+        """Load index hits as full messages, from the cache where possible
+        
+        The index outlives trimmed cache entries, so other hits are fetched from
+        the provider; ones deleted there in the meantime are dropped.
+        """
+        missing = [message_id for message_id in message_ids if message_id not in state.messages]
+        fetched: Dict[str, Dict] = {}
+        if missing and self.platform == "microsoft":
+            fields = MICROSOFT_MESSAGE_FIELDS if include_body else MICROSOFT_METADATA_FIELDS
+            responses = await gather_limited([
+                lambda message_id=message_id: self.client.me.messages[message_id].get(
+                    params={"$select": fields}
+                )
+                for message_id in missing
+            ])
+            for response in responses:
+                if isinstance(response, Exception):
+                    if getattr(response, "response_status_code", None) != 404:
+                        raise response
+                else:
+                    fetched[response.id] = self._parse_microsoft_message(response, include_body)
+        elif missing and self.platform == "google":
+            params = (
+                {'format': 'full'} if include_body
+                else {'format': 'metadata', 'metadataHeaders': GOOGLE_METADATA_HEADERS}
+            )
+            for email in await asyncio.to_thread(self._batch_get_google_messages, missing, **params):
+                fetched[email['id']] = self._parse_google_message(email, include_body)
+        
+        emails = [
+            state.messages.get(message_id) or fetched.get(message_id)
+            for message_id in message_ids
+        ]
+        return self._select_fields([email for email in emails if email is not None], include_body)
+
+    async def sync_mailbox(self, folder: str = "inbox") -> Dict[str, Any]:
+        """Bring the local message cache up to date, fetching only changed messages"""
+        try:
+            key = (self.user_id, self.platform, folder)
+            async with mailbox_cache.locks.acquire(":".join(key)):
+                return await self._sync_mailbox(mailbox_cache.get(key), folder)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to sync mailbox: {str(e)}"
+            )
+
+    async def iter_email_pages(
+        self,
+        folder: str = "inbox",
+        page_size: int = 50,
+        query: Optional[str] = None,
+        include_body: bool = False,
+        cursor: Optional[str] = None,
+        max_pages: Optional[int] = None
+    ) -> AsyncIterator[Dict]:
+        """Walk a folder page by page, prefetching the next page while the caller works
+        
+        Each page is {"emails": [...], "next_cursor": ...}; pass next_cursor back
+        in to resume. Only the current and the prefetched page are held in memory,
+        and nothing is prefetched past max_pages.
+        """
+        try:
+            token = self._decode_cursor(cursor) if cursor else None
+            pending = asyncio.ensure_future(
+                self._fetch_email_page(folder, page_size, query, include_body, token)
+            )
+            count = 0
+            while pending is not None:
+                emails, token = await pending
+                pending = None
+                count += 1
+                if token and (max_pages is None or count < max_pages):
+                    pending = asyncio.ensure_future(
+                        self._fetch_email_page(folder, page_size, query, include_body, token)
+                    )
+                yield {
+                    "emails": emails,
+                    "next_cursor": self._encode_cursor(token) if token else None
+                }
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to page emails: {str(e)}"
+            )
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def _fetch_email_page(
+        self,
+        folder: str,
+        page_size: int,
+        query: Optional[str],
+        include_body: bool,
+        token: Optional[str]
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Fetch one page of messages and the provider token for the next"""
+        if self.platform == "microsoft":
+            return await self._fetch_microsoft_page(folder, page_size, query, include_body, token)
+        elif self.platform == "google":
+            # The Gmail client blocks; a worker thread lets the prefetch overlap the consumer
+            return await asyncio.to_thread(
+                self._fetch_google_page, folder, page_size, query, include_body, token
+            )
+        raise ValueError(f"Unsupported platform: {self.platform}")
+
+    def _fetch_google_page(
+        self,
+        folder: str,
+        page_size: int,
+        query: Optional[str],
+        include_body: bool,
+        token: Optional[str]
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Fetch one page of Gmail messages"""
+        try:
+            q = f"in:{folder}"
+            if query:
+                q += f" {query}"
+            
+            listing = execute_sync(self.client.users().messages().list(
+                userId='me',
+                q=q,
+                maxResults=page_size,
+                pageToken=token,
+                fields=GOOGLE_LISTING_FIELDS
+            ))
+            
+            message_ids = [msg['id'] for msg in listing.get('messages', [])]
+            params = (
+                {'format': 'full'} if include_body
+                else {'format': 'metadata', 'metadataHeaders': GOOGLE_METADATA_HEADERS}
+            )
+            emails = [
+                self._parse_google_message(email, include_body)
+                for email in self._batch_get_google_messages(message_ids, **params)
+            ]
+            return emails, listing.get('nextPageToken')
+        except Exception as e:
+            raise Exception(f"Error paging Gmail emails: {str(e)}")
+
+    async def _fetch_microsoft_page(
+        self,
+        folder: str,
+        page_size: int,
+        query: Optional[str],
+        include_body: bool,
+        token: Optional[str]
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Fetch one page of Graph messages, following @odata.nextLink after the first"""
+        try:
+            messages_request = self.client.me.mail_folders[folder].messages
+            if token:
+                messages = await messages_request.with_url(token).get()
+            else:
+                params = {
+                    "$top": page_size,
+                    "$select": MICROSOFT_MESSAGE_FIELDS if include_body else MICROSOFT_METADATA_FIELDS
+                }
+                if query:
+                    params["$search"] = '"{}"'.format(query.replace('"', ''))
+                else:
+                    params["$orderby"] = "receivedDateTime desc"
+                messages = await messages_request.get(params=params)
+            
+            emails = [self._parse_microsoft_message(msg, include_body) for msg in messages.value]
+            return emails, messages.odata_next_link
+        except Exception as e:
+            raise Exception(f"Error paging Microsoft emails: {str(e)}")
+
+    def _encode_cursor(self, token: str) -> str:
+        """Wrap a provider page token in an opaque cursor"""
+        payload = json.dumps({"p": self.platform, "t": token}).encode()
+        return base64.urlsafe_b64encode(payload).decode()
+
+    def _decode_cursor(self, cursor: str) -> str:
+        """Unwrap a cursor, rejecting ones minted for another platform or host"""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except ValueError:
+            raise ValueError("Invalid cursor")
+        if payload.get("p") != self.platform:
+            raise ValueError("Cursor belongs to another platform")
+        # Graph cursors are followed as URLs, so only Graph URLs are accepted
+        if self.platform == "microsoft" and not payload["t"].startswith(GRAPH_URL_PREFIX):
+            raise ValueError("Invalid cursor")
+        return payload["t"]
+
+    async def get_email_body(self, message_id: str, folder: str = "inbox") -> Dict:
+        """Load one message body on demand"""
+        try:
+            state = mailbox_cache.get((self.user_id, self.platform, folder))
+            cached = state.messages.get(message_id)
+            if cached is not None and "body" in cached:
+                return {"id": message_id, "body": cached["body"]}
+            
+            if self.platform == "microsoft":
+                msg = await self.client.me.messages[message_id].get(
+                    params={"$select": "id,body"}
+                )
+                return {"id": message_id, "body": msg.body.content}
+            elif self.platform == "google":
+                email = await execute(self.client.users().messages().get(
+                    userId='me',
+                    id=message_id,
+                    format='full',
+                    fields='payload'
+                ))
+                return {"id": message_id, "body": self._extract_google_body(email['payload'])}
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to get email body: {str(e)}"
+            )
+
+    async def list_attachments(self, message_id: str) -> List[Dict]:
+        """List a message's attachments without downloading their content"""
+        try:
+            if self.platform == "microsoft":
+                attachments = await self.client.me.messages[message_id].attachments.get(
+                    params={"$select": "id,name,contentType,size"}
+                )
+                return [{
+                    "id": attachment.id,
+                    "name": attachment.name,
+                    "content_type": attachment.content_type,
+                    "size": attachment.size
+                } for attachment in attachments.value]
+            elif self.platform == "google":
+                return await asyncio.to_thread(self._list_google_attachments, message_id)
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to list attachments: {str(e)}"
+            )
+
+    async def stream_attachment(
+        self,
+        message_id: str,
+        attachment_id: str
+    ) -> Tuple[Dict, AsyncIterator[bytes]]:
+        """Return attachment metadata and an iterator over its content
+        
+        The provider response is opened before returning, so upstream errors surface
+        here rather than mid-stream; the content is relayed in ATTACHMENT_CHUNK_SIZE
+        pieces and never held in memory as a whole.
+        """
+        try:
+            headers = {"Authorization": f"Bearer {await bearer_token(self.platform, self.credentials)}"}
+            if self.platform == "microsoft":
+                attachment = await self.client.me.messages[message_id].attachments[attachment_id].get(
+                    params={"$select": "id,name,contentType,size"}
+                )
+                metadata = {
+                    "id": attachment.id,
+                    "name": attachment.name,
+                    "content_type": attachment.content_type,
+                    "size": attachment.size
+                }
+                response = await provider_http.open(
+                    "GET",
+                    f"{GRAPH_API_URL}/me/messages/{message_id}/attachments/{attachment_id}/$value",
+                    headers=headers
+                )
+                return metadata, provider_http.iter_bytes(response, settings.ATTACHMENT_CHUNK_SIZE)
+            elif self.platform == "google":
+                attachments = await asyncio.to_thread(self._list_google_attachments, message_id)
+                metadata = next((a for a in attachments if a["id"] == attachment_id), None)
+                if metadata is None:
+                    raise HTTPException(status_code=404, detail="Attachment not found")
+                # Gmail returns the content base64url-encoded inside a JSON object
+                response = await provider_http.open(
+                    "GET",
+                    f"{GMAIL_API_URL}/users/me/messages/{message_id}/attachments/{metadata.pop('attachment_id')}",
+                    headers=headers
+                )
+                content = iter_json_base64_field(
+                    provider_http.iter_bytes(response, settings.ATTACHMENT_CHUNK_SIZE), "data"
+                )
+                return metadata, content
+            else:
+                raise ValueError(f"Unsupported platform: {self.platform}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to download attachment: {str(e)}"
+            )
+
+    async def send_email_with_attachment(
+        self,
+        to: List[str],
+        subject: str,
+        body: str,
+        filename: str,
+        content_type: str,
+        size: int,
+        content: AsyncIterator[bytes],
+        cc: Optional[List[str]] = None,
+        bcc: Optional[List[str]] = None
+    ) -> Dict:
+        """Send an email with one attachment streamed from content
+        
+        size must be the exact byte length of content; it is needed up front for
+        Graph upload sessions and for the Gmail upload's Content-Length.
+        """
+        try:
+            if self.platform == "microsoft":
+                return await self._send_microsoft_email_with_attachment(
+                    to, subject, body, filename, content_type, size, content, cc, bcc
+                )
+            elif self.platform == "google":
+                return await self._send_google_email_with_attachment(
+                    to, subject, body, filename, content_type, size, content, cc, bcc
+                )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to send email: {str(e)}"
+            )
+
+    def _select_fields(self, emails: List[Dict], include_body: bool) -> List[Dict]:
+        """Drop bodies from cached messages for metadata-only listings"""
+        if include_body:
+            return emails
+        return [{k: v for k, v in email.items() if k != "body"} for email in emails]
+
+    def _mailbox_key(self, folder: str) -> str:
+        return f"{self.user_id}:{self.platform}:{folder}"
+
+    async def _synced_mailbox(self, folder: str) -> MailboxState:
+        """Return the cached mailbox, syncing first unless it was synced very recently"""
+        key = (self.user_id, self.platform, folder)
+        async with mailbox_cache.locks.acquire(":".join(key)):
+            state = mailbox_cache.get(key)
+            if not state.is_fresh():
+                await self._sync_mailbox(state, folder)
+            return state
+
+    async def _sync_mailbox(self, state: MailboxState, folder: str) -> Dict[str, Any]:
+        """Run one sync against the provider and record how much it transferred"""
+        if self.platform == "microsoft":
+            result = await self._sync_microsoft_mailbox(state, folder)
+        elif self.platform == "google":
+            result = await self._sync_google_mailbox(state, folder)
+        else:
+            raise ValueError(f"Unsupported platform: {self.platform}")
+        
+        # Mirror the changes into the search index; it keeps messages the cache trims
+        upserted, removed = state.drain_changes()
+        await asyncio.to_thread(
+            email_index.apply, self._mailbox_key(folder), upserted, removed, clear=result["full"]
+        )
+        
+        state.trim(settings.MAIL_CACHE_MAX_MESSAGES)
+        state.synced_at = time.monotonic()
+        mailbox_cache.record_sync(result)
+        return {**result, "cached": len(state.messages)}
+
     async def send_email(
         self,
         to: List[str],
@@ -71,30 +536,28 @@ class EmailService:
         self,
         folder: str,
         limit: int,
-        query: Optional[str]
+        query: Optional[str],
+        include_body: bool = True,
+        received_before: Optional[str] = None
     ) -> List[Dict]:
-        """Read emails from Microsoft 365"""
+        """Read emails from Microsoft 365, optionally only those received before a time"""
         try:
-            # Build filter query if provided
-            filter_query = f"search('{query}')" if query else None
+            params = {
+                "$top": limit,
+                "$select": MICROSOFT_MESSAGE_FIELDS if include_body else MICROSOFT_METADATA_FIELDS
+            }
+            if received_before:
+                params["$filter"] = f"receivedDateTime lt {received_before}"
+            if query:
+                # Graph takes free-text search via $search, which cannot be combined with $orderby
+                params["$search"] = '"{}"'.format(query.replace('"', ''))
+            else:
+                params["$orderby"] = "receivedDateTime desc"
             
             # Get messages
-            messages = await self.client.me.mail_folders[folder].messages.get(
-                params={
-                    "$top": limit,
-                    "$orderby": "receivedDateTime desc",
-                    "$filter": filter_query
-                }
-            )
+            messages = await self.client.me.mail_folders[folder].messages.get(params=params)
             
-            return [{
-                "id": msg.id,
-                "subject": msg.subject,
-                "from": msg.from_.email_address.address,
-                "received": msg.received_date_time,
-                "body": msg.body.content,
-                "is_read": msg.is_read
-            } for msg in messages.value]
+            return [self._parse_microsoft_message(msg, include_body) for msg in messages.value]
         except Exception as e:
             raise Exception(f"Error reading Microsoft emails: {str(e)}")
 
@@ -102,7 +565,8 @@ class EmailService:
         self,
         folder: str,
         limit: int,
-        query: Optional[str]
+        query: Optional[str],
+        include_body: bool = True
     ) -> List[Dict]:
         """Read emails from Gmail"""
         try:
@@ -112,50 +576,300 @@ class EmailService:
                 q += f" {query}"
             
             # Get message list
-            messages = self.client.users().messages().list(
+            messages = await execute(self.client.users().messages().list(
                 userId='me',
                 q=q,
-                maxResults=limit
-            ).execute()
+                maxResults=limit,
+                fields=GOOGLE_LISTING_FIELDS
+            ))
+            
+            # Fetch messages in batches instead of one round trip each
+            message_ids = [msg['id'] for msg in messages.get('messages', [])]
+            params = (
+                {'format': 'full'} if include_body
+                else {'format': 'metadata', 'metadataHeaders': GOOGLE_METADATA_HEADERS}
+            )
+            emails = [
+                self._parse_google_message(email, include_body)
+                for email in await asyncio.to_thread(self._batch_get_google_messages, message_ids, **params)
+            ]
+            
+            return emails
+        except Exception as e:
+            raise Exception(f"Error reading Gmail emails: {str(e)}")
+
+    async def _sync_google_mailbox(self, state: MailboxState, folder: str) -> Dict[str, Any]:
+        """Sync a Gmail label using history.list from the last seen historyId"""
+        try:
+            if state.label_id is None:
+                state.label_id = await self._resolve_google_label(folder)
+            label = state.label_id
+            full = state.cursor is None or label is None
             
-            emails = []
-            for msg in messages.get('messages', []):
-                # Get full message details
-                email = self.client.users().messages().get(
+            if not full:
+                try:
+                    changed, removed, cursor = await asyncio.to_thread(
+                        self._google_history_changes, state.cursor, label
+                    )
+                except HttpError as e:
+                    # 404: historyId too old to replay; 400: the label was deleted or renamed
+                    if e.resp.status not in (400, 404):
+                        raise
+                    if e.resp.status == 400:
+                        state.label_id = label = await self._resolve_google_label(folder)
+                    full = True
+            
+            if full:
+                state.reset()
+                # Read the historyId first so changes made during the listing are replayed later
+                cursor = (await execute(self.client.users().getProfile(
                     userId='me',
-                    id=msg['id'],
-                    format='full'
-                ).execute()
-                
-                # Extract headers
-                headers = email['payload']['headers']
-                subject = next(h['value'] for h in headers if h['name'] == 'Subject')
-                from_email = next(h['value'] for h in headers if h['name'] == 'From')
-                
-                # Get body
-                if 'parts' in email['payload']:
-                    body = base64.urlsafe_b64decode(
-                        email['payload']['parts'][0]['body']['data']
-                    ).decode()
+                    fields='historyId'
+                )))['historyId']
+                # Folders matching no label fall back to a search, re-listed on every sync
+                scope = {'labelIds': [label]} if label else {'q': f"in:{folder}"}
+                listing = await execute(self.client.users().messages().list(
+                    userId='me',
+                    maxResults=settings.MAIL_SYNC_INITIAL_MESSAGES,
+                    fields=GOOGLE_LISTING_FIELDS,
+                    **scope
+                ))
+                changed = [msg['id'] for msg in listing.get('messages', [])]
+                removed = []
+                state.complete = 'nextPageToken' not in listing
+                if label is None:
+                    cursor = None
+            
+            fetched = await asyncio.to_thread(self._batch_get_google_messages, changed, format='full')
+            for email in fetched:
+                if label is None or label in email.get('labelIds', []):
+                    state.put(self._parse_google_message(email))
                 else:
-                    body = base64.urlsafe_b64decode(
-                        email['payload']['body']['data']
-                    ).decode()
+                    state.remove(email['id'])
+            # Changed messages that could not be fetched were deleted in the meantime
+            removed.extend(set(changed) - {email['id'] for email in fetched})
+            for message_id in removed:
+                state.remove(message_id)
+            
+            state.cursor = cursor
+            return {"full": full, "transferred": len(changed), "removed": len(removed)}
+        except Exception as e:
+            raise Exception(f"Error syncing Gmail mailbox: {str(e)}")
+
+    async def _resolve_google_label(self, folder: str) -> Optional[str]:
+        """Map a folder name to its Gmail label id, e.g. drafts -> DRAFT or a user label -> Label_12"""
+        wanted = _GMAIL_FOLDER_ALIASES.get(folder.lower(), folder).lower()
+        response = await execute(self.client.users().labels().list(
+            userId='me',
+            fields='labels(id,name)'
+        ))
+        for label in response.get('labels', []):
+            if wanted in (label['id'].lower(), label['name'].lower()):
+                return label['id']
+        return None
+
+    def _google_history_changes(self, start_history_id: str, label: str):
+        """Collect changed and deleted message ids since a historyId"""
+        changed, removed = set(), set()
+        page_token = None
+        while True:
+            response = execute_sync(self.client.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                labelId=label,
+                historyTypes=['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved'],
+                pageToken=page_token,
+                fields=GOOGLE_HISTORY_FIELDS
+            ))
+            
+            for record in response.get('history', []):
+                for item in record.get('messagesDeleted', []):
+                    removed.add(item['message']['id'])
+                for change in ('messagesAdded', 'labelsAdded', 'labelsRemoved'):
+                    for item in record.get(change, []):
+                        changed.add(item['message']['id'])
+            
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return list(changed - removed), list(removed), response['historyId']
+
+    async def _sync_microsoft_mailbox(self, state: MailboxState, folder: str) -> Dict[str, Any]:
+        """Sync a Graph mail folder by following its delta link"""
+        try:
+            delta = self.client.me.mail_folders[folder].messages.delta
+            full = state.cursor is None
+            
+            try:
+                if full:
+                    state.window_start = self._sync_window_start()
+                    response = await delta.get(params={
+                        "$select": MICROSOFT_MESSAGE_FIELDS,
+                        "$filter": f"receivedDateTime ge {state.window_start}"
+                    })
+                else:
+                    response = await delta.with_url(state.cursor).get()
+            except Exception as e:
+                # Expired delta tokens return 410 Gone; start over
+                if full or getattr(e, "response_status_code", None) != 410:
+                    raise
+                state.reset()
+                return await self._sync_microsoft_mailbox(state, folder)
+            
+            transferred = removed = 0
+            while True:
+                for msg in response.value or []:
+                    if msg.additional_data and "@removed" in msg.additional_data:
+                        state.remove(msg.id)
+                        removed += 1
+                    else:
+                        state.put(self._parse_microsoft_message(msg))
+                        transferred += 1
                 
-                emails.append({
-                    "id": email['id'],
-                    "subject": subject,
-                    "from": from_email,
-                    "received": datetime.fromtimestamp(
-                        int(email['internalDate'])/1000
-                    ).isoformat(),
-                    "body": body,
-                    "is_read": 'UNREAD' not in email['labelIds']
-                })
+                if response.odata_next_link:
+                    response = await delta.with_url(response.odata_next_link).get()
+                else:
+                    # The cache now holds the sync window but nothing older, so it
+                    # stays incomplete and older reads go to Graph
+                    state.cursor = response.odata_delta_link
+                    break
             
-            return emails
+            return {"full": full, "transferred": transferred, "removed": removed}
         except Exception as e:
-            raise Exception(f"Error reading Gmail emails: {str(e)}")
+            raise Exception(f"Error syncing Microsoft mailbox: {str(e)}")
+
+    def _sync_window_start(self) -> str:
+        """Oldest receivedDateTime included in an initial Graph sync"""
+        start = datetime.utcnow() - timedelta(days=settings.MAIL_SYNC_WINDOW_DAYS)
+        return start.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def _parse_microsoft_message(self, msg: Any, include_body: bool = True) -> Dict:
+        """Convert a Graph message into the service's email format"""
+        parsed = {
+            "id": msg.id,
+            "subject": msg.subject,
+            "from": msg.from_.email_address.address if msg.from_ else "",
+            "received": msg.received_date_time,
+            "preview": msg.body_preview,
+            "is_read": msg.is_read
+        }
+        if include_body:
+            parsed["body"] = msg.body.content
+        return parsed
+
+    def _batch_get_google_messages(self, message_ids: List[str], **params) -> List[Dict]:
+        """Fetch Gmail messages through batch requests, preserving input order
+        
+        Sub-requests fail independently; throttled or server-failed ones are
+        re-sent with backoff, and only the first permanent error is raised.
+        Messages deleted since they were listed (404) are left out.
+        """
+        results: Dict[str, Dict] = {}
+        failures: Dict[str, Exception] = {}
+        
+        def collect(request_id, response, exception):
+            if exception is not None:
+                failures[request_id] = exception
+            else:
+                results[request_id] = response
+        
+        params.setdefault('fields', GOOGLE_MESSAGE_FIELDS)
+        batch_size = settings.GMAIL_BATCH_SIZE
+        pending = list(dict.fromkeys(message_ids))
+        attempts = 0
+        while pending:
+            failures.clear()
+            for start in range(0, len(pending), batch_size):
+                batch = self.client.new_batch_http_request(callback=collect)
+                for message_id in pending[start:start + batch_size]:
+                    batch.add(
+                        self.client.users().messages().get(userId='me', id=message_id, **params),
+                        request_id=message_id
+                    )
+                execute_sync(batch)
+            
+            for request_id, error in list(failures.items()):
+                if isinstance(error, HttpError) and error.resp.status == 404:
+                    del failures[request_id]
+            permanent = [error for error in failures.values() if not _is_retryable(error)]
+            if permanent:
+                raise permanent[0]
+            pending = list(failures)
+            if pending:
+                attempts += 1
+                if attempts > settings.GMAIL_BATCH_MAX_RETRIES:
+                    raise next(iter(failures.values()))
+                time.sleep(min(2 ** (attempts - 1), 30))
+        
+        return [results[message_id] for message_id in message_ids if message_id in results]
+
+    def _list_google_attachments(self, message_id: str) -> List[Dict]:
+        """List Gmail attachments keyed by MIME part id
+        
+        Gmail attachment ids change between fetches of the same message, so the
+        stable part id is exposed and resolved to the current attachment id on download.
+        """
+        email = execute_sync(self.client.users().messages().get(
+            userId='me',
+            id=message_id,
+            format='full',
+            fields='payload'
+        ))
+        return [{
+            "id": part['partId'],
+            "name": part['filename'],
+            "content_type": part.get('mimeType', "application/octet-stream"),
+            "size": part['body'].get('size', 0),
+            "attachment_id": part['body']['attachmentId']
+        } for part in self._iter_mime_parts(email['payload'])
+            if part.get('filename') and part.get('body', {}).get('attachmentId')]
+
+    def _parse_google_message(self, email: Dict, include_body: bool = True) -> Dict:
+        """Convert a Gmail message (full or metadata format) into the service's email format"""
+        # Extract headers
+        headers = email['payload'].get('headers', [])
+        subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), "")
+        from_email = next((h['value'] for h in headers if h['name'].lower() == 'from'), "")
+        
+        parsed = {
+            "id": email['id'],
+            "subject": subject,
+            "from": from_email,
+            "received": datetime.fromtimestamp(
+                int(email['internalDate'])/1000
+            ).isoformat(),
+            "preview": email.get('snippet', ""),
+            "is_read": 'UNREAD' not in email.get('labelIds', [])
+        }
+        if include_body:
+            parsed["body"] = self._extract_google_body(email['payload'])
+        return parsed
+
+    def _extract_google_body(self, payload: Dict) -> str:
+        """Walk the MIME tree for the first inline text/plain part, falling back to text/html"""
+        bodies: Dict[str, str] = {}
+        for part in self._iter_mime_parts(payload):
+            mime_type = part.get('mimeType', "")
+            data = part.get('body', {}).get('data')
+            if mime_type in ("text/plain", "text/html") and data and not part.get('filename'):
+                bodies.setdefault(mime_type, self._decode_part(part, data))
+        return bodies.get("text/plain") or bodies.get("text/html", "")
+
+    def _iter_mime_parts(self, part: Dict):
+        """Yield a MIME part and its descendants in document order"""
+        yield part
+        for child in part.get('parts', []):
+            yield from self._iter_mime_parts(child)
+
+    def _decode_part(self, part: Dict, data: str) -> str:
+        """Decode a base64url part body using the charset from its Content-Type"""
+        charset = "utf-8"
+        for header in part.get('headers', []):
+            if header['name'].lower() == 'content-type' and 'charset=' in header['value']:
+                charset = header['value'].split('charset=', 1)[1].split(';')[0].strip('"\' ')
+        try:
+            return base64.urlsafe_b64decode(data).decode(charset, errors='replace')
+        except LookupError:
+            return base64.urlsafe_b64decode(data).decode("utf-8", errors='replace')
 
     async def _send_microsoft_email(
         self,
@@ -223,10 +937,11 @@ class EmailService:
             ).decode()
             
             # Send the email
-            sent_message = self.client.users().messages().send(
+            sent_message = await execute(self.client.users().messages().send(
                 userId='me',
-                body={'raw': raw}
-            ).execute()
+                body={'raw': raw},
+                fields='id'
+            ))
             
             return {
                 "status": "sent",
@@ -234,3 +949,139 @@ class EmailService:
             }
         except Exception as e:
             raise Exception(f"Error sending Gmail email: {str(e)}")
+
+    async def _send_microsoft_email_with_attachment(
+        self,
+        to: List[str],
+        subject: str,
+        body: str,
+        filename: str,
+        content_type: str,
+        size: int,
+        content: AsyncIterator[bytes],
+        cc: Optional[List[str]],
+        bcc: Optional[List[str]]
+    ) -> Dict:
+        """Send through Microsoft 365 via a draft, uploading large attachments in sessions"""
+        try:
+            message = {
+                "subject": subject,
+                "body": {
+                    "contentType": "HTML",
+                    "content": body
+                },
+                "toRecipients": [
+                    {"emailAddress": {"address": email}} for email in to
+                ]
+            }
+            if cc:
+                message["ccRecipients"] = [
+                    {"emailAddress": {"address": email}} for email in cc
+                ]
+            if bcc:
+                message["bccRecipients"] = [
+                    {"emailAddress": {"address": email}} for email in bcc
+                ]
+            
+            draft = await self.client.me.messages.post(body=message)
+            draft_request = self.client.me.messages[draft.id]
+            try:
+                if size <= settings.GRAPH_ATTACHMENT_INLINE_LIMIT:
+                    # Small files go inline; the buffer is capped by the inline limit
+                    data = b"".join([chunk async for chunk in content])
+                    await draft_request.attachments.post(body={
+                        "@odata.type": "#microsoft.graph.fileAttachment",
+                        "name": filename,
+                        "contentType": content_type,
+                        "contentBytes": base64.b64encode(data).decode()
+                    })
+                else:
+                    session = await draft_request.attachments.create_upload_session.post(body={
+                        "AttachmentItem": {
+                            "attachmentType": "file",
+                            "name": filename,
+                            "contentType": content_type,
+                            "size": size
+                        }
+                    })
+                    offset = 0
+                    async for chunk in rechunk(content, settings.ATTACHMENT_UPLOAD_CHUNK_SIZE):
+                        # The upload URL is pre-authenticated; no bearer token is sent
+                        response = await provider_http.client.put(
+                            session.upload_url,
+                            content=chunk,
+                            headers={
+                                "Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{size}"
+                            }
+                        )
+                        response.raise_for_status()
+                        offset += len(chunk)
+                
+                await draft_request.send.post()
+            except Exception:
+                await draft_request.delete()
+                raise
+            
+            return {"status": "sent", "message_id": draft.id}
+        except Exception as e:
+            raise Exception(f"Error sending Microsoft email: {str(e)}")
+
+    async def _send_google_email_with_attachment(
+        self,
+        to: List[str],
+        subject: str,
+        body: str,
+        filename: str,
+        content_type: str,
+        size: int,
+        content: AsyncIterator[bytes],
+        cc: Optional[List[str]],
+        bcc: Optional[List[str]]
+    ) -> Dict:
+        """Send through Gmail's media upload, base64-encoding the attachment on the fly"""
+        try:
+            message = MIMEMultipart()
+            message['to'] = ', '.join(to)
+            message['subject'] = subject
+            
+            if cc:
+                message['cc'] = ', '.join(cc)
+            if bcc:
+                message['bcc'] = ', '.join(bcc)
+            
+            message.attach(MIMEText(body, 'html'))
+            
+            # Render the MIME envelope around a marker and stream the content in its place
+            maintype, _, subtype = content_type.partition('/')
+            attachment = MIMEBase(maintype or 'application', subtype or 'octet-stream')
+            attachment.add_header('Content-Disposition', 'attachment', filename=filename)
+            attachment['Content-Transfer-Encoding'] = 'base64'
+            attachment.set_payload(_ATTACHMENT_MARKER)
+            message.attach(attachment)
+            head, tail = message.as_bytes().split(_ATTACHMENT_MARKER.encode())
+            
+            async def raw_message():
+                yield head
+                async for chunk in iter_base64_lines(content):
+                    yield chunk
+                yield tail
+            
+            token = await bearer_token(self.platform, self.credentials)
+            response = await provider_http.client.post(
+                f"{GMAIL_UPLOAD_URL}/users/me/messages/send",
+                params={"uploadType": "media"},
+                content=raw_message(),
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "message/rfc822",
+                    "Content-Length": str(len(head) + base64_lines_length(size) + len(tail))
+                }
+            )
+            response.raise_for_status()
+            
+            return {
+                "status": "sent",
+                "message_id": response.json()['id']
+            }
+        except Exception as e:
+            raise Exception(f"Error sending Gmail email: {str(e)}")
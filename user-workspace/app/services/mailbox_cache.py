@@ -0,0 +1,97 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+import time
+from config import settings
+from app.utils.cache import TTLCache
+from app.utils.keyed_lock import KeyedLock
+
+class MailboxState:
+    """Locally cached messages for one user's folder plus the provider sync cursor"""
+
+    def __init__(self):
+        self.messages: Dict[str, Dict] = {}
+        # Gmail historyId or Graph deltaLink; None forces a full sync
+        self.cursor: Optional[str] = None
+        # Gmail label id the folder resolves to; kept across resets
+        self.label_id: Optional[str] = None
+        # True when the cache holds every message in the folder
+        self.complete = False
+        # Start of a windowed sync: every message received since is cached, nothing older is
+        self.window_start: Optional[str] = None
+        self.synced_at = 0.0
+        # Changes since the last drain, consumed by the search index
+        self._upserted: Dict[str, Dict] = {}
+        self._removed: Set[str] = set()
+
+    def reset(self) -> None:
+        """Drop the sync cursor so the next sync starts over"""
+        self.messages.clear()
+        self.cursor = None
+        self.complete = False
+        self.window_start = None
+
+    def put(self, email: Dict) -> None:
+        """Store a fetched message"""
+        self.messages[email["id"]] = email
+        self._upserted[email["id"]] = email
+        self._removed.discard(email["id"])
+
+    def remove(self, message_id: str) -> None:
+        """Forget a message deleted or moved out of the folder"""
+        self.messages.pop(message_id, None)
+        self._upserted.pop(message_id, None)
+        self._removed.add(message_id)
+
+    def drain_changes(self) -> Tuple[List[Dict], List[str]]:
+        """Return and reset messages stored and removed since the last drain"""
+        changes = (list(self._upserted.values()), list(self._removed))
+        self._upserted, self._removed = {}, set()
+        return changes
+
+    def is_fresh(self) -> bool:
+        return time.monotonic() - self.synced_at < settings.MAIL_SYNC_MIN_INTERVAL_SECONDS
+
+    def newest(self, limit: int) -> List[Dict]:
+        """Return the most recently received messages"""
+        return sorted(
+            self.messages.values(),
+            key=lambda email: str(email["received"]),
+            reverse=True
+        )[:limit]
+
+    def trim(self, max_messages: int) -> None:
+        """Keep only the newest messages, marking the cache incomplete if any were dropped"""
+        if len(self.messages) > max_messages:
+            keep = self.newest(max_messages)
+            self.messages = {email["id"]: email for email in keep}
+            self.complete = False
+            self.window_start = None
+
+class MailboxCache:
+    """Process-wide mailbox states keyed by (user, platform, folder)"""
+
+    def __init__(
+        self,
+        max_mailboxes: int = settings.MAIL_CACHE_MAX_MAILBOXES,
+        ttl: int = settings.MAIL_CACHE_TTL_SECONDS
+    ):
+        self._states = TTLCache(maxsize=max_mailboxes, ttl=ttl)
+        self.locks = KeyedLock()
+        self._stats = {"syncs": 0, "full_syncs": 0, "messages_transferred": 0, "messages_removed": 0}
+
+    def get(self, key: Tuple[str, str, str]) -> MailboxState:
+        state = self._states.get(key)
+        if state is None:
+            state = MailboxState()
+            self._states.set(key, state)
+        return state
+
+    def record_sync(self, result: Dict[str, Any]) -> None:
+        self._stats["syncs"] += 1
+        self._stats["full_syncs"] += int(result["full"])
+        self._stats["messages_transferred"] += result["transferred"]
+        self._stats["messages_removed"] += result["removed"]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self._stats, "mailboxes": self._states.get_metrics()}
+
+mailbox_cache = MailboxCache()
@@ -0,0 +1,42 @@
+from typing import Any, Dict, List, Optional
+from config import settings
+from app.utils.cache import TTLCache
+
+# Kinds of metadata cached per user
+TASK_LISTS = "task_lists"
+CALENDARS = "calendars"
+
+class TaskMetadataCache:
+    """Process-wide cache of a user's task lists and calendars keyed by (user, platform)
+
+    Lists and calendars rarely change, so entries live for TASK_METADATA_TTL_SECONDS
+    and are dropped early whenever a write may have made them stale.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.TASK_METADATA_MAX_ENTRIES,
+        ttl: float = settings.TASK_METADATA_TTL_SECONDS
+    ):
+        self._entries = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._stats = {"invalidations": 0, "warmups": 0}
+
+    def get(self, user_id: str, platform: str, kind: str) -> Optional[List[Dict]]:
+        return self._entries.get((user_id, platform, kind))
+
+    def set(self, user_id: str, platform: str, kind: str, items: List[Dict]) -> None:
+        self._entries.set((user_id, platform, kind), items)
+
+    def invalidate(self, user_id: str, platform: str) -> None:
+        """Drop every kind of metadata cached for a user"""
+        self._stats["invalidations"] += 1
+        for kind in (TASK_LISTS, CALENDARS):
+            self._entries.pop((user_id, platform, kind))
+
+    def record_warmup(self) -> None:
+        self._stats["warmups"] += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self._stats, "entries": self._entries.get_metrics()}
+
+task_metadata = TaskMetadataCache()
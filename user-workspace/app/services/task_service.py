@@ -1,14 +1,26 @@
 from typing import Dict, List, Optional
+import asyncio
 from fastapi import HTTPException
 from microsoft.graph import GraphServiceClient
 from googleapiclient.discovery import build
-from datetime import datetime, timedelta
+from app.services.task_metadata import task_metadata, TASK_LISTS, CALENDARS
+from app.utils.google_api import execute
+from app.utils.singleflight import singleflight, make_key
+
+# Field masks for the parts of each resource the service returns
+GOOGLE_TASK_FIELDS = "id,title,status,due,notes"
+GOOGLE_EVENT_FIELDS = "id,summary,start,end,htmlLink"
+MICROSOFT_TASK_FIELDS = "id,title,status,dueDateTime,importance"
 
 class TaskService:
-    def __init__(self, platform: str, credentials: Dict):
+    def __init__(self, platform: str, credentials: Dict, user_id: str):
         """Initialize task service for specified platform"""
         self.platform = platform
         self.credentials = credentials
+        # Keys the process-wide caches and request coalescing, so it must identify the account
+        if not user_id:
+            raise ValueError("user_id is required")
+        self.user_id = user_id
         self._init_client()
 
     def _init_client(self):
@@ -42,6 +54,9 @@ class TaskService:
             elif self.platform == "google":
                 return await self._create_google_task(title, description, due_date, list_id)
         except Exception as e:
+            if not list_id:
+                # The cached default list may have been deleted; resolve it again next time
+                task_metadata.invalidate(self.user_id, self.platform)
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to create task: {str(e)}"
@@ -53,12 +68,23 @@ class TaskService:
         status: Optional[str] = None
     ) -> List[Dict]:
         """Get tasks from specified list"""
+        key = make_key(self.user_id, "task.get_tasks", self.platform, list_id, status)
+        return await singleflight.do(key, lambda: self._get_tasks(list_id, status))
+
+    async def _get_tasks(
+        self,
+        list_id: Optional[str],
+        status: Optional[str]
+    ) -> List[Dict]:
+        """Get tasks, raising HTTPException on failure"""
         try:
             if self.platform == "microsoft":
                 return await self._get_microsoft_tasks(list_id, status)
             elif self.platform == "google":
                 return await self._get_google_tasks(list_id, status)
         except Exception as e:
+            if not list_id:
+                task_metadata.invalidate(self.user_id, self.platform)
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to get tasks: {str(e)}"
@@ -71,24 +97,139 @@ class TaskService:
         end_time: str,
         description: Optional[str] = None,
         attendees: Optional[List[str]] = None,
-        location: Optional[str] = None
+        location: Optional[str] = None,
+        calendar: Optional[str] = None
     ) -> Dict:
-        """Create a calendar event"""
+        """Create a calendar event, in the default calendar unless one is named by id or name"""
         try:
+            calendar_id = await self._calendar_id(calendar)
             if self.platform == "microsoft":
                 return await self._create_microsoft_event(
-                    title, start_time, end_time, description, attendees, location
+                    title, start_time, end_time, description, attendees, location, calendar_id
                 )
             elif self.platform == "google":
                 return await self._create_google_event(
-                    title, start_time, end_time, description, attendees, location
+                    title, start_time, end_time, description, attendees, location, calendar_id
                 )
         except Exception as e:
+            if calendar:
+                # The calendar may have been created, renamed or deleted since it was cached
+                task_metadata.invalidate(self.user_id, self.platform)
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to create event: {str(e)}"
             )
 
+    async def get_task_lists(self) -> List[Dict]:
+        """Get the user's task lists, the default one first, from the metadata cache when fresh"""
+        return await self._get_metadata(TASK_LISTS, self._fetch_task_lists)
+
+    async def get_calendars(self) -> List[Dict]:
+        """Get the user's calendars, from the metadata cache when fresh"""
+        return await self._get_metadata(CALENDARS, self._fetch_calendars)
+
+    async def create_task_list(self, title: str) -> Dict:
+        """Create a task list"""
+        try:
+            if self.platform == "microsoft":
+                response = await self.client.me.todo.lists.post(body={"displayName": title})
+                task_list = {"id": response.id, "name": response.display_name, "default": False}
+            elif self.platform == "google":
+                response = await execute(self.client.tasklists().insert(
+                    body={"title": title},
+                    fields="id,title"
+                ))
+                task_list = {"id": response['id'], "name": response['title'], "default": False}
+            task_metadata.invalidate(self.user_id, self.platform)
+            return task_list
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to create task list: {str(e)}"
+            )
+
+    async def warm_metadata(self) -> None:
+        """Load task lists and calendars into the cache, e.g. right after login"""
+        task_metadata.record_warmup()
+        await asyncio.gather(self.get_task_lists(), self.get_calendars())
+
+    async def _get_metadata(self, kind: str, fetch) -> List[Dict]:
+        """Serve metadata from the cache, coalescing concurrent misses into one fetch"""
+        cached = task_metadata.get(self.user_id, self.platform, kind)
+        if cached is not None:
+            return cached
+        
+        async def load() -> List[Dict]:
+            try:
+                items = await fetch()
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Failed to get {kind.replace('_', ' ')}: {str(e)}"
+                )
+            task_metadata.set(self.user_id, self.platform, kind, items)
+            return items
+        
+        key = make_key(self.user_id, f"task.{kind}", self.platform)
+        return await singleflight.do(key, load)
+
+    async def _default_list_id(self) -> str:
+        """Resolve the user's default task list through the metadata cache"""
+        task_lists = await self.get_task_lists()
+        if not task_lists:
+            raise ValueError("No task lists found")
+        return task_lists[0]["id"]
+
+    async def _calendar_id(self, calendar: Optional[str]) -> Optional[str]:
+        """Resolve a calendar id or name through the metadata cache; None means the default calendar"""
+        if not calendar:
+            return None
+        for item in await self.get_calendars():
+            if calendar == item["id"] or calendar.lower() == item["name"].lower():
+                return item["id"]
+        raise ValueError(f"Calendar not found: {calendar}")
+
+    async def _fetch_task_lists(self) -> List[Dict]:
+        """Fetch task lists from the provider"""
+        if self.platform == "microsoft":
+            response = await self.client.me.todo.lists.get(
+                params={"$select": "id,displayName,wellknownListName"}
+            )
+            task_lists = [{
+                "id": task_list.id,
+                "name": task_list.display_name,
+                "default": task_list.wellknown_list_name == "defaultList"
+            } for task_list in response.value]
+        else:
+            # Google lists its default list first
+            response = await execute(self.client.tasklists().list(maxResults=100, fields='items(id,title)'))
+            task_lists = [{
+                "id": task_list['id'],
+                "name": task_list['title'],
+                "default": index == 0
+            } for index, task_list in enumerate(response.get('items', []))]
+        return sorted(task_lists, key=lambda task_list: not task_list["default"])
+
+    async def _fetch_calendars(self) -> List[Dict]:
+        """Fetch calendars from the provider"""
+        if self.platform == "microsoft":
+            response = await self.calendar_client.me.calendars.get(
+                params={"$select": "id,name,isDefaultCalendar"}
+            )
+            return [{
+                "id": calendar.id,
+                "name": calendar.name,
+                "default": bool(calendar.is_default_calendar)
+            } for calendar in response.value]
+        response = await execute(self.calendar_client.calendarList().list(
+            fields='items(id,summary,primary)'
+        ))
+        return [{
+            "id": calendar['id'],
+            "name": calendar['summary'],
+            "default": calendar.get('primary', False)
+        } for calendar in response.get('items', [])]
+
     async def _create_microsoft_task(
         self,
         title: str,
@@ -118,8 +259,7 @@ class TaskService:
             
             # Use default list if not specified
             if not list_id:
-                lists = await self.client.me.todo.lists.get()
-                list_id = lists.value[0].id
+                list_id = await self._default_list_id()
             
             response = await self.client.me.todo.lists[list_id].tasks.post(
                 body=task_data
@@ -156,13 +296,13 @@ class TaskService:
             
             # Use default list if not specified
             if not list_id:
-                lists = self.client.tasklists().list().execute()
-                list_id = lists['items'][0]['id']
+                list_id = await self._default_list_id()
             
-            response = self.client.tasks().insert(
+            response = await execute(self.client.tasks().insert(
                 tasklist=list_id,
-                body=task_data
-            ).execute()
+                body=task_data,
+                fields=GOOGLE_TASK_FIELDS
+            ))
             
             return {
                 "id": response['id'],
@@ -182,17 +322,17 @@ class TaskService:
         try:
             # Use default list if not specified
             if not list_id:
-                lists = await self.client.me.todo.lists.get()
-                list_id = lists.value[0].id
+                list_id = await self._default_list_id()
             
             # Build filter query
             filter_query = None
             if status:
                 filter_query = f"status eq '{status}'"
             
-            tasks = await self.client.me.todo.lists[list_id].tasks.get(
-                params={"$filter": filter_query} if filter_query else None
-            )
+            params = {"$select": MICROSOFT_TASK_FIELDS}
+            if filter_query:
+                params["$filter"] = filter_query
+            tasks = await self.client.me.todo.lists[list_id].tasks.get(params=params)
             
             return [{
                 "id": task.id,
@@ -213,14 +353,14 @@ class TaskService:
         try:
             # Use default list if not specified
             if not list_id:
-                lists = self.client.tasklists().list().execute()
-                list_id = lists['items'][0]['id']
+                list_id = await self._default_list_id()
             
             # Get tasks
-            tasks = self.client.tasks().list(
+            tasks = await execute(self.client.tasks().list(
                 tasklist=list_id,
-                showCompleted=True
-            ).execute()
+                showCompleted=True,
+                fields=f"items({GOOGLE_TASK_FIELDS})"
+            ))
             
             # Filter by status if specified
             task_list = tasks.get('items', [])
@@ -247,7 +387,8 @@ class TaskService:
         end_time: str,
         description: Optional[str],
         attendees: Optional[List[str]],
-        location: Optional[str]
+        location: Optional[str],
+        calendar_id: Optional[str] = None
     ) -> Dict:
         """Create event in Microsoft Calendar"""
         try:
@@ -284,7 +425,11 @@ class TaskService:
                     } for email in attendees
                 ]
             
-            response = await self.calendar_client.me.events.post(
+            events = (
+                self.calendar_client.me.calendars[calendar_id].events if calendar_id
+                else self.calendar_client.me.events
+            )
+            response = await events.post(
                 body=event_data
             )
             
@@ -305,7 +450,8 @@ class TaskService:
         end_time: str,
         description: Optional[str],
         attendees: Optional[List[str]],
-        location: Optional[str]
+        location: Optional[str],
+        calendar_id: Optional[str] = None
     ) -> Dict:
         """Create event in Google Calendar"""
         try:
@@ -332,11 +478,12 @@ class TaskService:
                     {'email': email} for email in attendees
                 ]
             
-            response = self.calendar_client.events().insert(
-                calendarId='primary',
+            response = await execute(self.calendar_client.events().insert(
+                calendarId=calendar_id or 'primary',
                 body=event_data,
-                sendUpdates='all'
-            ).execute()
+                sendUpdates='all',
+                fields=GOOGLE_EVENT_FIELDS
+            ))
             
             return {
                 "id": response['id'],
@@ -0,0 +1,124 @@
+from typing import AsyncIterator, Dict, Optional, Tuple
+import asyncio
+import httpx
+from config import settings
+from app.utils.http import provider_http
+from app.utils.streams import rechunk
+
+# Drive requires chunks in multiples of 256 KiB and Graph in multiples of 320 KiB
+UPLOAD_CHUNK_ALIGNMENT = 1310720
+
+class UploadRetryableError(Exception):
+    """A chunk failed in a way the provider expects clients to retry"""
+
+class ResumableUpload:
+    """Chunked upload to a Drive or Graph upload session that resumes from the committed offset
+    
+    Only the chunk in flight is held in memory. After a failed chunk the session is
+    asked how much it actually stored and the upload continues from there.
+    """
+
+    def __init__(
+        self,
+        platform: str,
+        session_url: str,
+        size: int,
+        headers: Optional[Dict[str, str]] = None,
+        chunk_size: int = settings.DOCUMENT_UPLOAD_CHUNK_SIZE,
+        max_retries: int = settings.DOCUMENT_UPLOAD_MAX_RETRIES
+    ):
+        if chunk_size % UPLOAD_CHUNK_ALIGNMENT:
+            raise ValueError(f"Upload chunk size must be a multiple of {UPLOAD_CHUNK_ALIGNMENT} bytes")
+        self.platform = platform
+        self.session_url = session_url
+        self.size = size
+        # Graph upload URLs are pre-authenticated and reject bearer tokens
+        self.headers = headers or {}
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.retries = 0
+
+    async def upload(self, content: AsyncIterator[bytes]) -> Dict:
+        """Send content and return the provider's resource for the finished file"""
+        offset = 0
+        result: Optional[Dict] = None
+        attempts = 0
+        resync = False
+        async for chunk in rechunk(content, self.chunk_size):
+            view = memoryview(chunk)
+            while view:
+                try:
+                    if resync:
+                        committed, result = await self._status()
+                        resync = False
+                    else:
+                        committed, result = await self._send(view, offset)
+                        if committed <= offset:
+                            raise UploadRetryableError(f"Session did not accept bytes from {offset}")
+                except (httpx.TransportError, UploadRetryableError):
+                    attempts += 1
+                    self.retries += 1
+                    if attempts > self.max_retries:
+                        raise
+                    await asyncio.sleep(min(2 ** (attempts - 1), 30))
+                    # Ask the session how much it stored before resending
+                    resync = True
+                    continue
+                
+                # Skip whatever the session already holds; resend the rest of the chunk
+                stored = max(0, min(committed - offset, len(view)))
+                view = view[stored:]
+                offset += stored
+                if stored:
+                    attempts = 0
+        
+        if offset != self.size:
+            raise Exception(f"Upload ended at byte {offset} of {self.size}")
+        if result is None:
+            # The last chunk landed but its response was lost
+            _, result = await self._status()
+        return result or {}
+
+    async def _send(self, view: memoryview, offset: int) -> Tuple[int, Optional[Dict]]:
+        """PUT one chunk, returning the committed offset and the final resource if complete"""
+        response = await provider_http.client.put(
+            self.session_url,
+            content=bytes(view),
+            headers={
+                **self.headers,
+                "Content-Range": f"bytes {offset}-{offset + len(view) - 1}/{self.size}"
+            }
+        )
+        return self._parse_progress(response)
+
+    async def _status(self) -> Tuple[int, Optional[Dict]]:
+        """Ask the session how many bytes it has stored"""
+        if self.platform == "google":
+            response = await provider_http.client.put(
+                self.session_url,
+                headers={**self.headers, "Content-Range": f"bytes */{self.size}"}
+            )
+        else:
+            response = await provider_http.client.get(self.session_url)
+        return self._parse_progress(response)
+
+    def _parse_progress(self, response: httpx.Response) -> Tuple[int, Optional[Dict]]:
+        if response.status_code == 429 or response.status_code >= 500:
+            raise UploadRetryableError(f"{response.status_code}: {response.text[:200]}")
+        
+        if self.platform == "google":
+            if response.status_code in (200, 201):
+                return self.size, response.json()
+            if response.status_code == 308:
+                # Range: bytes=0-<last stored byte>, absent when nothing is stored yet
+                stored = response.headers.get("Range")
+                return (int(stored.rsplit("-", 1)[1]) + 1 if stored else 0), None
+        elif response.status_code in (200, 201, 202):
+            body = response.json()
+            # Graph reports progress as nextExpectedRanges until the item is created
+            if "nextExpectedRanges" not in body:
+                return self.size, body
+            ranges = body["nextExpectedRanges"] or [f"{self.size}-"]
+            return int(ranges[0].split("-", 1)[0]), None
+        
+        raise Exception(f"Upload session failed with {response.status_code}: {response.text[:200]}")
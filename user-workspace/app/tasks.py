@@ -0,0 +1,154 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import httpx
+from celery import Celery, group
+from googleapiclient.errors import HttpError
+from config import settings
+from app.auth.credentials import build_credentials
+from app.auth.microsoft import MicrosoftAuth
+from app.services.bulk_email import BulkEmailJobs, chunk_messages
+from app.services.email_service import EmailService
+from app.utils.rate_limit import RedisTokenBucket
+
+celery = Celery("workproduction", broker=settings.REDIS_URL, backend=settings.REDIS_URL)
+
+SEND_RATES = {
+    "google": settings.GMAIL_SEND_RATE_PER_SECOND,
+    "microsoft": settings.GRAPH_SEND_RATE_PER_SECOND
+}
+
+def enqueue_bulk_email(
+    user_id: str,
+    platform: str,
+    token_info: Dict,
+    messages: List[Dict]
+) -> Dict[str, Any]:
+    """Queue a batch of messages as chunked Celery tasks and return the job handle"""
+    jobs = BulkEmailJobs()
+    chunks = chunk_messages(messages, settings.BULK_EMAIL_CHUNK_SIZE)
+    job_id = jobs.create(user_id, total=len(messages), chunks=len(chunks))
+    token_ref = jobs.store_token(job_id, token_info)
+
+    offset = 0
+    signatures = []
+    for chunk in chunks:
+        signatures.append(
+            send_bulk_email_chunk.s(job_id, user_id, platform, token_ref, chunk, offset)
+        )
+        offset += len(chunk)
+    group(signatures).apply_async()
+
+    return {"job_id": job_id, "total": len(messages), "chunks": len(chunks)}
+
+def _provider_status(error: Optional[BaseException]) -> Optional[int]:
+    """Find the provider's HTTP status behind an error wrapped by the service layer"""
+    while error is not None:
+        if isinstance(error, HttpError):
+            return error.resp.status
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code
+        if getattr(error, "response_status_code", None):
+            return error.response_status_code
+        error = error.__cause__ or error.__context__
+    return None
+
+def _is_retryable(error: Exception) -> bool:
+    """Only throttling and server errors are worth sending again"""
+    status = _provider_status(error)
+    return status is not None and (status == 429 or status >= 500)
+
+def _current_token_info(
+    jobs: BulkEmailJobs,
+    platform: str,
+    token_ref: str,
+    loop: asyncio.AbstractEventLoop
+) -> Optional[Dict]:
+    """Load a job's tokens, refreshing a Microsoft access token that may have expired
+    
+    Chunks may run long after the job was queued. Google credentials refresh on
+    their own with the app's client id and secret, which only settings hold.
+    """
+    token_info = jobs.load_token(token_ref)
+    if token_info is None:
+        return None
+    if platform == "google":
+        return {
+            **token_info,
+            "client_id": settings.GOOGLE_CLIENT_ID,
+            "client_secret": settings.GOOGLE_CLIENT_SECRET
+        }
+    if not token_info.get("refresh_token"):
+        return token_info
+    refreshed = loop.run_until_complete(MicrosoftAuth().refresh_token(token_info["refresh_token"]))
+    if not refreshed:
+        return token_info
+    # Refresh tokens rotate, so later chunks must start from the new one
+    token_info = {**token_info, **refreshed}
+    jobs.save_token(token_ref, token_info)
+    return token_info
+
+@celery.task(
+    name="emails.send_bulk_chunk",
+    bind=True,
+    acks_late=True,
+    max_retries=settings.BULK_EMAIL_MAX_RETRIES
+)
+def send_bulk_email_chunk(
+    self,
+    job_id: str,
+    user_id: str,
+    platform: str,
+    token_ref: str,
+    messages: List[Dict],
+    offset: int
+) -> None:
+    """Send one chunk, paced by the account's shared token bucket
+    
+    Messages already handled by an earlier delivery or retry of the chunk are
+    skipped, so redelivery never sends an email twice. Throttled or server-failed
+    sends retry the chunk with backoff; other failures are recorded at once.
+    """
+    jobs = BulkEmailJobs()
+    jobs.mark_started(job_id)
+
+    # Every chunk for the account draws from one bucket, so parallel workers respect the quota
+    bucket = RedisTokenBucket(
+        jobs.redis,
+        key=f"bulk:rate:{platform}:{user_id}",
+        rate=SEND_RATES[platform],
+        capacity=settings.BULK_EMAIL_BURST
+    )
+    completed = jobs.completed_indexes(job_id)
+    loop = asyncio.new_event_loop()
+    retrying = False
+    try:
+        token_info = _current_token_info(jobs, platform, token_ref, loop)
+        if token_info is None:
+            # The job outlived its stored tokens; nothing in the chunk can be sent
+            for index in range(offset, offset + len(messages)):
+                jobs.record_failure(job_id, index, "Credentials for this job have expired")
+            return
+        service = EmailService(platform, build_credentials(platform, token_info), user_id=user_id)
+        for index, message in enumerate(messages, start=offset):
+            if index in completed:
+                continue
+            bucket.acquire()
+            try:
+                loop.run_until_complete(service.send_email(
+                    to=message["to"],
+                    subject=message["subject"],
+                    body=message["body"],
+                    cc=message.get("cc"),
+                    bcc=message.get("bcc")
+                ))
+            except Exception as e:
+                if _is_retryable(e) and self.request.retries < self.max_retries:
+                    retrying = True
+                    raise self.retry(exc=e, countdown=2 ** self.request.retries)
+                jobs.record_failure(job_id, index, str(getattr(e, "detail", e)))
+                continue
+            jobs.record_sent(job_id, index)
+    finally:
+        loop.close()
+        if not retrying:
+            jobs.finish_chunk(job_id, offset)
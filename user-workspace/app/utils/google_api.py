@@ -0,0 +1,49 @@
+from typing import Any, Dict, Optional
+import asyncio
+import threading
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+
+# Worker threads each keep their own transport, so TLS connections to Google
+# are reused across calls without two threads ever sharing one
+_local = threading.local()
+
+def _request_http(request: Any) -> Any:
+    """Return the connection a request (or batch) was built with"""
+    http = getattr(request, "http", None)
+    if http is None:
+        # A batch has no connection of its own and sends over its first request's
+        http = next((item.http for item in request._requests.values() if item is not None), None)
+    return http
+
+def _thread_transport(timeout: Optional[float]) -> httplib2.Http:
+    """Return this thread's pooled transport for the given timeout"""
+    transports: Dict[Optional[float], httplib2.Http] = getattr(_local, "transports", None)
+    if transports is None:
+        transports = _local.transports = {}
+    transport = transports.get(timeout)
+    if transport is None:
+        transport = transports[timeout] = httplib2.Http(timeout=timeout)
+    return transport
+
+def _thread_http(http: Any) -> Any:
+    """Return a connection for this thread, keeping the request's credentials and timeout
+
+    The transport holds no credentials of its own; AuthorizedHttp adds the
+    caller's token to each request, so one transport serves every account.
+    """
+    if isinstance(http, AuthorizedHttp):
+        return AuthorizedHttp(http.credentials, http=_thread_transport(http.http.timeout))
+    return _thread_transport(getattr(http, "timeout", None))
+
+def execute_sync(request: Any) -> Any:
+    """Execute a googleapiclient request on this thread's connection
+
+    httplib2 connections are not thread-safe, so calls that run in worker
+    threads must not share the client's connection.
+    """
+    return request.execute(http=_thread_http(_request_http(request)))
+
+async def execute(request: Any) -> Any:
+    """Execute a googleapiclient request in a worker thread, keeping the event loop free"""
+    return await asyncio.to_thread(execute_sync, request)
@@ -0,0 +1,57 @@
+from typing import AsyncIterator
+import httpx
+from config import settings
+
+GRAPH_API_URL = "https://graph.microsoft.com/v1.0"
+
+class ProviderHTTPError(Exception):
+    """A raw provider call returned an error status"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+class ProviderHTTPClient:
+    """Shared keep-alive pool for provider calls the SDKs cannot stream"""
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.PROVIDER_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.PROVIDER_HTTP_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            # Per-read timeout rather than a total, so long transfers are not cut off
+            timeout=httpx.Timeout(settings.PROVIDER_HTTP_TIMEOUT, connect=5.0)
+        )
+
+    async def open(
+        self,
+        method: str,
+        url: str,
+        follow_redirects: bool = False,
+        **kwargs
+    ) -> httpx.Response:
+        """Send a request and return once the headers arrive, leaving the body unread"""
+        request = self.client.build_request(method, url, **kwargs)
+        response = await self.client.send(request, stream=True, follow_redirects=follow_redirects)
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            raise ProviderHTTPError(
+                response.status_code,
+                f"{response.status_code} from {request.url.host}: {response.text[:500]}"
+            )
+        return response
+
+    async def iter_bytes(self, response: httpx.Response, chunk_size: int) -> AsyncIterator[bytes]:
+        """Yield an opened response body in chunks, closing it when done or abandoned"""
+        try:
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+        finally:
+            await response.aclose()
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+provider_http = ProviderHTTPClient()
@@ -0,0 +1,69 @@
+from typing import Any, Dict
+from contextlib import asynccontextmanager
+import asyncio
+import time
+
+class _LockEntry:
+    __slots__ = ("lock", "holders")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Callers holding or waiting on the lock
+        self.holders = 0
+
+class KeyedLock:
+    """FIFO async lock per key; entries are dropped as soon as nobody holds or waits on them"""
+
+    def __init__(self):
+        self._entries: Dict[str, _LockEntry] = {}
+        self._stats = {
+            "acquisitions": 0,
+            "contended": 0,
+            "max_queue_depth": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0
+        }
+
+    @asynccontextmanager
+    async def acquire(self, key: str):
+        """Hold the lock for key, queueing behind earlier callers for the same key"""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _LockEntry()
+        entry.holders += 1
+        if entry.holders > 1:
+            self._stats["contended"] += 1
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], entry.holders - 1)
+
+        start = time.perf_counter()
+        try:
+            async with entry.lock:
+                waited = time.perf_counter() - start
+                self._stats["acquisitions"] += 1
+                self._stats["wait_time_total"] += waited
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+                yield
+        finally:
+            entry.holders -= 1
+            if entry.holders == 0:
+                del self._entries[key]
+
+    def queue_depth(self, key: str) -> int:
+        """Return how many callers are waiting behind the current holder"""
+        entry = self._entries.get(key)
+        return max(entry.holders - 1, 0) if entry else 0
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return lock occupancy, queue depth and wait time metrics"""
+        acquisitions = self._stats["acquisitions"]
+        return {
+            "active_keys": len(self._entries),
+            "queued": sum(max(e.holders - 1, 0) for e in self._entries.values()),
+            "acquisitions": acquisitions,
+            "contended": self._stats["contended"],
+            "max_queue_depth": self._stats["max_queue_depth"],
+            "wait_avg_ms": (
+                self._stats["wait_time_total"] / acquisitions * 1000 if acquisitions else 0.0
+            ),
+            "wait_max_ms": self._stats["wait_time_max"] * 1000
+        }
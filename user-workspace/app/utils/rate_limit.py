@@ -0,0 +1,41 @@
+import time
+
+# Refill, then take one token if available; returns 0 or the seconds until a token frees up
+_TAKE_TOKEN = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+
+class RedisTokenBucket:
+    """Token bucket shared by every worker pacing calls for one key"""
+
+    def __init__(self, redis_client, key: str, rate: float, capacity: float):
+        self.redis = redis_client
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self._take = redis_client.register_script(_TAKE_TOKEN)
+
+    def acquire(self) -> float:
+        """Block until a token is available; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            wait = float(self._take(keys=[self.key], args=[self.rate, self.capacity, time.time()]))
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
@@ -0,0 +1,49 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+import asyncio
+import json
+
+T = TypeVar("T")
+
+def make_key(user_id: str, operation: str, *args: Any, **kwargs: Any) -> Tuple[str, str, str]:
+    """Build a coalescing key from the caller, operation and call arguments"""
+    arguments = json.dumps([args, kwargs], sort_keys=True, default=str)
+    return (user_id, operation, arguments)
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    async def do(self, key: Tuple[str, str, str], fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn, or wait on the identical call already in flight"""
+        stats = self._stats.setdefault(key[1], {"calls": 0, "coalesced": 0})
+        stats["calls"] += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            stats["coalesced"] += 1
+
+        # Shield so one caller disconnecting does not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return per-operation call and coalescing counters"""
+        return {
+            "in_flight": len(self._inflight),
+            "calls": sum(s["calls"] for s in self._stats.values()),
+            "coalesced": sum(s["coalesced"] for s in self._stats.values()),
+            "operations": {op: dict(s) for op, s in self._stats.items()}
+        }
+
+# Process-wide group shared by the AI layer and the services
+singleflight = SingleFlight()
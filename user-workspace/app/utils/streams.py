@@ -0,0 +1,88 @@
+from typing import AsyncIterator, Optional
+import base64
+import re
+
+_BASE64_LINE = 57  # Raw bytes per 76-character MIME base64 line
+_BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def single_byte_range(header: Optional[str]) -> Optional[str]:
+    """Return a Range header if it names one byte range, else None (the range is ignored)"""
+    if not header:
+        return None
+    match = _BYTE_RANGE.match(header.strip())
+    if match is None or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if start and end and int(end) < int(start):
+        return None
+    return header.strip()
+
+async def iter_chunks(data: bytes, size: int) -> AsyncIterator[bytes]:
+    """Yield an in-memory payload in fixed-size chunks"""
+    view = memoryview(data)
+    for start in range(0, len(view), size):
+        yield bytes(view[start:start + size])
+
+async def rechunk(chunks: AsyncIterator[bytes], size: int) -> AsyncIterator[bytes]:
+    """Regroup a byte stream into fixed-size chunks (the last may be shorter)"""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+def base64_lines_length(size: int) -> int:
+    """Length of iter_base64_lines output for a payload of size bytes"""
+    encoded = 4 * ((size + 2) // 3)
+    lines = (size + _BASE64_LINE - 1) // _BASE64_LINE
+    return encoded + max(lines - 1, 0)
+
+async def iter_base64_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Encode a byte stream as newline-separated MIME base64 lines without a trailing newline"""
+    first = True
+    async for line in rechunk(chunks, _BASE64_LINE):
+        yield base64.b64encode(line) if first else b"\n" + base64.b64encode(line)
+        first = False
+
+async def iter_json_base64_field(
+    chunks: AsyncIterator[bytes],
+    field: str,
+    max_prefix: int = 4096
+) -> AsyncIterator[bytes]:
+    """Decode one base64url string field of a streamed JSON object as it arrives
+    
+    Only the few bytes that do not yet form a whole base64 quantum are buffered,
+    so memory stays bounded however large the field is.
+    """
+    start = re.compile(rb'"' + re.escape(field.encode()) + rb'"\s*:\s*"')
+    buffer = bytearray()
+    found = False
+    async for chunk in chunks:
+        buffer += chunk
+        if not found:
+            match = start.search(buffer)
+            if match is None:
+                if len(buffer) > max_prefix:
+                    raise ValueError(f"Field '{field}' not found in response")
+                continue
+            found = True
+            del buffer[:match.end()]
+        
+        end = buffer.find(b'"')
+        if end != -1:
+            break
+        usable = len(buffer) - len(buffer) % 4
+        if usable:
+            yield base64.urlsafe_b64decode(bytes(buffer[:usable]))
+            del buffer[:usable]
+    else:
+        if not found:
+            raise ValueError(f"Field '{field}' not found in response")
+        raise ValueError(f"Truncated '{field}' field in response")
+    
+    tail = bytes(buffer[:end]).rstrip(b"=")
+    if tail:
+        yield base64.urlsafe_b64decode(tail + b"=" * (-len(tail) % 4))
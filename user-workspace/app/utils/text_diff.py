@@ -0,0 +1,66 @@
+from typing import Any, Dict, List, Tuple
+from difflib import SequenceMatcher
+
+# Changed blocks longer than this are replaced whole rather than diffed per character
+_MAX_REFINE_CHARS = 20000
+
+def diff_ranges(old: str, new: str) -> List[Tuple[int, int, str]]:
+    """Return (start, end, replacement) edits turning old into new, ordered by start
+
+    Lines are matched first; changed blocks are then refined per character so a
+    one-word edit stays a one-word edit. Offsets index into old.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    old_offsets = _offsets(old_lines)
+    new_offsets = _offsets(new_lines)
+
+    edits: List[Tuple[int, int, str]] = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        old_start, old_end = old_offsets[i1], old_offsets[i2]
+        new_start, new_end = new_offsets[j1], new_offsets[j2]
+        if tag != "replace" or max(old_end - old_start, new_end - new_start) > _MAX_REFINE_CHARS:
+            edits.append((old_start, old_end, new[new_start:new_end]))
+            continue
+
+        old_block, new_block = old[old_start:old_end], new[new_start:new_end]
+        for block_tag, a1, a2, b1, b2 in SequenceMatcher(None, old_block, new_block, autojunk=False).get_opcodes():
+            if block_tag != "equal":
+                edits.append((old_start + a1, old_start + a2, new_block[b1:b2]))
+    return edits
+
+def _offsets(lines: List[str]) -> List[int]:
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+def utf16_length(text: str) -> int:
+    """Length in UTF-16 code units, the unit Google Docs indexes count in"""
+    return len(text.encode("utf-16-le")) // 2
+
+def docs_update_requests(old: str, edits: List[Tuple[int, int, str]], base_index: int = 1) -> List[Dict[str, Any]]:
+    """Translate edits of a document's body text into Google Docs batchUpdate requests
+
+    Requests run last edit first, so each one's indexes are unaffected by the
+    edits applied before it.
+    """
+    positions: List[Tuple[int, int, str]] = []
+    index, consumed = base_index, 0
+    for start, end, text in edits:
+        index += utf16_length(old[consumed:start])
+        end_index = index + utf16_length(old[start:end])
+        positions.append((index, end_index, text))
+        index, consumed = end_index, end
+
+    requests: List[Dict[str, Any]] = []
+    for start_index, end_index, text in reversed(positions):
+        if end_index > start_index:
+            requests.append({
+                "deleteContentRange": {"range": {"startIndex": start_index, "endIndex": end_index}}
+            })
+        if text:
+            requests.append({"insertText": {"location": {"index": start_index}, "text": text}})
+    return requests
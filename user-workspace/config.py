@@ -19,6 +19,81 @@ class Settings(BaseSettings):
     
     # OpenAI Settings
     OPENAI_API_KEY: str = ""
+    LLM_MODEL: str = "gpt-4"
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_MAX_QUEUE: int = 64
+    LLM_QUEUE_TIMEOUT: float = 30.0
+    LLM_REQUEST_TIMEOUT: float = 60.0
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HISTORY_TOKEN_BUDGET: int = 3000
+    HISTORY_SUMMARY_TOKEN_BUDGET: int = 300
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_TTL_SECONDS: int = 600
+    TOOL_TIMEOUT_SECONDS: float = 20.0
+    TOOL_MAX_CALLS_PER_TURN: int = 8
+    TOOL_RESULT_MAX_CHARS: int = 8000
+    
+    # Document Retrieval Settings
+    EMBEDDING_BACKEND: str = "local"  # 'local' (feature hashing) or 'openai'
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_DIM: int = 512  # Local embedder only
+    EMBEDDING_BATCH_SIZE: int = 100
+    RETRIEVAL_CHUNK_TOKENS: int = 200
+    RETRIEVAL_CHUNK_OVERLAP_TOKENS: int = 30
+    RETRIEVAL_TOP_K: int = 4
+    RETRIEVAL_MIN_SCORE: float = 0.1
+    RETRIEVAL_TOKEN_BUDGET: int = 800
+    RETRIEVAL_MAX_USERS: int = 1000
+    RETRIEVAL_MAX_CHUNKS_PER_USER: int = 5000
+    RETRIEVAL_INDEX_TTL_SECONDS: int = 86400
+    
+    # Provider API Settings
+    GMAIL_BATCH_SIZE: int = 50  # Gmail allows 100 calls per batch but throttles above ~50
+    GMAIL_BATCH_MAX_RETRIES: int = 4  # Re-sends of throttled or failed sub-requests within a batch read
+    PROVIDER_HTTP_MAX_CONNECTIONS: int = 50
+    PROVIDER_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    PROVIDER_HTTP_TIMEOUT: float = 60.0
+    
+    # Document Upload Settings
+    DOCUMENT_UPLOAD_CHUNK_SIZE: int = 5242880  # Must be a multiple of 1280 KiB (Drive 256 KiB, Graph 320 KiB)
+    DOCUMENT_UPLOAD_MAX_RETRIES: int = 5
+    DOCUMENT_STREAM_CHUNK_SIZE: int = 65536
+    DOCUMENT_CACHE_MAX_ENTRIES: int = 500
+    DOCUMENT_CACHE_MAX_DOCUMENT_BYTES: int = 1048576
+    DOCUMENT_BULK_MAX_ITEMS: int = 200
+    DOCUMENT_BULK_CONCURRENCY: int = 10
+    GRAPH_BATCH_MAX_RETRIES: int = 3
+    GRAPH_BATCH_INLINE_LIMIT: int = 1048576  # Larger writes are sent outside the batch
+    DRIVE_BATCH_SIZE: int = 100
+    
+    # Attachment Settings
+    ATTACHMENT_CHUNK_SIZE: int = 262144
+    ATTACHMENT_UPLOAD_CHUNK_SIZE: int = 3276800  # Graph upload sessions accept up to 4 MB per request
+    GRAPH_ATTACHMENT_INLINE_LIMIT: int = 3145728  # Larger Graph attachments need an upload session
+    
+    # Mailbox Sync Settings
+    MAIL_SYNC_MIN_INTERVAL_SECONDS: int = 30
+    MAIL_SYNC_INITIAL_MESSAGES: int = 100
+    MAIL_SYNC_WINDOW_DAYS: int = 30
+    MAIL_CACHE_MAX_MESSAGES: int = 500
+    MAIL_CACHE_MAX_MAILBOXES: int = 1000
+    MAIL_CACHE_TTL_SECONDS: int = 3600
+    EMAIL_INDEX_PATH: str = ":memory:"  # Set a file path to keep the search index on disk
+    MAIL_INDEX_MAX_MESSAGES: int = 5000
+    
+    # Task Settings
+    TASK_METADATA_TTL_SECONDS: int = 900
+    TASK_METADATA_MAX_ENTRIES: int = 10000
+    
+    # Bulk Email Settings
+    GMAIL_SEND_RATE_PER_SECOND: float = 2.0
+    GRAPH_SEND_RATE_PER_SECOND: float = 0.5  # Exchange Online allows ~30 messages per minute
+    BULK_EMAIL_BURST: int = 5
+    BULK_EMAIL_CHUNK_SIZE: int = 100
+    BULK_EMAIL_MAX_RETRIES: int = 3
+    BULK_EMAIL_MAX_MESSAGES: int = 10000
+    BULK_EMAIL_JOB_TTL_SECONDS: int = 604800
     
     # Security Settings
     SECRET_KEY: str = "your-secret-key-here"  # Change in production
@@ -27,6 +102,14 @@ class Settings(BaseSettings):
     # Database Settings
     DATABASE_URL: str = "sqlite:///./workproduction.db"
     
+    # Redis Settings
+    REDIS_URL: str = "redis://localhost:6379/0"
+    
+    # Context Store Settings
+    CONTEXT_STORE_BACKEND: str = "memory"  # 'memory' or 'redis'
+    CONTEXT_TTL_SECONDS: int = 86400
+    CONTEXT_MAX_ENTRIES: int = 10000
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,290 @@
+"""Count round trips and response bytes per service operation, with and without field masks.
+
+Runs the Google paths of DocumentService and TaskService against a local fake
+Drive/Tasks server and compares them with the previous call sequences (full
+resources plus a read-after-write get). Without a mask the fake server returns
+the whole resource, as fields=* would. Operations run in order, so create_task
+finds the default task list already in the metadata cache.
+
+Usage: python scripts/benchmark_field_masks.py [--tasks 20]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import MediaIoBaseUpload
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.document_service import DocumentService  # noqa: E402
+from app.services.task_service import TaskService  # noqa: E402
+
+FILE_PATH = re.compile(r"^/(?:upload/)?drive/v3/files/([^/?]+)")
+TASKS_PATH = re.compile(r"^/tasks/v1/lists/([^/?]+)/tasks")
+LISTS_PATH = "/tasks/v1/users/@me/lists"
+
+
+def fake_file(file_id):
+    return {
+        "kind": "drive#file",
+        "id": file_id,
+        "name": f"Report {file_id}",
+        "mimeType": "application/vnd.google-apps.document",
+        "starred": False,
+        "trashed": False,
+        "parents": ["0AExampleRootFolder"],
+        "version": "42",
+        "webViewLink": f"https://docs.google.com/document/d/{file_id}/edit",
+        "iconLink": "https://drive-thirdparty.googleusercontent.com/16/type/application/vnd.google-apps.document",
+        "thumbnailLink": f"https://docs.google.com/feeds/vt?gd=true&id={file_id}&v=1&s=AMedNnoAAAAA",
+        "createdTime": "2024-01-02T09:00:00.000Z",
+        "modifiedTime": "2024-03-04T10:11:12.000Z",
+        "modifiedByMeTime": "2024-03-04T10:11:12.000Z",
+        "owners": [{
+            "kind": "drive#user",
+            "displayName": "Example User",
+            "photoLink": "https://lh3.googleusercontent.com/a/default-user=s64",
+            "me": True,
+            "permissionId": "01234567890123456789",
+            "emailAddress": "user@example.com"
+        }],
+        "lastModifyingUser": {
+            "kind": "drive#user",
+            "displayName": "Example User",
+            "me": True,
+            "permissionId": "01234567890123456789",
+            "emailAddress": "user@example.com"
+        },
+        "shared": False,
+        "ownedByMe": True,
+        "capabilities": {name: True for name in (
+            "canAddChildren", "canChangeCopyRequiresWriterPermission", "canChangeViewersCanCopyContent",
+            "canComment", "canCopy", "canDelete", "canDownload", "canEdit", "canListChildren",
+            "canModifyContent", "canMoveItemWithinDrive", "canReadRevisions", "canRemoveChildren",
+            "canRename", "canShare", "canTrash", "canUntrash"
+        )},
+        "viewersCanCopyContent": True,
+        "copyRequiresWriterPermission": False,
+        "writersCanShare": True,
+        "permissionIds": ["01234567890123456789"],
+        "quotaBytesUsed": "1024",
+        "isAppAuthorized": False,
+        "linkShareMetadata": {"securityUpdateEligible": False, "securityUpdateEnabled": True}
+    }
+
+
+def fake_task(list_id, index):
+    return {
+        "kind": "tasks#task",
+        "id": f"task-{index}",
+        "etag": f"\"LTE{index:06d}\"",
+        "title": f"Follow up {index}",
+        "updated": "2024-03-04T10:11:12.000Z",
+        "selfLink": f"https://www.googleapis.com/tasks/v1/lists/{list_id}/tasks/task-{index}",
+        "position": f"{index:020d}",
+        "notes": "Check the numbers with finance before Friday",
+        "status": "needsAction",
+        "due": "2024-03-08T00:00:00.000Z",
+        "links": [],
+        "webViewLink": f"https://tasks.google.com/task/task-{index}"
+    }
+
+
+def fake_list(index):
+    return {
+        "kind": "tasks#taskList",
+        "id": f"list-{index}",
+        "etag": f"\"MTE{index:06d}\"",
+        "title": f"List {index}",
+        "updated": "2024-03-04T10:11:12.000Z",
+        "selfLink": f"https://www.googleapis.com/tasks/v1/users/@me/lists/list-{index}"
+    }
+
+
+def split_fields(mask):
+    """Split a field mask on top-level commas"""
+    fields, depth, current = [], 0, ""
+    for char in mask:
+        if char == "," and depth == 0:
+            fields.append(current)
+            current = ""
+            continue
+        depth += (char == "(") - (char == ")")
+        current += char
+    return fields + [current] if current else fields
+
+
+def apply_fields(resource, mask):
+    """Apply a Google partial-response mask such as items(id,title) or messages/id"""
+    if isinstance(resource, list):
+        return [apply_fields(item, mask) for item in resource]
+    result = {}
+    for field in split_fields(mask):
+        if "(" in field:
+            name, sub = field[:-1].split("(", 1)
+        elif "/" in field:
+            name, sub = field.split("/", 1)
+        else:
+            name, sub = field, None
+        if name not in resource:
+            continue
+        value = resource[name] if sub is None else apply_fields(resource[name], sub)
+        if name in result and isinstance(value, dict):
+            result[name].update(value)
+        else:
+            result[name] = value
+    return result
+
+
+class FakeGoogleHandler(BaseHTTPRequestHandler):
+    """Serves the Drive and Tasks calls the services make, counting requests and bytes"""
+
+    task_count = 20
+    requests = 0
+    response_bytes = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload):
+        query = parse_qs(urlparse(self.path).query)
+        if "fields" in query:
+            payload = apply_fields(payload, query["fields"][0])
+        data = json.dumps(payload).encode()
+        FakeGoogleHandler.requests += 1
+        FakeGoogleHandler.response_bytes += len(data)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _drain(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == LISTS_PATH:
+            self._send_json({"kind": "tasks#taskLists", "items": [fake_list(i) for i in range(3)]})
+        elif match := TASKS_PATH.match(path):
+            tasks = [fake_task(match.group(1), i) for i in range(self.task_count)]
+            self._send_json({"kind": "tasks#tasks", "items": tasks})
+        elif match := FILE_PATH.match(path):
+            self._send_json(fake_file(match.group(1)))
+        else:
+            self.send_error(404)
+
+    def do_PATCH(self):
+        self._drain()
+        if match := FILE_PATH.match(urlparse(self.path).path):
+            self._send_json(fake_file(match.group(1)))
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        self._drain()
+        if match := TASKS_PATH.match(urlparse(self.path).path):
+            self._send_json(fake_task(match.group(1), 0))
+        else:
+            self.send_error(404)
+
+
+def build_fake_client(base_url, name, version):
+    """Build a discovery client whose root URL points at the fake server"""
+    document = json.loads(get_static_doc(name, version))
+    document["rootUrl"] = base_url + "/"
+    return build_from_document(document, http=httplib2.Http())
+
+
+def measure(fn):
+    """Run fn and return (round trips, response bytes)"""
+    FakeGoogleHandler.requests = FakeGoogleHandler.response_bytes = 0
+    result = fn()
+    if asyncio.iscoroutine(result):
+        asyncio.run(result)
+    return FakeGoogleHandler.requests, FakeGoogleHandler.response_bytes
+
+
+def legacy_update_document(drive, document_id):
+    """The previous update: full write response, then a get for the returned fields"""
+    drive.files().update(
+        fileId=document_id,
+        media_body=MediaIoBaseUpload(io.BytesIO(b"new content"), mimetype="text/plain")
+    ).execute()
+    drive.files().get(fileId=document_id).execute()
+
+
+def legacy_get_tasks(tasks):
+    """The previous listing: every task list, then every task field"""
+    lists = tasks.tasklists().list().execute()
+    tasks.tasks().list(tasklist=lists["items"][0]["id"], showCompleted=True).execute()
+
+
+def legacy_create_task(tasks):
+    lists = tasks.tasklists().list().execute()
+    tasks.tasks().insert(tasklist=lists["items"][0]["id"], body={"title": "Follow up"}).execute()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=20)
+    args = parser.parse_args()
+
+    FakeGoogleHandler.task_count = args.tasks
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGoogleHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    documents = DocumentService.__new__(DocumentService)
+    documents.platform = "google"
+    documents.user_id = "benchmark"
+    documents.client = build_fake_client(base_url, "drive", "v3")
+
+    tasks = TaskService.__new__(TaskService)
+    tasks.platform = "google"
+    tasks.user_id = "benchmark"
+    tasks.client = build_fake_client(base_url, "tasks", "v1")
+
+    operations = [
+        (
+            "update_document",
+            lambda: legacy_update_document(documents.client, "doc-1"),
+            lambda: documents._update_google_document("doc-1", "new content")
+        ),
+        (
+            "get_tasks",
+            lambda: legacy_get_tasks(tasks.client),
+            lambda: tasks._get_google_tasks(None, None)
+        ),
+        (
+            "create_task",
+            lambda: legacy_create_task(tasks.client),
+            lambda: tasks._create_google_task("Follow up", None, None, None)
+        ),
+    ]
+
+    print(f"{'operation':<16}{'round trips':>14}{'response bytes':>22}")
+    for name, legacy, current in operations:
+        old_trips, old_bytes = measure(legacy)
+        new_trips, new_bytes = measure(current)
+        print(
+            f"{name:<16}{old_trips:>6} -> {new_trips:<5}"
+            f"{old_bytes:>10} -> {new_bytes:<6} (-{1 - new_bytes / old_bytes:.0%})"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Compare serial and batched Gmail message fetches against a local fake Gmail server.
+
+Usage: python scripts/benchmark_gmail_fetch.py [--messages 50] [--latency-ms 40]
+"""
+import argparse
+import base64
+import email
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.email_service import EmailService  # noqa: E402
+
+MESSAGE_PATH = re.compile(r"^/gmail/v1/users/me/messages/([^/?]+)")
+
+
+def fake_message(message_id):
+    body = base64.urlsafe_b64encode(f"Body of message {message_id}".encode()).decode()
+    return {
+        "id": message_id,
+        "labelIds": ["INBOX", "UNREAD"],
+        "internalDate": "1700000000000",
+        "payload": {
+            "headers": [
+                {"name": "Subject", "value": f"Subject {message_id}"},
+                {"name": "From", "value": "sender@example.com"},
+            ],
+            "body": {"data": body},
+        },
+    }
+
+
+class FakeGmailHandler(BaseHTTPRequestHandler):
+    """Serves messages.list, messages.get and the batch endpoint with simulated latency"""
+
+    latency = 0.04
+    message_count = 50
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if self.path.startswith("/gmail/v1/users/me/messages?"):
+            ids = [{"id": f"m{i}"} for i in range(self.message_count)]
+            self._send_json({"messages": ids})
+        elif match := MESSAGE_PATH.match(self.path):
+            self._send_json(fake_message(match.group(1)))
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        request = email.message_from_bytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+
+        boundary = "batch_boundary"
+        parts = []
+        for part in request.get_payload():
+            request_line = part.get_payload().split("\n", 1)[0]
+            message_id = MESSAGE_PATH.match(request_line.split(" ")[1]).group(1)
+            content_id = part["Content-ID"][1:-1]
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                "HTTP/1.1 200 OK\r\n"
+                "Content-Type: application/json\r\n\r\n"
+                f"{json.dumps(fake_message(message_id))}\r\n"
+            )
+        data = ("".join(parts) + f"--{boundary}--\r\n").encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/mixed; boundary={boundary}")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def build_fake_client(base_url):
+    """Build a Gmail client whose root and batch URLs point at the fake server"""
+    document = json.loads(get_static_doc("gmail", "v1"))
+    document["rootUrl"] = base_url + "/"
+    document["batchPath"] = "batch/gmail/v1"
+    return build_from_document(document, http=httplib2.Http())
+
+
+def serial_fetch(client, message_ids):
+    """The original loop: one messages.get round trip per message"""
+    return [
+        client.users().messages().get(userId="me", id=message_id, format="full").execute()
+        for message_id in message_ids
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    FakeGmailHandler.latency = args.latency_ms / 1000
+    FakeGmailHandler.message_count = args.messages
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGmailHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    service = EmailService.__new__(EmailService)
+    service.platform = "google"
+    service.user_id = "benchmark"
+    service.client = build_fake_client(base_url)
+
+    listing = service.client.users().messages().list(userId="me", q="in:inbox").execute()
+    message_ids = [msg["id"] for msg in listing["messages"]]
+
+    def timed(fn):
+        best = float("inf")
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - start)
+        assert [m["id"] for m in result] == message_ids
+        return best
+
+    serial = timed(lambda: serial_fetch(service.client, message_ids))
+    batched = timed(lambda: service._batch_get_google_messages(message_ids, format="full"))
+
+    print(f"messages: {len(message_ids)}, simulated latency: {args.latency_ms:.0f} ms")
+    print(f"serial loop: {serial * 1000:8.1f} ms")
+    print(f"batched:     {batched * 1000:8.1f} ms  ({serial / batched:.1f}x faster)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the app the way it runs: from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
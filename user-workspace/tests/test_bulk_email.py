@@ -0,0 +1,160 @@
+import json
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from app import tasks
+from app.services.bulk_email import BulkEmailJobs, chunk_messages
+
+fakeredis = pytest.importorskip("fakeredis")
+
+TOKEN_INFO = {
+    "token": "access",
+    "refresh_token": "refresh-secret",
+    "token_uri": "https://oauth2.googleapis.com/token",
+    "client_id": "client-id",
+    "client_secret": "client-secret"
+}
+
+
+class FakeBucket:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def acquire(self):
+        pass
+
+
+class FakeEmailService:
+    """Records sends and fails them as scripted by subject"""
+
+    sent = []
+    failures = {}
+    credentials = []
+
+    def __init__(self, platform, credentials, user_id):
+        FakeEmailService.credentials.append(credentials)
+
+    async def send_email(self, to, subject, body, cc=None, bcc=None):
+        errors = FakeEmailService.failures.get(subject)
+        if errors:
+            raise errors.pop(0)
+        FakeEmailService.sent.append(subject)
+
+
+def http_error(status):
+    return HttpError(httplib2.Response({"status": status}), b"")
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    jobs = BulkEmailJobs(fakeredis.FakeRedis(decode_responses=True))
+    monkeypatch.setattr(tasks, "BulkEmailJobs", lambda: jobs)
+    monkeypatch.setattr(tasks, "RedisTokenBucket", FakeBucket)
+    monkeypatch.setattr(tasks, "EmailService", FakeEmailService)
+    monkeypatch.setattr(tasks.settings, "GOOGLE_CLIENT_ID", "settings-id")
+    monkeypatch.setattr(tasks.settings, "GOOGLE_CLIENT_SECRET", "settings-secret")
+    FakeEmailService.sent, FakeEmailService.failures, FakeEmailService.credentials = [], {}, []
+    return jobs
+
+
+def messages(count):
+    return [{"to": ["a@example.com"], "subject": f"m{index}", "body": ""} for index in range(count)]
+
+
+def test_chunk_messages():
+    assert [len(chunk) for chunk in chunk_messages(messages(5), 2)] == [2, 2, 1]
+
+
+def test_task_arguments_carry_no_secrets(jobs, monkeypatch):
+    queued = []
+    monkeypatch.setattr(tasks, "group", lambda signatures: queued.extend(signatures) or type(
+        "Group", (), {"apply_async": lambda self: None}
+    )())
+    monkeypatch.setattr(tasks.settings, "BULK_EMAIL_CHUNK_SIZE", 2)
+
+    handle = tasks.enqueue_bulk_email("user-1", "google", TOKEN_INFO, messages(3))
+
+    assert handle["chunks"] == 2
+    serialized = json.dumps([list(signature.args) for signature in queued])
+    for secret in ("access", "refresh-secret", "client-secret"):
+        assert secret not in serialized
+    token_ref = queued[0].args[3]
+    stored = jobs.load_token(token_ref)
+    assert stored["refresh_token"] == "refresh-secret"
+    assert "client_secret" not in stored
+
+
+def run_chunk(jobs, job_id, token_ref, chunk, offset=0, platform="google"):
+    tasks.send_bulk_email_chunk.apply(args=(job_id, "user-1", platform, token_ref, chunk, offset))
+
+
+def test_worker_uses_client_credentials_from_settings(jobs):
+    job_id = jobs.create("user-1", total=2, chunks=1)
+    token_ref = jobs.store_token(job_id, TOKEN_INFO)
+
+    run_chunk(jobs, job_id, token_ref, messages(2))
+
+    credentials = FakeEmailService.credentials[0]
+    assert credentials.client_id == "settings-id"
+    assert credentials.client_secret == "settings-secret"
+    assert credentials.refresh_token == "refresh-secret"
+    assert FakeEmailService.sent == ["m0", "m1"]
+    assert jobs.get(job_id)["status"] == "completed"
+    # The finished job's tokens are gone
+    assert jobs.load_token(token_ref) is None
+
+
+def test_redelivered_chunk_skips_sent_messages(jobs):
+    job_id = jobs.create("user-1", total=3, chunks=1)
+    token_ref = jobs.store_token(job_id, TOKEN_INFO)
+    jobs.record_sent(job_id, 0)
+
+    run_chunk(jobs, job_id, token_ref, messages(3))
+
+    assert FakeEmailService.sent == ["m1", "m2"]
+    job = jobs.get(job_id)
+    assert job["sent"] == 3
+    assert job["status"] == "completed"
+
+
+def test_throttled_sends_retry_and_others_fail_at_once(jobs):
+    job_id = jobs.create("user-1", total=2, chunks=1)
+    token_ref = jobs.store_token(job_id, TOKEN_INFO)
+    FakeEmailService.failures = {"m0": [http_error(429)], "m1": [http_error(400)]}
+
+    run_chunk(jobs, job_id, token_ref, messages(2))
+
+    job = jobs.get(job_id)
+    assert FakeEmailService.sent == ["m0"]
+    assert job["sent"] == 1
+    assert job["failed"] == 1
+    assert job["errors"][0].startswith("1: ")
+    assert job["status"] == "completed"
+
+
+def test_expired_tokens_fail_the_chunk(jobs):
+    job_id = jobs.create("user-1", total=2, chunks=1)
+
+    run_chunk(jobs, job_id, "missing", messages(2))
+
+    job = jobs.get(job_id)
+    assert FakeEmailService.sent == []
+    assert job["failed"] == 2
+    assert job["status"] == "completed"
+
+
+def test_refreshed_microsoft_tokens_are_saved(jobs, monkeypatch):
+    class FakeMicrosoftAuth:
+        async def refresh_token(self, refresh_token):
+            return {"access_token": "new-access", "refresh_token": "rotated"}
+
+    monkeypatch.setattr(tasks, "MicrosoftAuth", FakeMicrosoftAuth)
+    job_id = jobs.create("user-1", total=1, chunks=2)
+    token_ref = jobs.store_token(job_id, {"access_token": "old", "refresh_token": "original"})
+
+    run_chunk(jobs, job_id, token_ref, messages(1), platform="microsoft")
+
+    assert FakeEmailService.credentials[0]["access_token"] == "new-access"
+    assert jobs.load_token(token_ref)["refresh_token"] == "rotated"
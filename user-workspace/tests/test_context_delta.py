@@ -0,0 +1,107 @@
+import pytest
+
+from app.ai.history import HistoryManager
+from app.ai.mcp import Context, ModelContextProtocol
+
+
+@pytest.fixture
+def mcp():
+    return ModelContextProtocol()
+
+
+@pytest.fixture
+def context():
+    return Context(user_id="user-1", platform="google")
+
+
+def test_delta_from_start_has_everything(mcp, context):
+    mcp._commit_exchange(context, "hi", "hello")
+    context.preferences = {"tone": "brief"}
+    context.touch("preferences")
+
+    delta = context.delta_since(f"{context.epoch}:0")
+
+    assert delta["full"] is False
+    assert delta["changed"] == {"preferences": {"tone": "brief"}}
+    assert delta["history_appended"] == context.conversation_history
+    assert delta["history_length"] == 2
+
+
+def test_delta_only_carries_newer_changes(mcp, context):
+    context.preferences = {"tone": "brief"}
+    context.touch("preferences")
+    mcp._commit_exchange(context, "first", "one")
+    seen = context.version
+    mcp._commit_exchange(context, "second", "two")
+
+    delta = context.delta_since(seen)
+
+    assert delta["since"] == seen
+    assert delta["changed"] == {}
+    assert [message["content"] for message in delta["history_appended"]] == ["second", "two"]
+    assert delta["history_length"] == 4
+
+
+def test_delta_at_current_version_is_empty(mcp, context):
+    mcp._commit_exchange(context, "hi", "hello")
+
+    delta = context.delta_since(context.version)
+
+    assert delta["changed"] == {}
+    assert delta["history_appended"] == []
+
+
+def test_delta_after_compaction_reports_trimmed_length(mcp, context):
+    mcp.history_manager = HistoryManager(prompt_budget=60, summary_budget=20)
+    mcp._commit_exchange(context, "an old question " * 4, "an old answer " * 4)
+    seen = context.version
+    mcp._commit_exchange(context, "new", "reply")
+
+    delta = context.delta_since(seen)
+
+    assert [message["content"] for message in delta["history_appended"]] == ["new", "reply"]
+    assert delta["history_length"] == len(context.conversation_history)
+    assert "history_summary" in delta["changed"]
+
+
+@pytest.mark.parametrize("version", ["not-a-version", "abc:1", ":1", "{epoch}:99", "{epoch}:-1"])
+def test_unknown_versions_get_a_snapshot(mcp, context, version):
+    mcp._commit_exchange(context, "hi", "hello")
+
+    delta = context.delta_since(version.format(epoch=context.epoch))
+
+    assert delta["full"] is True
+    assert delta["snapshot"]["conversation_history"] == context.conversation_history
+
+
+@pytest.mark.asyncio
+async def test_recreated_context_sends_a_snapshot(mcp, monkeypatch):
+    async def answer(messages, use_cache):
+        return "ok"
+
+    monkeypatch.setattr(mcp, "_get_ai_response", answer)
+    first = await mcp.process_request("user-1", "one", "google")
+    await mcp.process_request("user-1", "two", "google")
+
+    # The context expires; the next one counts revisions from zero again
+    await mcp.clear_context("user-1")
+    await mcp.process_request("user-1", "three", "google")
+    result = await mcp.process_request("user-1", "four", "google", since_version=first["context_version"])
+
+    assert result["context_delta"]["full"] is True
+    assert [m["content"] for m in result["context_delta"]["snapshot"]["conversation_history"]] == [
+        "three", "ok", "four", "ok"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_process_request_returns_delta_for_current_context(mcp, monkeypatch):
+    async def answer(messages, use_cache):
+        return "ok"
+
+    monkeypatch.setattr(mcp, "_get_ai_response", answer)
+    first = await mcp.process_request("user-1", "one", "google")
+    result = await mcp.process_request("user-1", "two", "google", since_version=first["context_version"])
+
+    assert result["context_delta"]["full"] is False
+    assert [m["content"] for m in result["context_delta"]["history_appended"]] == ["two", "ok"]
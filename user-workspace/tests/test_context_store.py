@@ -0,0 +1,99 @@
+import pytest
+
+from app.ai.context_store import InMemoryContextStore, RedisContextStore, deserialize_context, serialize_context
+from app.ai.mcp import Context
+from app.utils import cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def make_context(user_id):
+    context = Context(user_id=user_id, platform="google")
+    context.conversation_history.append({"role": "user", "content": f"hello from {user_id}"})
+    context.preferences = {"tone": "brief"}
+    return context
+
+
+def test_serialization_round_trips():
+    context = make_context("user-1")
+
+    restored = deserialize_context(serialize_context(context))
+
+    assert restored == context
+    assert restored.epoch == context.epoch
+
+
+@pytest.mark.asyncio
+async def test_memory_store_returns_independent_copies():
+    store = InMemoryContextStore(maxsize=10, ttl=60)
+    await store.set(make_context("user-1"))
+
+    first = await store.get("user-1")
+    first.conversation_history.append({"role": "assistant", "content": "unsaved"})
+
+    assert len((await store.get("user-1")).conversation_history) == 1
+    assert await store.get("user-2") is None
+
+
+@pytest.mark.asyncio
+async def test_memory_store_evicts_least_recently_used():
+    store = InMemoryContextStore(maxsize=2, ttl=60)
+    await store.set(make_context("user-1"))
+    await store.set(make_context("user-2"))
+    await store.get("user-1")
+    await store.set(make_context("user-3"))
+
+    assert await store.get("user-2") is None
+    assert await store.get("user-1") is not None
+    assert store.get_metrics()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_store_expires_idle_contexts(clock):
+    store = InMemoryContextStore(maxsize=10, ttl=60)
+    await store.set(make_context("user-1"))
+
+    clock.now += 59
+    assert await store.get("user-1") is not None
+    clock.now += 2
+    assert await store.get("user-1") is None
+    assert store.get_metrics()["expirations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_store_delete():
+    store = InMemoryContextStore(maxsize=10, ttl=60)
+    await store.set(make_context("user-1"))
+    await store.delete("user-1")
+
+    assert await store.get("user-1") is None
+
+
+@pytest.mark.asyncio
+async def test_redis_store_round_trips_with_expiry():
+    fakeredis = pytest.importorskip("fakeredis")
+    store = RedisContextStore(url="redis://localhost:6379/0", ttl=60)
+    store.redis = fakeredis.aioredis.FakeRedis()
+    context = make_context("user-1")
+
+    await store.set(context)
+
+    assert await store.get("user-1") == context
+    assert 0 < await store.redis.ttl("mcp:context:user-1") <= 60
+    assert await store.get("user-2") is None
+    assert store.get_metrics()["hits"] == 1
+    await store.delete("user-1")
+    assert await store.get("user-1") is None
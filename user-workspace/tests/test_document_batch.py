@@ -0,0 +1,130 @@
+import base64
+import json
+
+import httpx
+import pytest
+
+from app.services import batching, document_service
+from app.services.batching import graph_batch
+from app.services.document_cache import DocumentCache
+from app.services.document_service import DocumentService
+from app.utils.http import provider_http
+
+
+def graph_item(item_id, download=True):
+    item = {
+        "id": item_id,
+        "name": f"{item_id}.txt",
+        "eTag": f'"{item_id}-e"',
+        "cTag": f'"{item_id}-c"',
+        "lastModifiedDateTime": "2026-10-16T00:00:00Z",
+        "createdDateTime": "2026-10-01T00:00:00Z",
+        "webUrl": f"https://example.com/{item_id}"
+    }
+    if download:
+        item["@microsoft.graph.downloadUrl"] = f"https://download.example.com/{item_id}"
+    return item
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    """A $batch endpoint; respond(sub_request, attempt) builds each sub-response"""
+    state = {"batches": [], "attempts": {}, "respond": None, "downloads": {}}
+
+    def handler(request):
+        if request.url.host == "download.example.com":
+            item_id = request.url.path.strip("/")
+            content = state["downloads"].get(item_id)
+            return httpx.Response(200, text=content) if content is not None else httpx.Response(500)
+        payload = json.loads(request.content)
+        state["batches"].append([item["id"] for item in payload["requests"]])
+        responses = []
+        for item in payload["requests"]:
+            attempt = state["attempts"][item["id"]] = state["attempts"].get(item["id"], 0) + 1
+            responses.append({"id": item["id"], **state["respond"](item, attempt)})
+        return httpx.Response(200, json={"responses": list(reversed(responses))})
+
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(provider_http, "client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(batching.asyncio, "sleep", sleep)
+    monkeypatch.setattr(document_service, "document_cache", DocumentCache())
+    state["sleeps"] = sleeps
+    return state
+
+
+@pytest.mark.asyncio
+async def test_batches_hold_at_most_twenty_and_keep_input_order(graph):
+    graph["respond"] = lambda item, attempt: {"status": 200, "body": {"url": item["url"]}}
+
+    responses = await graph_batch([{"method": "GET", "url": f"/items/{n}"} for n in range(45)], "token")
+
+    assert [len(batch) for batch in graph["batches"]] == [20, 20, 5]
+    assert [response["body"]["url"] for response in responses] == [f"/items/{n}" for n in range(45)]
+
+
+@pytest.mark.asyncio
+async def test_only_throttled_items_are_retried_after_retry_after(graph):
+    def respond(item, attempt):
+        if item["id"] == "1" and attempt == 1:
+            return {"status": 429, "headers": {"Retry-After": "3"}}
+        return {"status": 200, "body": {}}
+
+    graph["respond"] = respond
+
+    responses = await graph_batch([{"method": "GET", "url": f"/items/{n}"} for n in range(3)], "token")
+
+    assert [response["status"] for response in responses] == [200, 200, 200]
+    assert graph["batches"] == [["0", "1", "2"], ["1"]]
+    assert graph["sleeps"] == [3.0]
+
+
+@pytest.mark.asyncio
+async def test_bulk_read_reports_each_item(graph):
+    items = {"a": graph_item("a"), "folder": graph_item("folder", download=False), "broken": graph_item("broken")}
+
+    def respond(item, attempt):
+        item_id = item["url"].split("/")[-1].split("?")[0]
+        if item_id == "missing":
+            return {"status": 404, "body": {"error": {"message": "Item not found"}}}
+        return {"status": 200, "body": items[item_id]}
+
+    graph["respond"] = respond
+    graph["downloads"] = {"a": "hello"}
+    documents = DocumentService("microsoft", {"access_token": "token"}, user_id="user-1")
+
+    results = await documents.read_documents(["a", "folder", "missing", "broken"])
+
+    assert [result["status"] for result in results] == [200, 422, 404, 502]
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert results[0]["document"]["content"] == "hello"
+    assert results[1]["error"] == "Item has no downloadable content"
+    assert results[2]["error"] == "404: Item not found"
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_inlines_content_and_reports_failures(graph):
+    sent = []
+
+    def respond(item, attempt):
+        sent.append(item)
+        if "b" in item["url"]:
+            return {"status": 423, "body": {"error": {"message": "Locked"}}}
+        return {"status": 200, "body": graph_item("a")}
+
+    graph["respond"] = respond
+    documents = DocumentService("microsoft", {"access_token": "token"}, user_id="user-1")
+
+    results = await documents.update_documents([
+        {"document_id": "a", "content": "new text"},
+        {"document_id": "b", "content": "other"}
+    ])
+
+    assert base64.b64decode(sent[0]["body"]) == b"new text"
+    assert sent[0]["method"] == "PUT"
+    assert results[0]["status"] == 200
+    assert results[0]["document"]["id"] == "a"
+    assert results[1] == {"index": 1, "status": 423, "error": "423: Locked"}
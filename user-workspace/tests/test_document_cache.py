@@ -0,0 +1,152 @@
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services import document_service
+from app.services.document_cache import CachedDocument, DocumentCache
+from app.services.document_service import DocumentService
+from app.utils.http import provider_http
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = DocumentCache(max_entries=10, max_document_bytes=1000)
+    monkeypatch.setattr(document_service, "document_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def drive_item(monkeypatch):
+    """A Graph drive item that honours If-None-Match on metadata (eTag) and content (cTag)"""
+    item = SimpleNamespace(etag='"e1"', ctag='"c1"', content="first", requests=[])
+
+    def handler(request):
+        content = request.url.path.endswith("/content")
+        item.requests.append(("content" if content else "item", request.headers.get("If-None-Match")))
+        if content:
+            if request.headers.get("If-None-Match") == item.ctag:
+                return httpx.Response(304)
+            return httpx.Response(200, text=item.content)
+        if request.headers.get("If-None-Match") == item.etag:
+            return httpx.Response(304)
+        return httpx.Response(200, json={
+            "id": "doc-1",
+            "name": "Notes.txt",
+            "eTag": item.etag,
+            "cTag": item.ctag,
+            "lastModifiedDateTime": "2026-10-16T00:00:00Z",
+            "createdDateTime": "2026-10-01T00:00:00Z",
+            "webUrl": "https://example.com/doc-1"
+        })
+
+    monkeypatch.setattr(provider_http, "client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return item
+
+
+@pytest.fixture
+def microsoft():
+    return DocumentService("microsoft", {"access_token": "token"}, user_id="user-1")
+
+
+@pytest.mark.asyncio
+async def test_unchanged_document_is_served_from_cache(cache, drive_item, microsoft):
+    first = await microsoft.read_document("doc-1")
+    drive_item.requests.clear()
+
+    second = await microsoft.read_document("doc-1")
+
+    assert second == first
+    assert drive_item.requests == [("item", '"e1"')]
+    metrics = cache.get_metrics()
+    assert metrics["not_modified"] == 1
+    assert metrics["bytes_saved"] == len("first")
+
+
+@pytest.mark.asyncio
+async def test_metadata_change_reuses_unchanged_content(cache, drive_item, microsoft):
+    await microsoft.read_document("doc-1")
+    drive_item.etag = '"e2"'
+    drive_item.requests.clear()
+
+    document = await microsoft.read_document("doc-1")
+
+    assert document["content"] == "first"
+    assert drive_item.requests == [("item", '"e1"'), ("content", '"c1"')]
+    assert cache.get_metrics()["content_reused"] == 1
+
+
+@pytest.mark.asyncio
+async def test_content_change_downloads_new_content(cache, drive_item, microsoft):
+    await microsoft.read_document("doc-1")
+    drive_item.etag, drive_item.ctag, drive_item.content = '"e2"', '"c2"', "second"
+
+    document = await microsoft.read_document("doc-1")
+
+    assert document["content"] == "second"
+    assert cache.get(("user-1", "microsoft", "doc-1")).version == '"e2"'
+    assert cache.get_metrics()["modified"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_is_scoped_per_user(cache, drive_item, microsoft):
+    await microsoft.read_document("doc-1")
+    drive_item.requests.clear()
+
+    other = DocumentService("microsoft", {"access_token": "token"}, user_id="user-2")
+    await other.read_document("doc-1")
+
+    assert ("item", None) in drive_item.requests
+
+
+class FakeDrive:
+    def __init__(self):
+        self.version = "1"
+        self.exports = 0
+
+    def files(self):
+        return self
+
+    def get(self, fileId, fields):
+        return {
+            "id": fileId,
+            "name": "Notes",
+            "version": self.version,
+            "modifiedTime": "2026-10-16T00:00:00Z",
+            "createdTime": "2026-10-01T00:00:00Z",
+            "webViewLink": "https://docs.google.com/document/d/doc-1"
+        }
+
+    def export(self, fileId, mimeType):
+        self.exports += 1
+        return f"version {self.version}".encode()
+
+
+@pytest.mark.asyncio
+async def test_google_document_is_re_exported_only_when_its_version_changes(cache, monkeypatch):
+    async def execute(request):
+        return request
+
+    monkeypatch.setattr(document_service, "execute", execute)
+    google = DocumentService.__new__(DocumentService)
+    google.platform = "google"
+    google.user_id = "user-1"
+    google.client = FakeDrive()
+
+    await google.read_document("doc-1")
+    await google.read_document("doc-1")
+    assert google.client.exports == 1
+
+    google.client.version = "2"
+    document = await google.read_document("doc-1")
+    assert document["content"] == "version 2"
+    assert google.client.exports == 2
+
+
+def test_oversized_documents_are_not_cached(cache):
+    key = ("user-1", "google", "doc-1")
+    cache.set(key, CachedDocument({"content": "small"}, "1"))
+
+    cache.set(key, CachedDocument({"content": "x" * 2000}, "2"))
+
+    assert cache.get(key) is None
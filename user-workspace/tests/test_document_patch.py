@@ -0,0 +1,137 @@
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services import document_service
+from app.services.document_cache import CachedDocument
+from app.services.document_service import DocumentService
+from app.utils.http import provider_http
+from app.utils.text_diff import utf16_length
+
+OLD = "word " * 200 + "\n"
+NEW = OLD.replace("word", "text", 1)
+
+
+class FakeDrive:
+    def __init__(self, version="5", fail_after_patch=False):
+        self.version = version
+        self.fail_after_patch = fail_after_patch
+        self.patched = False
+
+    def files(self):
+        return self
+
+    def get(self, fileId, fields):
+        if self.patched and self.fail_after_patch:
+            raise RuntimeError("metadata unavailable")
+        return {
+            "id": fileId,
+            "name": "Notes",
+            "mimeType": document_service.GOOGLE_DOC_MIME_TYPE,
+            "version": "6" if self.patched else self.version,
+            "modifiedTime": "2026-10-16T00:00:00Z",
+            "createdTime": "2026-10-01T00:00:00Z",
+            "webViewLink": f"https://docs.google.com/document/d/{fileId}"
+        }
+
+
+@pytest.fixture
+def docs_api(monkeypatch):
+    """Docs API double; patch_response decides what batchUpdate does"""
+    api = SimpleNamespace(patch_response=lambda request: httpx.Response(200, json={}), posts=[])
+
+    def handler(request):
+        if request.method == "GET":
+            return httpx.Response(200, json={
+                "revisionId": "rev-1",
+                "body": {"content": [{"endIndex": utf16_length(OLD) + 1}]}
+            })
+        api.posts.append(request)
+        response = api.patch_response(request)
+        if response.status_code == 200:
+            drive.patched = True
+        return response
+
+    drive = FakeDrive()
+    api.drive = drive
+    monkeypatch.setattr(provider_http, "client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    async def execute(request):
+        return request
+
+    monkeypatch.setattr(document_service, "execute", execute)
+    return api
+
+
+@pytest.fixture
+def documents(docs_api):
+    service = DocumentService.__new__(DocumentService)
+    service.platform = "google"
+    service.user_id = "user-1"
+    service.credentials = SimpleNamespace(valid=True, token="token")
+    service.client = docs_api.drive
+    return service
+
+
+def cached(version="5"):
+    return CachedDocument({
+        "id": "doc-1",
+        "name": "Notes",
+        "content": "\ufeff" + OLD.replace("\n", "\r\n"),
+        "web_url": "https://docs.google.com/document/d/doc-1",
+        "last_modified": "2026-10-15T00:00:00Z"
+    }, version)
+
+
+@pytest.mark.asyncio
+async def test_patch_sends_only_the_changed_range(documents, docs_api):
+    result = await documents._patch_google_document("doc-1", NEW, cached())
+
+    assert result["transfer"]["mode"] == "patch"
+    assert result["transfer"]["bytes_sent"] < result["transfer"]["full_size"]
+    assert b'"requiredRevisionId": "rev-1"' in docs_api.posts[0].content
+    entry = document_service.document_cache.get(documents._cache_key("doc-1"))
+    assert entry.version == "6"
+    assert entry.document["content"] == "\ufeff" + NEW.replace("\n", "\r\n")
+
+
+@pytest.mark.asyncio
+async def test_changed_document_is_not_patched(documents, docs_api):
+    assert await documents._patch_google_document("doc-1", NEW, cached(version="4")) is None
+    assert docs_api.posts == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status", [400, 409])
+async def test_rejected_patch_falls_back(documents, docs_api, status):
+    docs_api.patch_response = lambda request: httpx.Response(status, json={"error": {}})
+
+    assert await documents._patch_google_document("doc-1", NEW, cached()) is None
+
+
+@pytest.mark.asyncio
+async def test_unsent_patch_falls_back(documents, docs_api):
+    def refuse(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    docs_api.patch_response = refuse
+
+    assert await documents._patch_google_document("doc-1", NEW, cached()) is None
+
+
+@pytest.mark.asyncio
+async def test_server_error_after_sending_is_raised(documents, docs_api):
+    docs_api.patch_response = lambda request: httpx.Response(503)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await documents._patch_google_document("doc-1", NEW, cached())
+
+
+@pytest.mark.asyncio
+async def test_failure_after_the_patch_landed_is_raised(documents, docs_api):
+    docs_api.drive.fail_after_patch = True
+
+    with pytest.raises(RuntimeError):
+        await documents._patch_google_document("doc-1", NEW, cached())
+    assert len(docs_api.posts) == 1
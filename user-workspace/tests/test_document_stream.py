@@ -0,0 +1,86 @@
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.services.document_service import DocumentService
+from app.utils.http import provider_http
+from app.utils.streams import single_byte_range
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", "bytes=0-99"),
+    ("bytes=100-", "bytes=100-"),
+    ("bytes=-500", "bytes=-500"),
+    (" bytes=5-10 ", "bytes=5-10"),
+    ("bytes=10-5", None),
+    ("bytes=0-1,5-6", None),
+    ("bytes=-", None),
+    ("items=0-1", None),
+    (None, None),
+])
+def test_single_byte_range(header, expected):
+    assert single_byte_range(header) == expected
+
+
+@pytest.fixture
+def graph_content(monkeypatch):
+    """Serve CONTENT like a Graph download URL, honouring single ranges"""
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("Range"))
+        header = request.headers.get("Range")
+        if header is None:
+            return httpx.Response(200, content=CONTENT, headers={"Content-Length": str(len(CONTENT))})
+        start, end = header[len("bytes="):].split("-")
+        start = int(start)
+        if start >= len(CONTENT):
+            return httpx.Response(416, text="range not satisfiable")
+        end = int(end) if end else len(CONTENT) - 1
+        return httpx.Response(
+            206,
+            content=CONTENT[start:end + 1],
+            headers={"Content-Range": f"bytes {start}-{end}/{len(CONTENT)}"}
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(provider_http, "client", client)
+    return seen
+
+
+@pytest.fixture
+def documents():
+    return DocumentService("microsoft", {"access_token": "token"}, user_id="user-1")
+
+
+async def read_all(body):
+    return b"".join([chunk async for chunk in body])
+
+
+@pytest.mark.asyncio
+async def test_stream_forwards_single_range(graph_content, documents):
+    metadata, body = await documents.stream_document("item-1", "bytes=10-19")
+
+    assert metadata["status_code"] == 206
+    assert metadata["headers"]["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+    assert metadata["headers"]["accept-ranges"] == "bytes"
+    assert await read_all(body) == CONTENT[10:20]
+    assert graph_content == ["bytes=10-19"]
+
+
+@pytest.mark.asyncio
+async def test_stream_ignores_multiple_ranges(graph_content, documents):
+    metadata, body = await documents.stream_document("item-1", "bytes=0-1,5-6")
+
+    assert metadata["status_code"] == 200
+    assert await read_all(body) == CONTENT
+    assert graph_content == [None]
+
+
+@pytest.mark.asyncio
+async def test_unsatisfiable_range_is_relayed(graph_content, documents):
+    with pytest.raises(HTTPException) as error:
+        await documents.stream_document("item-1", f"bytes={len(CONTENT)}-")
+    assert error.value.status_code == 416
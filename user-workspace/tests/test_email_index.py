@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from app.services import email_index as email_index_module
+from app.services.email_index import EmailSearchIndex, build_match_query, is_plain_query
+
+
+def email(message_id, subject="", sender="", body="", received="2026-10-01T00:00:00Z"):
+    return {"id": message_id, "subject": subject, "from": sender, "body": body, "received": received}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = EmailSearchIndex(str(tmp_path / "index.db"))
+    yield index
+    index.close()
+
+
+@pytest.mark.parametrize("query", [
+    "is:unread", "from:alice@example.com", "invoice after:2026/01/01", "has:attachment",
+    "label:work", "in:sent report", "report -draft", "alice OR bob", "(alice bob)",
+])
+def test_operator_queries_are_not_plain(query):
+    assert not is_plain_query(query)
+
+
+@pytest.mark.parametrize("query", ["quarterly report", '"exact phrase" budget', "follow-up", "ORacle"])
+def test_plain_queries(query):
+    assert is_plain_query(query)
+
+
+def test_match_query_quotes_every_term():
+    assert build_match_query('budget "next year" say "hi') == '"budget" "next year" "say" "hi"'
+
+
+def test_subject_matches_rank_first(index):
+    index.apply("m", [
+        email("body", body="the budget is attached"),
+        email("subject", subject="Budget review"),
+    ], [], clear=True)
+
+    assert [hit["id"] for hit in index.search("m", "budget", 10)] == ["subject", "body"]
+
+
+def test_search_is_scoped_to_the_mailbox(index):
+    index.apply("user-1", [email("a", subject="budget")], [], clear=True)
+    index.apply("user-2", [email("b", subject="budget")], [], clear=True)
+
+    assert [hit["id"] for hit in index.search("user-1", "budget", 10)] == ["a"]
+
+
+def test_html_is_stripped_from_bodies(index):
+    index.apply("m", [email("a", body="<p class='budget'>hello</p>")], [], clear=True)
+
+    assert index.search("m", "budget", 10) == []
+    assert [hit["id"] for hit in index.search("m", "hello", 10)] == ["a"]
+
+
+def test_removed_and_cleared_messages_leave_the_index(index):
+    index.apply("m", [email("a", subject="budget"), email("b", subject="budget")], [], clear=True)
+    index.apply("m", [], ["a"])
+    assert [hit["id"] for hit in index.search("m", "budget", 10)] == ["b"]
+
+    index.apply("m", [email("c", subject="other")], [], clear=True)
+    assert index.search("m", "budget", 10) == []
+
+
+def test_mailboxes_expire_with_their_cache_entry(index, monkeypatch):
+    index.apply("old", [email("a", subject="budget")], [], clear=True)
+    later = time.time() + 120
+    monkeypatch.setattr(email_index_module.time, "time", lambda: later)
+    index.apply("new", [email("b", subject="budget")], [], clear=True)
+
+    index.expire(ttl=60)
+
+    assert index.search("old", "budget", 10) == []
+    assert [hit["id"] for hit in index.search("new", "budget", 10)] == ["b"]
+    assert index.get_metrics()["expired"] == 1
+
+
+def test_rows_from_a_previous_process_are_dropped_on_open(tmp_path):
+    path = str(tmp_path / "index.db")
+    first = EmailSearchIndex(path)
+    first.apply("m", [email("a", subject="budget")], [], clear=True)
+    first.close()
+
+    second = EmailSearchIndex(path)
+    assert second.search("m", "budget", 10) == []
+    second.close()
@@ -0,0 +1,114 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import email_service
+from app.services.email_index import EmailSearchIndex
+from app.services.email_service import EmailService
+from app.services.mailbox_cache import MailboxCache
+
+
+def cached(message_id, subject):
+    return {
+        "id": message_id,
+        "subject": subject,
+        "from": "sender@example.com",
+        "received": "2026-10-01T00:00:00Z",
+        "preview": "",
+        "is_read": False,
+        "body": f"<p>{subject}</p>"
+    }
+
+
+class NotFound(Exception):
+    response_status_code = 404
+
+
+class FakeGraphMessages:
+    def __init__(self, messages):
+        self.messages = messages
+        self.fetched = []
+
+    def __getitem__(self, message_id):
+        async def get(params=None):
+            self.fetched.append(message_id)
+            if message_id not in self.messages:
+                raise NotFound(message_id)
+            return self.messages[message_id]
+        return SimpleNamespace(get=get)
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    monkeypatch.setattr(email_service, "mailbox_cache", MailboxCache())
+    index = EmailSearchIndex(str(tmp_path / "index.db"))
+    monkeypatch.setattr(email_service, "email_index", index)
+
+    service = EmailService.__new__(EmailService)
+    service.platform = "microsoft"
+    service.user_id = "user-1"
+    service.client = SimpleNamespace(me=SimpleNamespace(messages=FakeGraphMessages({
+        "trimmed": SimpleNamespace(
+            id="trimmed",
+            subject="budget (older)",
+            from_=SimpleNamespace(email_address=SimpleNamespace(address="sender@example.com")),
+            received_date_time="2026-09-01T00:00:00Z",
+            body_preview="",
+            is_read=True,
+            body=SimpleNamespace(content="<p>budget</p>")
+        )
+    })))
+    service.provider_reads = []
+
+    async def read_provider(folder, limit, query, include_body=True):
+        service.provider_reads.append(query)
+        return [{"id": "remote"}]
+
+    monkeypatch.setattr(service, "_read_microsoft_emails", read_provider)
+
+    # A freshly synced mailbox holding one message; the index also holds
+    # a message the cache has since trimmed and one deleted at the provider
+    state = email_service.mailbox_cache.get(("user-1", "microsoft", "inbox"))
+    state.put(cached("cached", "budget"))
+    state.complete = True
+    state.synced_at = time.monotonic()
+    index.apply(service._mailbox_key("inbox"), [
+        cached("cached", "budget"),
+        cached("trimmed", "budget"),
+        cached("deleted", "budget"),
+    ], [], clear=True)
+    return service
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("query", ["is:unread", "from:alice", "budget after:2026/01/01", "budget -draft"])
+async def test_operator_queries_use_provider_search(service, query):
+    emails = await service.read_emails("inbox", query=query)
+
+    assert emails == [{"id": "remote"}]
+    assert service.provider_reads == [query]
+
+
+@pytest.mark.asyncio
+async def test_index_hits_are_returned_as_full_messages(service):
+    emails = await service.read_emails("inbox", query="budget", include_body=True)
+
+    by_id = {email["id"]: email for email in emails}
+    assert set(by_id) == {"cached", "trimmed"}
+    # Cache entries come back as stored, not as HTML-stripped index rows
+    assert by_id["cached"]["body"] == "<p>budget</p>"
+    assert by_id["trimmed"]["is_read"] is True
+    assert sorted(service.client.me.messages.fetched) == ["deleted", "trimmed"]
+    assert service.provider_reads == []
+
+
+@pytest.mark.asyncio
+async def test_short_local_results_fall_back_to_the_provider(service):
+    state = email_service.mailbox_cache.get(("user-1", "microsoft", "inbox"))
+    state.complete = False
+
+    emails = await service.read_emails("inbox", query="budget", limit=10)
+
+    assert emails == [{"id": "remote"}]
+    assert service.provider_reads == ["budget"]
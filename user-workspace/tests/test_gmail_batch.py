@@ -0,0 +1,105 @@
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from app.services import email_service
+from app.services.email_service import EmailService
+
+
+def http_error(status):
+    return HttpError(httplib2.Response({"status": status}), b"")
+
+
+class FakeBatch:
+    def __init__(self, client, callback):
+        self.client = client
+        self.callback = callback
+        self.items = []
+
+    def add(self, request, request_id):
+        self.items.append(request_id)
+
+    def execute(self):
+        self.client.batches.append(list(self.items))
+        for message_id in self.items:
+            outcomes = self.client.outcomes.get(message_id, [])
+            error = outcomes.pop(0) if outcomes else None
+            if error is None:
+                self.callback(message_id, {"id": message_id}, None)
+            else:
+                self.callback(message_id, None, error)
+
+
+class FakeClient:
+    """Gmail client whose batch sub-requests fail as scripted per message id"""
+
+    def __init__(self, outcomes=None):
+        self.outcomes = outcomes or {}
+        self.batches = []
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def get(self, **params):
+        return params
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(email_service, "execute_sync", lambda request: request.execute())
+    monkeypatch.setattr(email_service.time, "sleep", lambda seconds: None)
+    service = EmailService.__new__(EmailService)
+    service.client = FakeClient()
+    return service
+
+
+def test_messages_come_back_in_input_order(service, monkeypatch):
+    monkeypatch.setattr(email_service.settings, "GMAIL_BATCH_SIZE", 2)
+
+    messages = service._batch_get_google_messages(["c", "a", "b"])
+
+    assert [message["id"] for message in messages] == ["c", "a", "b"]
+    assert service.client.batches == [["c", "a"], ["b"]]
+
+
+def test_deleted_messages_are_skipped(service):
+    service.client.outcomes = {"b": [http_error(404)]}
+
+    messages = service._batch_get_google_messages(["a", "b", "c"])
+
+    assert [message["id"] for message in messages] == ["a", "c"]
+    assert len(service.client.batches) == 1
+
+
+def test_throttled_requests_are_resent_alone(service):
+    service.client.outcomes = {"b": [http_error(429), http_error(503)]}
+
+    messages = service._batch_get_google_messages(["a", "b", "c"])
+
+    assert [message["id"] for message in messages] == ["a", "b", "c"]
+    assert service.client.batches == [["a", "b", "c"], ["b"], ["b"]]
+
+
+def test_permanent_errors_raise(service):
+    service.client.outcomes = {"b": [http_error(403)]}
+
+    with pytest.raises(HttpError) as error:
+        service._batch_get_google_messages(["a", "b"])
+
+    assert error.value.resp.status == 403
+
+
+def test_retries_give_up_after_the_limit(service, monkeypatch):
+    monkeypatch.setattr(email_service.settings, "GMAIL_BATCH_MAX_RETRIES", 2)
+    service.client.outcomes = {"a": [http_error(500)] * 5}
+
+    with pytest.raises(HttpError):
+        service._batch_get_google_messages(["a"])
+
+    assert len(service.client.batches) == 3
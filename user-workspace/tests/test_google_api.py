@@ -0,0 +1,56 @@
+import threading
+
+import httplib2
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+
+from app.utils import google_api
+
+
+class FakeRequest:
+    def __init__(self, http):
+        self.http = http
+        self.used = []
+
+    def execute(self, http):
+        self.used.append(http)
+        return http
+
+
+def authorized(token, timeout=30):
+    return AuthorizedHttp(Credentials(token), http=httplib2.Http(timeout=timeout))
+
+
+def test_calls_on_one_thread_reuse_its_transport():
+    first = google_api.execute_sync(FakeRequest(authorized("token-a")))
+    second = google_api.execute_sync(FakeRequest(authorized("token-b")))
+
+    assert first.http is second.http
+    assert first.credentials.token == "token-a"
+    assert second.credentials.token == "token-b"
+
+
+def test_threads_never_share_a_transport():
+    request = FakeRequest(authorized("token-a"))
+    used = []
+
+    def worker():
+        used.append(google_api.execute_sync(request).http)
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(http) for http in used}) == 3
+    assert request.http.http not in used
+
+
+def test_transport_keeps_the_client_timeout():
+    short = google_api.execute_sync(FakeRequest(authorized("token", timeout=5)))
+    long = google_api.execute_sync(FakeRequest(authorized("token", timeout=60)))
+
+    assert short.http.timeout == 5
+    assert long.http.timeout == 60
+    assert google_api.execute_sync(FakeRequest(httplib2.Http(timeout=5))) is short.http
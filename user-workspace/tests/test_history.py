@@ -0,0 +1,75 @@
+from app.ai.history import HistoryManager, estimate_message_tokens, estimate_tokens
+
+
+def exchange(index, size=40):
+    return [
+        {"role": "user", "content": f"Question {index}. " + "q" * size},
+        {"role": "assistant", "content": f"Answer {index}. " + "a" * size},
+    ]
+
+
+def conversation(turns, size=40):
+    return [message for index in range(turns) for message in exchange(index, size)]
+
+
+def test_history_within_budget_is_untouched():
+    manager = HistoryManager(prompt_budget=1000, summary_budget=100)
+    history = conversation(3)
+
+    result = manager.compact(history)
+
+    assert result.history == history
+    assert result.summary == ""
+    assert result.evicted_messages == 0
+    assert result.tokens_saved == 0
+
+
+def test_oldest_turns_are_folded_into_the_summary():
+    manager = HistoryManager(prompt_budget=140, summary_budget=40)
+    history = conversation(6)
+
+    result = manager.compact(history)
+
+    assert result.history == history[-len(result.history):]
+    assert result.history[0]["role"] == "user"
+    assert estimate_message_tokens(result.history) <= 140 - 40
+    assert result.evicted_messages == len(history) - len(result.history)
+    assert "user: Question 0." in result.summary
+    assert estimate_tokens(result.summary) <= 40
+    assert result.tokens_saved > 0
+    assert manager.get_metrics()["evicted_messages"] == result.evicted_messages
+
+
+def test_summary_keeps_newest_lines_within_budget():
+    manager = HistoryManager(prompt_budget=60, summary_budget=20)
+
+    result = manager.compact(conversation(8), summary="user: ancient question")
+
+    assert "ancient question" not in result.summary
+    assert estimate_tokens(result.summary) <= 20
+
+
+def test_oversized_latest_turn_is_clipped_not_dropped():
+    manager = HistoryManager(prompt_budget=100, summary_budget=20)
+    history = conversation(2) + [{"role": "user", "content": "Latest. " + "x" * 2000}]
+
+    result = manager.compact(history)
+
+    assert len(result.history) == 1
+    assert result.history[0]["role"] == "user"
+    assert result.history[0]["content"].startswith("Latest.")
+    assert estimate_message_tokens(result.history) <= 100 - 20
+
+
+def test_latest_question_and_reply_are_kept_together():
+    manager = HistoryManager(prompt_budget=100, summary_budget=20)
+    history = conversation(2) + [
+        {"role": "user", "content": "Latest question. " + "x" * 400},
+        {"role": "assistant", "content": "Latest answer. " + "y" * 400},
+    ]
+
+    result = manager.compact(history)
+
+    assert [message["role"] for message in result.history] == ["user", "assistant"]
+    assert result.history[0]["content"].startswith("Latest question.")
+    assert result.history[1]["content"].startswith("Latest answer.")
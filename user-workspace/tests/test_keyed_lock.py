@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from app.utils.keyed_lock import KeyedLock
+
+
+@pytest.mark.asyncio
+async def test_same_key_runs_one_at_a_time_in_arrival_order():
+    locks = KeyedLock()
+    order = []
+    active = 0
+
+    async def worker(name):
+        nonlocal active
+        async with locks.acquire("user-1"):
+            active += 1
+            assert active == 1
+            order.append(name)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*[worker(index) for index in range(5)])
+
+    assert order == list(range(5))
+    metrics = locks.get_metrics()
+    assert metrics["acquisitions"] == 5
+    assert metrics["contended"] == 4
+    assert metrics["max_queue_depth"] == 4
+
+
+@pytest.mark.asyncio
+async def test_different_keys_do_not_block_each_other():
+    locks = KeyedLock()
+    inside = asyncio.Event()
+
+    async def holder():
+        async with locks.acquire("user-1"):
+            await inside.wait()
+
+    task = asyncio.ensure_future(holder())
+    await asyncio.sleep(0)
+    async with locks.acquire("user-2"):
+        inside.set()
+    await task
+
+    assert locks.get_metrics()["contended"] == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_depth_and_cleanup():
+    locks = KeyedLock()
+    release = asyncio.Event()
+
+    async def holder():
+        async with locks.acquire("user-1"):
+            await release.wait()
+
+    async def waiter():
+        async with locks.acquire("user-1"):
+            pass
+
+    tasks = [asyncio.ensure_future(coro) for coro in (holder(), waiter(), waiter())]
+    await asyncio.sleep(0)
+    assert locks.queue_depth("user-1") == 2
+    assert locks.get_metrics()["queued"] == 2
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+    assert locks.queue_depth("user-1") == 0
+    assert locks.get_metrics()["active_keys"] == 0
+
+
+@pytest.mark.asyncio
+async def test_lock_is_released_when_the_body_raises():
+    locks = KeyedLock()
+
+    with pytest.raises(RuntimeError):
+        async with locks.acquire("user-1"):
+            raise RuntimeError("boom")
+
+    async with locks.acquire("user-1"):
+        pass
+    assert locks.get_metrics()["active_keys"] == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_for_one_user_keep_every_exchange(monkeypatch):
+    from app.ai.mcp import ModelContextProtocol
+
+    mcp = ModelContextProtocol()
+
+    async def answer(messages, use_cache):
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    monkeypatch.setattr(mcp, "_get_ai_response", answer)
+    await asyncio.gather(*[
+        mcp.process_request("user-1", f"question {index}", "google", use_cache=False)
+        for index in range(5)
+    ])
+
+    context = await mcp.get_context("user-1")
+    questions = [m["content"] for m in context.conversation_history if m["role"] == "user"]
+    assert questions == [f"question {index}" for index in range(5)]
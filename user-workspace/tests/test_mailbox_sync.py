@@ -0,0 +1,147 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import email_service
+from app.services.email_index import EmailSearchIndex
+from app.services.email_service import EmailService
+from app.services.mailbox_cache import MailboxCache
+
+
+def graph_message(message_id, received):
+    return SimpleNamespace(
+        id=message_id,
+        subject=f"subject {message_id}",
+        from_=SimpleNamespace(email_address=SimpleNamespace(address="sender@example.com")),
+        received_date_time=received,
+        body_preview="",
+        is_read=False,
+        body=SimpleNamespace(content="body"),
+        additional_data={}
+    )
+
+
+class FakeDelta:
+    def __init__(self, messages):
+        self.messages = messages
+        self.params = []
+
+    async def get(self, params=None):
+        self.params.append(params)
+        return SimpleNamespace(value=self.messages, odata_next_link=None, odata_delta_link="delta-1")
+
+
+class FakeFolderMessages:
+    """One Graph mail folder: a delta round over the window plus plain listings of older mail"""
+
+    def __init__(self, synced, older):
+        self.delta = FakeDelta(synced)
+        self.older = older
+        self.get_params = []
+
+    async def get(self, params=None):
+        self.get_params.append(params)
+        return SimpleNamespace(value=self.older[:params["$top"]])
+
+
+@pytest.fixture
+def isolated(monkeypatch, tmp_path):
+    monkeypatch.setattr(email_service, "mailbox_cache", MailboxCache())
+    monkeypatch.setattr(email_service, "email_index", EmailSearchIndex(str(tmp_path / "index.db")))
+
+
+@pytest.fixture
+def folder():
+    return FakeFolderMessages(
+        synced=[graph_message("new-1", "2026-10-15T10:00:00Z"), graph_message("new-2", "2026-10-14T10:00:00Z")],
+        older=[graph_message("old-1", "2026-08-01T10:00:00Z"), graph_message("old-2", "2026-07-01T10:00:00Z")]
+    )
+
+
+@pytest.fixture
+def microsoft(isolated, folder):
+    service = EmailService.__new__(EmailService)
+    service.platform = "microsoft"
+    service.user_id = "user-1"
+    service.client = SimpleNamespace(me=SimpleNamespace(mail_folders={"inbox": SimpleNamespace(messages=folder)}))
+    return service
+
+
+@pytest.mark.asyncio
+async def test_windowed_sync_is_not_complete(microsoft, folder):
+    await microsoft.sync_mailbox("inbox")
+
+    state = email_service.mailbox_cache.get(("user-1", "microsoft", "inbox"))
+    assert state.complete is False
+    assert state.window_start is not None
+    assert folder.delta.params[0]["$filter"] == f"receivedDateTime ge {state.window_start}"
+    assert set(state.messages) == {"new-1", "new-2"}
+
+
+@pytest.mark.asyncio
+async def test_reads_within_the_window_stay_local(microsoft, folder):
+    emails = await microsoft.read_emails("inbox", limit=2)
+
+    assert [email["id"] for email in emails] == ["new-1", "new-2"]
+    assert folder.get_params == []
+
+
+@pytest.mark.asyncio
+async def test_reads_past_the_window_fetch_only_older_mail(microsoft, folder):
+    emails = await microsoft.read_emails("inbox", limit=3)
+
+    assert [email["id"] for email in emails] == ["new-1", "new-2", "old-1"]
+    state = email_service.mailbox_cache.get(("user-1", "microsoft", "inbox"))
+    assert folder.get_params == [{
+        "$top": 1,
+        "$select": email_service.MICROSOFT_MESSAGE_FIELDS,
+        "$filter": f"receivedDateTime lt {state.window_start}",
+        "$orderby": "receivedDateTime desc"
+    }]
+
+
+@pytest.mark.asyncio
+async def test_trimmed_cache_drops_the_window(microsoft, folder, monkeypatch):
+    monkeypatch.setattr(email_service.settings, "MAIL_CACHE_MAX_MESSAGES", 1)
+
+    await microsoft.read_emails("inbox", limit=2)
+
+    state = email_service.mailbox_cache.get(("user-1", "microsoft", "inbox"))
+    assert state.window_start is None
+    # The cache no longer covers the window, so the whole listing comes from Graph
+    assert "$filter" not in folder.get_params[0]
+
+
+class FakeLabels:
+    def users(self):
+        return self
+
+    def labels(self):
+        return self
+
+    def list(self, **params):
+        return {"labels": [
+            {"id": "INBOX", "name": "INBOX"},
+            {"id": "DRAFT", "name": "DRAFT"},
+            {"id": "SENT", "name": "SENT"},
+            {"id": "Label_12", "name": "Receipts"}
+        ]}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("folder_name, label", [
+    ("inbox", "INBOX"),
+    ("drafts", "DRAFT"),
+    ("sentitems", "SENT"),
+    ("receipts", "Label_12"),
+    ("archive", None),
+])
+async def test_gmail_folders_resolve_to_labels(monkeypatch, folder_name, label):
+    async def execute(request):
+        return request
+
+    monkeypatch.setattr(email_service, "execute", execute)
+    service = EmailService.__new__(EmailService)
+    service.client = FakeLabels()
+
+    assert await service._resolve_google_label(folder_name) == label
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.ai.mcp import ModelContextProtocol
+from app.ai.response_cache import ResponseCache, normalize_message
+
+
+def test_normalization_ignores_whitespace_and_user_case():
+    assert normalize_message({"role": "user", "content": "  Hello\n  WORLD "}) == {
+        "role": "user", "content": "hello world"
+    }
+    # Assistant and system text keep their case
+    assert normalize_message({"role": "system", "content": "Be  Brief"})["content"] == "Be Brief"
+
+
+def test_keys_match_for_equivalent_prompts_only():
+    cache = ResponseCache(maxsize=10, ttl=60)
+    base = [{"role": "system", "content": "sys"}, {"role": "user", "content": "Summarize my inbox"}]
+    same = [{"role": "system", "content": "sys"}, {"role": "user", "content": "summarize  my inbox "}]
+    other = [{"role": "system", "content": "sys"}, {"role": "user", "content": "Summarize my tasks"}]
+
+    assert cache.make_key(base, temperature=0.7) == cache.make_key(same, temperature=0.7)
+    assert cache.make_key(base, temperature=0.7) != cache.make_key(other, temperature=0.7)
+    assert cache.make_key(base, temperature=0.7) != cache.make_key(base, temperature=0.2)
+
+
+def test_hits_credit_saved_latency_and_tokens():
+    cache = ResponseCache(maxsize=10, ttl=60)
+    cache.set("key", "answer", latency=1.5, total_tokens=120)
+
+    assert cache.get("key") == "answer"
+    assert cache.get("missing") is None
+    metrics = cache.get_metrics()
+    assert metrics["saved_latency_seconds"] == 1.5
+    assert metrics["saved_tokens"] == 120
+    assert metrics["hits"] == 1 and metrics["misses"] == 1
+
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def chat_completion(self, messages, **params):
+        self.calls += 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer {self.calls}"))],
+            usage=SimpleNamespace(total_tokens=10)
+        )
+
+
+@pytest.mark.asyncio
+async def test_repeated_prompts_skip_the_model():
+    mcp = ModelContextProtocol()
+    mcp.llm_client = CountingClient()
+    messages = [{"role": "user", "content": "What is on my calendar?"}]
+
+    first = await mcp._get_ai_response(messages)
+    second = await mcp._get_ai_response([{"role": "user", "content": "what is on my  calendar?"}])
+    uncached = await mcp._get_ai_response(messages, use_cache=False)
+
+    assert first == second == "answer 1"
+    assert uncached == "answer 2"
+    assert mcp.llm_client.calls == 2
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+from app.ai.embeddings import HashingEmbedder
+from app.ai.retrieval import Chunk, DocumentRetriever, VectorIndex, chunk_text
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=256)
+        self.embedded = []
+
+    async def embed(self, texts):
+        self.embedded.extend(texts)
+        return await super().embed(texts)
+
+
+def paragraph(topic, words=30):
+    return " ".join(f"{topic}{index % 7}" for index in range(words))
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("one paragraph\n\ntwo paragraph", chunk_tokens=50, overlap_tokens=0) == [
+        "one paragraph\n\ntwo paragraph"
+    ]
+
+
+def test_chunks_fit_the_budget_and_overlap():
+    text = "\n\n".join(paragraph(f"topic{n}", 20) for n in range(10))
+
+    chunks = chunk_text(text, chunk_tokens=50, overlap_tokens=10)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 50 * 4 + 10 * 4 for chunk in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        first_word = current.split()[0]
+        assert first_word in previous
+
+
+def test_long_paragraphs_are_cut_between_words():
+    text = paragraph("word", 200)
+
+    chunks = chunk_text(text, chunk_tokens=25, overlap_tokens=0)
+
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_vector_index_returns_top_k_best_first():
+    index = VectorIndex()
+    chunks = [Chunk("doc", "doc", position, f"chunk {position}", str(position)) for position in range(4)]
+    index.add(chunks, np.eye(4, dtype=np.float32))
+
+    queries = np.array([[0.1, 0.0, 0.9, 0.4], [1.0, 0.0, 0.0, 0.0]], dtype=np.float32)
+    results = index.search(queries, k=2)
+
+    assert [chunk.position for chunk, _ in results[0]] == [2, 3]
+    assert [chunk.position for chunk, _ in results[1]][0] == 0
+    assert len(index.search(queries, k=10)[0]) == 4
+
+
+def test_vector_index_remove_keeps_other_documents():
+    index = VectorIndex()
+    index.add([Chunk("a", "a", 0, "x", "1"), Chunk("b", "b", 0, "y", "2")], np.eye(2, dtype=np.float32))
+
+    index.remove("a")
+
+    assert [chunk.document_id for chunk in index.chunks] == ["b"]
+    assert index.vectors.shape == (1, 2)
+    assert index.search(np.zeros((0, 2), dtype=np.float32), k=1) == []
+
+
+def document(document_id, content, modified="1"):
+    return {"id": document_id, "name": document_id, "content": content, "last_modified": modified}
+
+
+@pytest.mark.asyncio
+async def test_relevant_document_ranks_first():
+    retriever = DocumentRetriever(embedder=HashingEmbedder(dim=512))
+    await retriever.index_documents("user-1", [
+        document("budget", "The quarterly budget covers marketing spend and hiring plans."),
+        document("garden", "Tomatoes need sun, water and well drained soil in the garden."),
+    ])
+
+    results = await retriever.search("user-1", ["quarterly budget hiring", "tomatoes soil"], min_score=0.0)
+
+    assert results[0][0]["document_id"] == "budget"
+    assert results[1][0]["document_id"] == "garden"
+
+
+@pytest.mark.asyncio
+async def test_only_changed_chunks_are_embedded_again():
+    embedder = CountingEmbedder()
+    retriever = DocumentRetriever(embedder=embedder)
+    paragraphs = [paragraph(f"topic{n}", 200) for n in range(3)]
+    await retriever.index_document("user-1", document("doc", "\n\n".join(paragraphs)))
+    first = len(embedder.embedded)
+
+    assert await retriever.index_document("user-1", document("doc", "\n\n".join(paragraphs))) is False
+    assert len(embedder.embedded) == first
+
+    paragraphs[1] = paragraph("changed", 200)
+    assert await retriever.index_document("user-1", document("doc", "\n\n".join(paragraphs), "2"))
+    metrics = retriever.get_metrics()
+    assert 0 < metrics["chunks_embedded"] - first < first
+    assert metrics["chunks_reused"] > 0
+
+
+@pytest.mark.asyncio
+async def test_users_and_evictions_are_separate():
+    retriever = DocumentRetriever(embedder=HashingEmbedder(dim=64), max_chunks_per_user=2)
+    await retriever.index_document("user-1", document("old", "first document"))
+    await retriever.index_document("user-1", document("mid", "second document"))
+    await retriever.index_document("user-1", document("new", "third document"))
+
+    results = await retriever.search("user-1", ["document"], min_score=-1.0)
+
+    assert {match["document_id"] for match in results[0]} == {"mid", "new"}
+    assert await retriever.search("user-2", ["document"]) == [[]]
+    assert retriever.get_metrics()["documents_evicted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_context_stays_within_the_token_budget():
+    retriever = DocumentRetriever(embedder=HashingEmbedder(dim=512))
+    await retriever.index_document("user-1", document("budget", "\n\n".join(
+        paragraph("budget", 300) for _ in range(4)
+    )))
+
+    # Chunks run to about 200 tokens, so only one fits in 300
+    context = await retriever.build_context("user-1", "budget0 budget1", token_budget=300)
+
+    assert context.startswith("Relevant excerpts from the user's documents:")
+    assert context.count("[budget]") == 1
+    assert await retriever.build_context("user-2", "budget") == ""
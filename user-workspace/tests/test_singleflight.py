@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from app.services.document_service import DocumentService
+from app.services.email_service import EmailService
+from app.services.task_service import TaskService
+from app.utils.singleflight import SingleFlight, make_key, singleflight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution():
+    group = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    key = make_key("user-1", "op", "arg")
+    results = await asyncio.gather(*[group.do(key, fetch) for _ in range(5)])
+
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert group.get_metrics()["operations"]["op"] == {"calls": 5, "coalesced": 4}
+    assert group.get_metrics()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_calls_are_not_shared_across_users_or_arguments():
+    group = SingleFlight()
+    seen = []
+
+    async def fetch(label):
+        seen.append(label)
+        await asyncio.sleep(0.01)
+        return label
+
+    results = await asyncio.gather(
+        group.do(make_key("user-1", "op", "a"), lambda: fetch("user-1/a")),
+        group.do(make_key("user-2", "op", "a"), lambda: fetch("user-2/a")),
+        group.do(make_key("user-1", "op", "b"), lambda: fetch("user-1/b")),
+    )
+
+    assert results == ["user-1/a", "user-2/a", "user-1/b"]
+    assert sorted(seen) == sorted(results)
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter_and_are_not_cached():
+    group = SingleFlight()
+    attempts = 0
+
+    async def failing():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    key = make_key("user-1", "op")
+    results = await asyncio.gather(group.do(key, failing), group.do(key, failing), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    with pytest.raises(RuntimeError):
+        await group.do(key, failing)
+    assert attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_one_caller_cancelling_does_not_cancel_the_shared_call():
+    group = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    key = make_key("user-1", "op")
+    first = asyncio.ensure_future(group.do(key, fetch))
+    second = asyncio.ensure_future(group.do(key, fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "done"
+
+
+@pytest.mark.parametrize("service", [DocumentService, EmailService, TaskService])
+def test_services_require_a_user_id(service):
+    with pytest.raises((TypeError, ValueError)):
+        service("microsoft", {"access_token": "token"})
+    with pytest.raises(ValueError):
+        service("microsoft", {"access_token": "token"}, user_id="")
+
+
+@pytest.mark.asyncio
+async def test_document_reads_coalesce_per_user(monkeypatch):
+    calls = []
+
+    async def read(self, document_id):
+        calls.append((self.user_id, document_id))
+        await asyncio.sleep(0.01)
+        return {"id": document_id, "owner": self.user_id}
+
+    monkeypatch.setattr(DocumentService, "_read_document", read)
+    alice = DocumentService("microsoft", {"access_token": "a"}, user_id="alice")
+    alice_again = DocumentService("microsoft", {"access_token": "a"}, user_id="alice")
+    bob = DocumentService("microsoft", {"access_token": "b"}, user_id="bob")
+
+    results = await asyncio.gather(
+        alice.read_document("doc-1"), alice_again.read_document("doc-1"), bob.read_document("doc-1")
+    )
+
+    assert sorted(calls) == [("alice", "doc-1"), ("bob", "doc-1")]
+    assert [result["owner"] for result in results] == ["alice", "alice", "bob"]
+    assert singleflight.get_metrics()["in_flight"] == 0
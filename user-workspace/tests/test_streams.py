@@ -0,0 +1,81 @@
+import base64
+import json
+
+import pytest
+
+from app.utils.streams import (
+    base64_lines_length,
+    iter_base64_lines,
+    iter_json_base64_field,
+    rechunk,
+)
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def split(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def payload(size):
+    return bytes(index % 256 for index in range(size))
+
+
+@pytest.mark.asyncio
+async def test_rechunk_regroups_into_fixed_sizes():
+    chunks = await collect(rechunk(stream(b"ab", b"cdefg", b"", b"hij"), 4))
+    assert chunks == [b"abcd", b"efgh", b"ij"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [0, 1, 56, 57, 58, 114, 1000])
+async def test_base64_lines_match_mime_encoding(size):
+    data = payload(size)
+    encoded = b"".join(await collect(iter_base64_lines(split(data, 10))))
+
+    assert encoded == base64.encodebytes(data).rstrip(b"\n")
+    assert len(encoded) == base64_lines_length(size)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 4096])
+async def test_json_base64_field_decodes_across_chunk_boundaries(chunk_size):
+    data = payload(3000)
+    body = json.dumps({
+        "size": len(data),
+        "data": base64.urlsafe_b64encode(data).decode(),
+        "attachmentId": "abc"
+    }).encode()
+
+    decoded = b"".join(await collect(iter_json_base64_field(split(body, chunk_size), "data")))
+
+    assert decoded == data
+
+
+@pytest.mark.asyncio
+async def test_json_base64_field_handles_unpadded_values():
+    data = b"hello!!"
+    encoded = base64.urlsafe_b64encode(data).rstrip(b"=")
+    body = b'{"data": "' + encoded + b'"}'
+
+    assert b"".join(await collect(iter_json_base64_field(stream(body), "data"))) == data
+
+
+@pytest.mark.asyncio
+async def test_json_base64_field_missing_field():
+    with pytest.raises(ValueError, match="not found"):
+        await collect(iter_json_base64_field(stream(b'{"size": 3}'), "data"))
+
+
+@pytest.mark.asyncio
+async def test_json_base64_field_truncated_value():
+    with pytest.raises(ValueError, match="Truncated"):
+        await collect(iter_json_base64_field(stream(b'{"data": "aGVsbG8'), "data"))
@@ -0,0 +1,64 @@
+import pytest
+
+from app.ai.mcp import Context, ModelContextProtocol
+
+
+@pytest.fixture
+def mcp(monkeypatch):
+    mcp = ModelContextProtocol()
+    mcp.renders = 0
+    render = mcp._render_system_prompt
+
+    def counting_render(context):
+        mcp.renders += 1
+        return render(context)
+
+    monkeypatch.setattr(mcp, "_render_system_prompt", counting_render)
+    return mcp
+
+
+def test_prompt_is_rendered_once_per_version(mcp):
+    context = Context(user_id="user-1", platform="google", preferences={"tone": "brief"})
+
+    first = mcp._prepare_messages(context, "one", None)[0]["content"]
+    second = mcp._prepare_messages(context, "two", {"tone": "brief"})[0]["content"]
+
+    assert first == second
+    assert '"tone": "brief"' in first
+    assert mcp.renders == 1
+
+
+def test_preference_change_renders_a_new_prompt(mcp):
+    context = Context(user_id="user-1", platform="google")
+    mcp._prepare_messages(context, "one", None)
+
+    prompt = mcp._prepare_messages(context, "two", {"tone": "formal"})[0]["content"]
+
+    assert '"tone": "formal"' in prompt
+    assert context.prompt_version == 1
+    assert mcp.renders == 2
+
+
+@pytest.mark.asyncio
+async def test_task_update_renders_a_new_prompt(mcp):
+    context = await mcp.create_context("user-1", "google")
+    mcp._prepare_messages(context, "one", None)
+
+    await mcp.update_task("user-1", {"name": "quarterly report"})
+    context = await mcp.get_context("user-1")
+    prompt = mcp._prepare_messages(context, "two", None)[0]["content"]
+
+    assert "quarterly report" in prompt
+    assert mcp.renders == 2
+
+
+def test_recreated_context_does_not_reuse_a_stale_prompt(mcp):
+    old = Context(user_id="user-1", platform="google", preferences={"tone": "brief"})
+    mcp._prepare_messages(old, "one", None)
+
+    # Same user and prompt_version, but a new context with different inputs
+    new = Context(user_id="user-1", platform="microsoft")
+    prompt = mcp._prepare_messages(new, "two", None)[0]["content"]
+
+    assert "Microsoft 365" in prompt
+    assert "brief" not in prompt
@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import task_service
+from app.services.task_metadata import TaskMetadataCache
+from app.services.task_service import TaskService
+
+
+class FakeGoogle:
+    """Google Tasks and Calendar double that counts metadata fetches"""
+
+    def __init__(self):
+        self.task_lists = [{"id": "default", "title": "My Tasks"}, {"id": "work", "title": "Work"}]
+        self.calendars = [
+            {"id": "primary-id", "summary": "Me", "primary": True},
+            {"id": "team-id", "summary": "Team"}
+        ]
+        self.fetches = {"task_lists": 0, "calendars": 0}
+        self.inserted = []
+        self.fail_inserts = False
+
+    # Tasks API
+    def tasklists(self):
+        return self
+
+    def list(self, **params):
+        if "maxResults" in params:
+            self.fetches["task_lists"] += 1
+            return {"items": list(self.task_lists)}
+        self.fetches["calendars"] += 1
+        return {"items": list(self.calendars)}
+
+    def tasks(self):
+        return self
+
+    def insert(self, **params):
+        if self.fail_inserts:
+            raise RuntimeError("list deleted")
+        self.inserted.append(params)
+        if "tasklist" in params:
+            return {"id": "task-1", "title": params["body"]["title"], "status": "needsAction"}
+        if "calendarId" in params:
+            body = params["body"]
+            return {
+                "id": "event-1",
+                "summary": body["summary"],
+                "start": body["start"],
+                "end": body["end"],
+                "htmlLink": "https://calendar.example.com/event-1"
+            }
+        return {"id": "new-list", "title": params["body"]["title"]}
+
+    # Calendar API
+    def calendarList(self):
+        return self
+
+    def events(self):
+        return self
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = TaskMetadataCache(max_entries=10, ttl=60)
+    monkeypatch.setattr(task_service, "task_metadata", cache)
+
+    async def execute(request):
+        await asyncio.sleep(0)
+        return request
+
+    monkeypatch.setattr(task_service, "execute", execute)
+    return cache
+
+
+@pytest.fixture
+def tasks(cache):
+    service = TaskService.__new__(TaskService)
+    service.platform = "google"
+    service.user_id = "user-1"
+    service.client = service.calendar_client = FakeGoogle()
+    return service
+
+
+@pytest.mark.asyncio
+async def test_task_lists_are_cached_with_the_default_first(tasks):
+    first = await tasks.get_task_lists()
+    second = await tasks.get_task_lists()
+
+    assert first == second
+    assert first[0] == {"id": "default", "name": "My Tasks", "default": True}
+    assert tasks.client.fetches["task_lists"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_fetch(tasks):
+    await asyncio.gather(*[tasks.get_calendars() for _ in range(5)])
+
+    assert tasks.client.fetches["calendars"] == 1
+
+
+@pytest.mark.asyncio
+async def test_tasks_go_to_the_cached_default_list(tasks):
+    await tasks.create_task("one")
+    await tasks.create_task("two")
+
+    assert [insert["tasklist"] for insert in tasks.client.inserted] == ["default", "default"]
+    assert tasks.client.fetches["task_lists"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_default_list_write_drops_the_cache(tasks, cache):
+    await tasks.get_task_lists()
+    tasks.client.fail_inserts = True
+
+    with pytest.raises(HTTPException):
+        await tasks.create_task("one")
+
+    assert cache.get("user-1", "google", "task_lists") is None
+    assert cache.get_metrics()["invalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_creating_a_list_invalidates_the_cache(tasks):
+    await tasks.get_task_lists()
+
+    await tasks.create_task_list("Errands")
+    await tasks.get_task_lists()
+
+    assert tasks.client.fetches["task_lists"] == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("calendar, calendar_id", [
+    (None, "primary"),
+    ("team-id", "team-id"),
+    ("team", "team-id"),
+])
+async def test_events_resolve_calendars_by_id_or_name(tasks, calendar, calendar_id):
+    event = await tasks.create_event(
+        "Sync", "2026-10-20T10:00:00Z", "2026-10-20T10:30:00Z", calendar=calendar
+    )
+
+    assert event["id"] == "event-1"
+    assert tasks.client.inserted[0]["calendarId"] == calendar_id
+    assert tasks.client.fetches["calendars"] == (0 if calendar is None else 1)
+
+
+@pytest.mark.asyncio
+async def test_unknown_calendar_fails_and_refetches_next_time(tasks):
+    with pytest.raises(HTTPException):
+        await tasks.create_event("Sync", "2026-10-20T10:00:00Z", "2026-10-20T10:30:00Z", calendar="Holidays")
+
+    tasks.client.calendars.append({"id": "holidays-id", "summary": "Holidays"})
+    await tasks.create_event("Sync", "2026-10-20T10:00:00Z", "2026-10-20T10:30:00Z", calendar="Holidays")
+
+    assert tasks.client.inserted[0]["calendarId"] == "holidays-id"
+    assert tasks.client.fetches["calendars"] == 2
+
+
+def test_entries_are_scoped_per_user_and_platform(cache):
+    cache.set("user-1", "google", "calendars", [{"id": "a"}])
+
+    assert cache.get("user-2", "google", "calendars") is None
+    assert cache.get("user-1", "microsoft", "calendars") is None
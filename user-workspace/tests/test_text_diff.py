@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from app.utils.text_diff import diff_ranges, docs_update_requests, utf16_length
+
+
+def apply_edits(old, edits):
+    result, consumed = [], 0
+    for start, end, text in edits:
+        result.append(old[consumed:start])
+        result.append(text)
+        consumed = end
+    result.append(old[consumed:])
+    return "".join(result)
+
+
+def apply_docs_requests(text, requests, base_index=1):
+    """Replay batchUpdate requests on UTF-16 code units, as Google Docs does"""
+    units = bytearray(text.encode("utf-16-le"))
+    for request in requests:
+        if "deleteContentRange" in request:
+            index_range = request["deleteContentRange"]["range"]
+            start = (index_range["startIndex"] - base_index) * 2
+            end = (index_range["endIndex"] - base_index) * 2
+            del units[start:end]
+        else:
+            insert = request["insertText"]
+            start = (insert["location"]["index"] - base_index) * 2
+            units[start:start] = insert["text"].encode("utf-16-le")
+    return units.decode("utf-16-le")
+
+
+@pytest.mark.parametrize("old, new", [
+    ("hello world\n", "hello there world\n"),
+    ("one\ntwo\nthree\n", "one\nthree\n"),
+    ("", "new text\n"),
+    ("same\n", "same\n"),
+    ("line 1\nline 2\n", "line 1 changed\nline 2\nline 3\n"),
+])
+def test_diff_ranges_rebuild_new_text(old, new):
+    assert apply_edits(old, diff_ranges(old, new)) == new
+
+
+def test_diff_ranges_keeps_single_word_edit_small():
+    old = "The quick brown fox\njumps over the dog\n"
+    new = "The quick red fox\njumps over the dog\n"
+    edits = diff_ranges(old, new)
+    assert sum(end - start for start, end, _ in edits) <= len("brown")
+    assert apply_edits(old, edits) == new
+
+
+def test_utf16_length_counts_surrogate_pairs():
+    assert utf16_length("abc") == 3
+    assert utf16_length("😀") == 2
+    assert utf16_length("é") == 1
+
+
+def test_docs_requests_offset_past_astral_characters():
+    old = "a😀b\n"
+    new = "a😀c\n"
+    requests = docs_update_requests(old, diff_ranges(old, new))
+    # "a" is one code unit and the emoji two, so "b" sits at index 1 + 3
+    assert requests == [
+        {"deleteContentRange": {"range": {"startIndex": 4, "endIndex": 5}}},
+        {"insertText": {"location": {"index": 4}, "text": "c"}},
+    ]
+
+
+def test_docs_requests_run_last_edit_first():
+    old = "first line\nsecond line\n"
+    new = "1st line\nsecond line!\n"
+    requests = docs_update_requests(old, diff_ranges(old, new))
+    indexes = [
+        request["deleteContentRange"]["range"]["startIndex"]
+        if "deleteContentRange" in request
+        else request["insertText"]["location"]["index"]
+        for request in requests
+    ]
+    assert indexes == sorted(indexes, reverse=True)
+    assert apply_docs_requests(old, requests) == new
+
+
+def test_docs_requests_reproduce_random_edits():
+    rng = random.Random(7)
+    alphabet = "ab \n😀éz"
+    for _ in range(200):
+        old = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        new = list(old)
+        for _ in range(rng.randint(1, 4)):
+            position = rng.randint(0, len(new))
+            if new and rng.random() < 0.5:
+                del new[min(position, len(new) - 1)]
+            else:
+                new.insert(position, rng.choice(alphabet))
+        new = "".join(new)
+        requests = docs_update_requests(old, diff_ranges(old, new))
+        assert apply_docs_requests(old, requests) == new
@@ -0,0 +1,100 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.ai.tools import Tool, ToolExecutor, ToolRegistry
+
+
+def call(call_id, name, arguments):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+
+def registry(sent):
+    async def read(document_id):
+        await asyncio.sleep(0.05)
+        return {"id": document_id}
+
+    async def send(to):
+        sent.append(to)
+        return "sent"
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def broken():
+        raise ValueError("boom")
+
+    return ToolRegistry([
+        Tool("read", "", {}, read),
+        Tool("send", "", {}, send, requires_confirmation=True),
+        Tool("slow", "", {}, slow, timeout=0.01),
+        Tool("broken", "", {}, broken),
+    ])
+
+
+@pytest.mark.asyncio
+async def test_read_only_calls_run_concurrently():
+    executor = ToolExecutor()
+    calls = [call(f"c{index}", "read", {"document_id": str(index)}) for index in range(5)]
+
+    start = asyncio.get_running_loop().time()
+    turn = await executor.execute(registry([]), calls)
+    elapsed = asyncio.get_running_loop().time() - start
+
+    assert elapsed < 0.2
+    assert [m["tool_call_id"] for m in turn.messages] == [f"c{index}" for index in range(5)]
+    assert json.loads(turn.messages[3]["content"]) == {"result": {"id": "3"}}
+    assert turn.pending_actions == []
+
+
+@pytest.mark.asyncio
+async def test_confirmable_calls_are_deferred_not_run():
+    sent = []
+    executor = ToolExecutor()
+
+    turn = await executor.execute(registry(sent), [call("c1", "send", {"to": "a@example.com"})])
+
+    assert sent == []
+    assert json.loads(turn.messages[0]["content"])["status"] == "pending_confirmation"
+    assert turn.pending_actions == [{"tool": "send", "arguments": {"to": "a@example.com"}}]
+    assert executor.get_metrics()["deferred"] == 1
+
+
+@pytest.mark.asyncio
+async def test_run_confirmed_executes_the_deferred_call():
+    sent = []
+    executor = ToolExecutor()
+
+    result = await executor.run_confirmed(registry(sent), "send", {"to": "a@example.com"})
+
+    assert result == {"result": "sent"}
+    assert sent == ["a@example.com"]
+
+
+@pytest.mark.asyncio
+async def test_failures_are_reported_to_the_model():
+    executor = ToolExecutor()
+    calls = [call("c1", "slow", {}), call("c2", "broken", {}), call("c3", "missing", {})]
+
+    turn = await executor.execute(registry([]), calls)
+
+    errors = [json.loads(m["content"])["error"] for m in turn.messages]
+    assert "timed out" in errors[0]
+    assert errors[1] == "boom"
+    assert errors[2] == "Unknown tool: missing"
+    metrics = executor.get_metrics()
+    assert metrics["timeouts"] == 1
+    assert metrics["errors"] == 2
+
+
+@pytest.mark.asyncio
+async def test_calls_per_turn_and_result_size_are_capped():
+    executor = ToolExecutor(max_calls=2, max_result_chars=20)
+    calls = [call(f"c{index}", "read", {"document_id": "x" * 50}) for index in range(4)]
+
+    turn = await executor.execute(registry([]), calls)
+
+    assert len(turn.messages) == 2
+    assert turn.messages[0]["content"].endswith("...[truncated]")
@@ -0,0 +1,141 @@
+import httpx
+import pytest
+
+from app.services import uploads
+from app.services.uploads import UPLOAD_CHUNK_ALIGNMENT, ResumableUpload
+from app.utils.http import provider_http
+from app.utils.streams import iter_chunks
+
+SESSION_URL = "https://upload.example.com/session"
+
+
+class FakeSession:
+    """Upload session that can store part of a chunk and then fail, like a dropped connection"""
+
+    def __init__(self, platform, size, fail_on_put=None, store_before_failure=0):
+        self.platform = platform
+        self.size = size
+        self.data = bytearray()
+        self.fail_on_put = fail_on_put
+        self.store_before_failure = store_before_failure
+        self.content_ranges = []
+        self.puts = 0
+
+    def progress(self):
+        if len(self.data) == self.size:
+            return httpx.Response(201, json={"id": "file-1", "size": self.size})
+        if self.platform == "google":
+            headers = {"Range": f"bytes=0-{len(self.data) - 1}"} if self.data else {}
+            return httpx.Response(308, headers=headers)
+        return httpx.Response(202, json={"nextExpectedRanges": [f"{len(self.data)}-"]})
+
+    def handler(self, request):
+        if request.method == "GET" or request.headers["Content-Range"].startswith("bytes */"):
+            return self.progress()
+
+        content_range = request.headers["Content-Range"]
+        self.content_ranges.append(content_range)
+        start = int(content_range.split(" ")[1].split("-")[0])
+        assert start == len(self.data)
+        self.puts += 1
+        if self.puts == self.fail_on_put:
+            self.data += request.content[:self.store_before_failure]
+            return httpx.Response(503, text="backend error")
+        self.data += request.content
+        return self.progress()
+
+
+@pytest.fixture
+def session_client(monkeypatch):
+    async def no_sleep(delay):
+        pass
+
+    def install(session):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(session.handler))
+        monkeypatch.setattr(provider_http, "client", client)
+        return client
+
+    monkeypatch.setattr(uploads.asyncio, "sleep", no_sleep)
+    return install
+
+
+async def chunks_of(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def payload(size):
+    return bytes(index % 251 for index in range(size))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("platform", ["google", "microsoft"])
+async def test_upload_sends_aligned_chunks(session_client, platform):
+    data = payload(2 * UPLOAD_CHUNK_ALIGNMENT + 1000)
+    session = FakeSession(platform, len(data))
+    client = session_client(session)
+
+    upload = ResumableUpload(platform, SESSION_URL, len(data), chunk_size=UPLOAD_CHUNK_ALIGNMENT)
+    result = await upload.upload(chunks_of(data, 100000))
+    await client.aclose()
+
+    assert result["id"] == "file-1"
+    assert bytes(session.data) == data
+    assert session.content_ranges == [
+        f"bytes 0-{UPLOAD_CHUNK_ALIGNMENT - 1}/{len(data)}",
+        f"bytes {UPLOAD_CHUNK_ALIGNMENT}-{2 * UPLOAD_CHUNK_ALIGNMENT - 1}/{len(data)}",
+        f"bytes {2 * UPLOAD_CHUNK_ALIGNMENT}-{len(data) - 1}/{len(data)}",
+    ]
+    assert upload.retries == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("platform", ["google", "microsoft"])
+async def test_upload_resumes_from_committed_offset(session_client, platform):
+    data = payload(2 * UPLOAD_CHUNK_ALIGNMENT)
+    stored = 300000
+    session = FakeSession(platform, len(data), fail_on_put=2, store_before_failure=stored)
+    client = session_client(session)
+
+    upload = ResumableUpload(platform, SESSION_URL, len(data), chunk_size=UPLOAD_CHUNK_ALIGNMENT)
+    result = await upload.upload(chunks_of(data, UPLOAD_CHUNK_ALIGNMENT))
+    await client.aclose()
+
+    assert result["id"] == "file-1"
+    assert bytes(session.data) == data
+    # Only the part of the second chunk the session did not store is sent again
+    resumed = UPLOAD_CHUNK_ALIGNMENT + stored
+    assert session.content_ranges[-1] == f"bytes {resumed}-{len(data) - 1}/{len(data)}"
+    assert upload.retries == 1
+
+
+@pytest.mark.asyncio
+async def test_upload_gives_up_after_max_retries(session_client):
+    data = payload(UPLOAD_CHUNK_ALIGNMENT)
+
+    def always_unavailable(request):
+        if request.headers["Content-Range"].startswith("bytes */"):
+            return httpx.Response(308)
+        return httpx.Response(503, text="backend error")
+
+    session = FakeSession("google", len(data))
+    session.handler = always_unavailable
+    client = session_client(session)
+
+    upload = ResumableUpload(
+        "google", SESSION_URL, len(data), chunk_size=UPLOAD_CHUNK_ALIGNMENT, max_retries=2
+    )
+    with pytest.raises(uploads.UploadRetryableError):
+        await upload.upload(chunks_of(data, UPLOAD_CHUNK_ALIGNMENT))
+    await client.aclose()
+    assert upload.retries == 3
+
+
+def test_chunk_size_must_be_aligned():
+    with pytest.raises(ValueError):
+        ResumableUpload("google", SESSION_URL, 10, chunk_size=UPLOAD_CHUNK_ALIGNMENT + 1)
+
+
+@pytest.mark.asyncio
+async def test_iter_chunks_splits_payload():
+    assert [chunk async for chunk in iter_chunks(b"abcdefg", 3)] == [b"abc", b"def", b"g"]